@@ -7,49 +7,532 @@
 
 from io import StringIO
 import sys
-import requests
+import importlib
 import json
 import time
 import asyncio
+import threading
+import contextvars
+import contextlib
+import atexit
+import functools
+import copy
+import uuid
+from array import array
+from concurrent.futures import ThreadPoolExecutor
 from typing import List
 from typing import Dict
+from collections.abc import Mapping
+from urllib.parse import urlsplit
 import logging
-import nest_asyncio
 #from lib_ukit import lib_send
 from socket import *
 #import fcntl
 import struct
-import subprocess
 import re
 import os
-import cv2
-from multiprocessing import Process
 from enum import Enum, unique
 
 
+class _LazyModule(object):
+    """第一次访问属性时才导入的模块
+
+    cv2、requests等模块导入耗时长、占用内存多，只在真正用到时导入。
+
+    :meta private:
+    """
+    def __init__(self, name: str):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+requests = _LazyModule("requests")
+cv2 = _LazyModule("cv2")
+subprocess = _LazyModule("subprocess")
+multiprocessing = _LazyModule("multiprocessing")
+
+
 basic_url = "http://127.0.0.1:9090/v1/"
 ip = "127.0.0.1"
 headers = {'Content-Type': 'application/json'}
-nest_asyncio.apply()
+#HTTP连接池配置，可以通过yan_api_init修改
+http_pool_size = 10
+http_pool_hosts = 32
+http_max_retries = 3
+http_session = None
+#当前线程/协程正在操作的机器人，None表示使用yan_api_init设置的全局机器人
+_current_robot = contextvars.ContextVar("yan_current_robot", default=None)
+_nest_asyncio_applied = False
+#sync_*接口轮询状态的时间间隔(秒)，从最小值开始按指数增长到最大值
+poll_interval_min = 0.005
+poll_interval_max = 1.0
+#本地订阅接收服务的监听端口，0表示自动分配
+subscription_port = 0
+#为True时传感器查询接口返回RobotResponse，访问字段时才解析json
+http_lazy_decode = False
+_json_loads = None
+#HTTP请求超时(秒)，(建立连接, 等待响应)，None表示不限制
+http_timeout = (3.05, 10.0)
+#同一个机器人连续失败多少次后熔断，熔断后多少秒再尝试一次，0表示不熔断
+breaker_failure_threshold = 5
+breaker_reset_timeout = 30.0
+#sync_*接口等待执行完成的最长时间(秒)，None表示不限制
+sync_timeout = 300.0
+#当前调用的截止时间(time.monotonic)，由deadline设置
+_deadline = contextvars.ContextVar("yan_deadline", default=None)
+_breakers = {}
+_breakers_lock = threading.Lock()
+_adapter_class = None
 
 def get_ip_address(ifname):
     s = socket(AF_INET, SOCK_DGRAM)
     return inet_ntoa(fcntl.ioctl(s.fileno(), 0x8915, struct.pack('256s', ifname[:15]))[20:24])
 
-def yan_api_init(robot_ip: str):
+def yan_api_init(robot_ip: str, pool_size: int = 10, max_retries: int = 3, lazy_decode: bool = False,
+                 timeout = (3.05, 10.0)):
     """初始化sdk
 
     Args:
         robot_ip(str): 机器人ip地址
+        pool_size(int): 每个机器人保持的keep-alive连接数，默认10
+        max_retries(int): 建立连接失败时的重试次数，默认3
+        lazy_decode(bool): 传感器查询接口是否延迟解析返回的json，默认False
+        timeout: 请求超时(秒)，可以是一个数或者(建立连接, 等待响应)，None表示不限制
 
     """
     global basic_url
     global ip
+    global http_pool_size
+    global http_max_retries
+    global http_session
+    global http_lazy_decode
+    global http_timeout
     basic_url = "http://"+robot_ip+":9090/v1/"
     ip = robot_ip
+    if http_session is not None and (pool_size != http_pool_size or max_retries != http_max_retries):
+        http_session.close()
+        http_session = None
+    http_pool_size = pool_size
+    http_max_retries = max_retries
+    http_lazy_decode = lazy_decode
+    http_timeout = timeout
     logging.basicConfig(level=logging.ERROR,format="%(asctime)s %(funcName)s %(levelname)s %(message)s",datefmt = '%Y-%m-%d  %H:%M:%S %a')
 
 
+def _create_session(pool_size: int, max_retries: int):
+    """创建带连接池的HTTP会话
+
+    同一个会话内每个机器人ip对应一个连接池，连接在请求之间保持复用。
+    只对建立连接失败进行重试，已经发出的PUT/POST请求不会被重复发送。
+
+    Args:
+        pool_size(int): 每个机器人保持的连接数
+        max_retries(int): 建立连接失败时的重试次数
+
+    Returns:
+        requests.Session: HTTP会话
+    """
+    from urllib3.util.retry import Retry
+    session = requests.Session()
+    retry = Retry(total=max_retries, connect=max_retries, read=0, redirect=0, status=0, backoff_factor=0.05)
+    adapter = _get_adapter_class()(pool_connections=http_pool_hosts, pool_maxsize=pool_size, max_retries=retry)
+    session.mount("http://", adapter)
+    return session
+
+
+class CircuitOpenError(ConnectionError):
+    """机器人连续请求失败，熔断期间不再发送请求"""
+
+
+class DeadlineExceeded(TimeoutError):
+    """调用超过了deadline或sync_timeout设置的时间"""
+
+
+class _CircuitBreaker(object):
+    """单个机器人的熔断器
+
+    连续breaker_failure_threshold次连接失败或超时后断开，断开期间的请求直接抛出CircuitOpenError；
+    经过breaker_reset_timeout秒后放行一次请求，成功则恢复，失败则继续断开。
+
+    :meta private:
+    """
+    def __init__(self, host: str):
+        self.host = host
+        self.failures = 0
+        self.openedAt = None
+        self._probing = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.openedAt is None:
+            return "closed"
+        if self._probing or time.monotonic() - self.openedAt >= breaker_reset_timeout:
+            return "half-open"
+        return "open"
+
+    def before_request(self):
+        with self._lock:
+            if self.openedAt is None:
+                return
+            if self._probing or time.monotonic() - self.openedAt < breaker_reset_timeout:
+                raise CircuitOpenError("robot %s unavailable after %d failures" % (self.host, self.failures))
+            self._probing = True
+
+    def record(self, success):
+        """记录请求结果，success为None表示请求没有完成(如被取消)，不计入失败"""
+        with self._lock:
+            self._probing = False
+            if success:
+                self.failures = 0
+                self.openedAt = None
+            elif success is not None:
+                self.failures += 1
+                if 0 < breaker_failure_threshold <= self.failures:
+                    if self.openedAt is None:
+                        logging.error("robot %s circuit open after %d failures", self.host, self.failures)
+                    self.openedAt = time.monotonic()
+
+
+def _get_breaker(host: str):
+    with _breakers_lock:
+        breaker = _breakers.get(host)
+        if breaker is None:
+            breaker = _breakers[host] = _CircuitBreaker(host)
+        return breaker
+
+
+def get_circuit_state(robot_ip: str = None):
+    """获取机器人的熔断状态
+
+    Args:
+        robot_ip(str): 机器人ip，默认当前机器人
+
+    Returns:
+        Dict: {"state": closed 正常 open 熔断 half-open 等待试探请求, "failures": 连续失败次数}
+    """
+    breaker = _get_breaker(robot_ip or _get_robot_ip())
+    return {"state": breaker.state, "failures": breaker.failures}
+
+
+def reset_circuit(robot_ip: str = None):
+    """立即恢复熔断的机器人，robot_ip为None时恢复所有机器人"""
+    with _breakers_lock:
+        breakers = list(_breakers.values()) if robot_ip is None else [_breakers.get(robot_ip)]
+    for breaker in breakers:
+        if breaker is not None:
+            breaker.record(True)
+
+
+@contextlib.contextmanager
+def deadline(seconds: float):
+    """限制一段代码里所有接口调用的总时间
+
+    包括HTTP请求和sync_*接口的等待，嵌套使用时取较早的截止时间，超时抛出DeadlineExceeded。
+    YanFleet、YanBatch的并发调用也使用调用者的截止时间。
+
+    Args:
+        seconds(float): 从现在开始的秒数
+
+    Examples:
+        >>> with YanAPI.deadline(5):
+                YanAPI.sync_play_motion(name="wave")
+    """
+    end = time.monotonic() + seconds
+    current = _deadline.get()
+    token = _deadline.set(end if current is None else min(current, end))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def _request_timeout(timeout = None):
+    """合并调用者指定的超时、http_timeout和当前的截止时间
+
+    Returns:
+        requests使用的timeout参数
+    """
+    if timeout is None:
+        timeout = http_timeout
+    end = _deadline.get()
+    if end is None:
+        return timeout
+    remaining = end - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded("deadline exceeded")
+    if timeout is None:
+        return remaining
+    if isinstance(timeout, tuple):
+        return tuple(remaining if item is None else min(item, remaining) for item in timeout)
+    return min(timeout, remaining)
+
+
+def _get_adapter_class():
+    """带超时和熔断的HTTPAdapter，requests导入后才能定义"""
+    global _adapter_class
+    if _adapter_class is None:
+        from requests.adapters import HTTPAdapter
+
+        class _YanAdapter(HTTPAdapter):
+            def send(self, request, stream=False, timeout=None, verify=True, cert=None, proxies=None):
+                timeout = _request_timeout(timeout)
+                breaker = _get_breaker(urlsplit(request.url).hostname)
+                breaker.before_request()
+                try:
+                    response = super().send(request, stream=stream, timeout=timeout, verify=verify, cert=cert, proxies=proxies)
+                except (requests.exceptions.ConnectionError, requests.exceptions.Timeout):
+                    breaker.record(False)
+                    raise
+                except BaseException:
+                    breaker.record(None)
+                    raise
+                breaker.record(True)
+                return response
+
+        _adapter_class = _YanAdapter
+    return _adapter_class
+
+
+def _wait_deadline():
+    """sync_*接口等待的截止时间，取sync_timeout和当前deadline中较早的一个"""
+    end = _deadline.get()
+    if sync_timeout is not None:
+        limit = time.monotonic() + sync_timeout
+        end = limit if end is None else min(end, limit)
+    return end
+
+
+def _wait_interval(interval: float, end: float, what: str):
+    """下一次查询前的等待时间，不超过截止时间，已经超时时抛出DeadlineExceeded"""
+    if end is None:
+        return interval
+    remaining = end - time.monotonic()
+    if remaining <= 0:
+        raise DeadlineExceeded("waiting for %s timed out" % what)
+    return min(interval, remaining)
+
+
+def _get_session():
+    """获取当前机器人的HTTP会话，全局会话在第一次调用时创建
+
+    Returns:
+        requests.Session: HTTP会话
+    """
+    robot = _current_robot.get()
+    if robot is not None:
+        return robot.session
+    global http_session
+    if http_session is None:
+        http_session = _create_session(http_pool_size, http_max_retries)
+    return http_session
+
+
+def _get_event_loop():
+    """获取sync_*接口使用的事件循环，第一次调用时启用nest_asyncio允许嵌套运行"""
+    global _nest_asyncio_applied
+    if not _nest_asyncio_applied:
+        import nest_asyncio
+        nest_asyncio.apply()
+        _nest_asyncio_applied = True
+    return asyncio.get_event_loop()
+
+
+def _get_basic_url():
+    """获取当前机器人的接口地址"""
+    robot = _current_robot.get()
+    return basic_url if robot is None else robot.basic_url
+
+
+def _get_robot_ip():
+    """获取当前机器人的ip地址"""
+    robot = _current_robot.get()
+    return ip if robot is None else robot.ip
+
+
+def _get_json_loads():
+    """安装了orjson时使用orjson解析，否则使用标准库json，两者都可以直接解析bytes"""
+    global _json_loads
+    if _json_loads is None:
+        try:
+            import orjson
+            _json_loads = orjson.loads
+        except ImportError:
+            _json_loads = json.loads
+    return _json_loads
+
+
+def _parse_json(content):
+    """解析机器人返回的内容，内容不是json对象或者没有code字段时返回code为-1的错误"""
+    try:
+        res = _get_json_loads()(content)
+    except ValueError:
+        res = None
+    if not isinstance(res, dict) or "code" not in res:
+        return {"code": -1, "data": {}, "msg": "invalid response: " + content[:64].decode("utf-8", "replace")}
+    return res
+
+
+def _decode_nested(res):
+    """语音接口的data是以NUL结尾的json字符串，解析成对象"""
+    data = res.get("data")
+    if isinstance(data, str):
+        data = data.strip("\x00")
+        res["data"] = _get_json_loads()(data) if data else {}
+    return res
+
+
+def _decode_response(response, lazy: bool = False):
+    """解析HTTP响应
+
+    直接解析response.content，不再先解码成字符串。
+
+    Args:
+        response(requests.Response): HTTP响应
+        lazy(bool): 为True时返回RobotResponse，访问字段时才解析
+
+    Returns:
+        Dict: 返回的json对象
+    """
+    if lazy:
+        return RobotResponse(response.content)
+    return _parse_json(response.content)
+
+
+class RobotResponse(Mapping):
+    """延迟解析的接口返回值，用法和dict相同
+
+    只读取code时不需要解析整个json，高频查询传感器时只在需要数据时解析。
+    """
+    _codePattern = re.compile(rb'\s*\{\s*"code"\s*:\s*(-?\d+)\s*[,}]')
+
+    def __init__(self, content: bytes):
+        self._content = content
+        self._res = None
+        self._code = None
+
+    def _parsed(self):
+        if self._res is None:
+            self._res = _parse_json(self._content)
+        return self._res
+
+    @property
+    def code(self):
+        """返回码，code在json开头时不需要解析整个json"""
+        if self._code is None:
+            match = self._res is None and self._codePattern.match(self._content)
+            self._code = int(match.group(1)) if match else self._parsed()["code"]
+        return self._code
+
+    @property
+    def ok(self):
+        """返回码是否为0"""
+        return self.code == 0
+
+    def __getitem__(self, key):
+        if key == "code":
+            return self.code
+        return self._parsed()[key]
+
+    def __contains__(self, key):
+        return key == "code" or key in self._parsed()
+
+    def __iter__(self):
+        return iter(self._parsed())
+
+    def __len__(self):
+        return len(self._parsed())
+
+    def __repr__(self):
+        return repr(self._parsed())
+
+
+#很少变化的查询接口的缓存时间(秒)，设为0关闭对应接口的缓存
+cache_ttl = {
+    "get_robot_version_info": 600,
+    "get_motion_list": 60,
+    "get_media_music_list": 60,
+    "get_sensors_list": 30,
+    "get_vision_tags": 60,
+    "get_gamepad_keymap": 60,
+}
+#{(robot_ip, 接口名, 参数): (过期时间, 返回值)}
+_response_cache = {}
+#{接口名: {"hits": 命中次数, "misses": 未命中次数, "invalidations": 失效次数}}
+_cache_stats = {}
+_cache_lock = threading.Lock()
+
+
+def _cache_stat(name: str):
+    return _cache_stats.setdefault(name, {"hits": 0, "misses": 0, "invalidations": 0})
+
+
+def _cached(func):
+    """按机器人缓存查询接口成功的返回值，过期时间见cache_ttl"""
+    name = func.__name__
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        ttl = cache_ttl.get(name, 0)
+        if ttl <= 0:
+            return func(*args, **kwargs)
+        key = (_get_robot_ip(), name, args, tuple(sorted(kwargs.items())))
+        now = time.monotonic()
+        with _cache_lock:
+            entry = _response_cache.get(key)
+            hit = entry is not None and entry[0] > now
+            _cache_stat(name)["hits" if hit else "misses"] += 1
+        if hit:
+            return copy.deepcopy(entry[1])
+        res = func(*args, **kwargs)
+        if __resIsSuccess(res):
+            with _cache_lock:
+                _response_cache[key] = (now + ttl, copy.deepcopy(res))
+        return res
+    return wrapper
+
+
+def _invalidates(*names):
+    """修改数据的接口调用后，清除当前机器人对应查询接口的缓存"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            try:
+                return func(*args, **kwargs)
+            finally:
+                invalidate_cache(*names, robot_ip = _get_robot_ip())
+        return wrapper
+    return decorator
+
+
+def invalidate_cache(*names, robot_ip: str = None):
+    """清除查询接口的缓存
+
+    Args:
+        names(str): 接口名，如"get_motion_list"，不指定时清除所有接口
+        robot_ip(str): 机器人ip地址，不指定时清除所有机器人
+    """
+    with _cache_lock:
+        for key in list(_response_cache):
+            if (not names or key[1] in names) and (robot_ip is None or key[0] == robot_ip):
+                del _response_cache[key]
+                _cache_stat(key[1])["invalidations"] += 1
+
+
+def get_cache_stats():
+    """获取缓存命中统计
+
+    Returns:
+        Dict: {接口名: {"hits": 命中次数, "misses": 未命中次数, "invalidations": 失效次数}}
+    """
+    with _cache_lock:
+        return copy.deepcopy(_cache_stats)
+
 def get_robot_battery_info():
     """获得机器人电量信息
 
@@ -68,9 +551,9 @@ def get_robot_battery_info():
                     msg:string  提示信息
                 }
     """
-    devices_url = basic_url+"devices/battery"
-    response = requests.get(url=devices_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    devices_url = _get_basic_url()+"devices/battery"
+    response = _get_session().get(url=devices_url, headers=headers)
+    res = _decode_response(response)
     return res
 
 def get_robot_battery_value():
@@ -80,9 +563,9 @@ def get_robot_battery_value():
         int: 电量百分比 (0-100)
 
     """
-    devices_url = basic_url+"devices/battery"
-    response = requests.get(url=devices_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    devices_url = _get_basic_url()+"devices/battery"
+    response = _get_session().get(url=devices_url, headers=headers)
+    res = _decode_response(response)
     if __resIsSuccess(res):
         batteryInfo = RobotBatteryInfo(res["data"])
         return batteryInfo.batteryPercentage
@@ -108,9 +591,9 @@ def get_robot_fall_management_state():
             }
 
     """
-    devices_url = basic_url+"devices/fall_management"
-    response = requests.get(url=devices_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    devices_url = _get_basic_url()+"devices/fall_management"
+    response = _get_session().get(url=devices_url, headers=headers)
+    res = _decode_response(response)
     return res
 
 
@@ -130,11 +613,11 @@ def set_robot_fall_management_state(enable: bool):
                 }
 
     """
-    devices_url = basic_url+"devices/fall_management"
+    devices_url = _get_basic_url()+"devices/fall_management"
     param = {"enable": enable}
     json_data = json.dumps(param)
-    response = requests.put(url=devices_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().put(url=devices_url, data=json_data, headers=headers)
+    res = _decode_response(response)
     return res
 
 
@@ -155,9 +638,9 @@ def get_robot_language():
             }
 
     """
-    languages_url = basic_url+"devices/languages"
-    response = requests.get(url=languages_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    languages_url = _get_basic_url()+"devices/languages"
+    response = _get_session().get(url=languages_url, headers=headers)
+    res = _decode_response(response)
     return res
 
 
@@ -177,11 +660,11 @@ def set_robot_language(language: str):
                  }
 
     """
-    languages_url = basic_url+"devices/languages"
+    languages_url = _get_basic_url()+"devices/languages"
     param = {"language": language}
     json_data = json.dumps(param)
-    response = requests.put(url=languages_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().put(url=languages_url, data=json_data, headers=headers)
+    res = _decode_response(response)
     return res
 
 def __get_robot_led_info():
@@ -189,9 +672,9 @@ def __get_robot_led_info():
     Returns:
         RobotLedInfo: 机器人灯效信息
     """
-    led_url = basic_url+"devices/led"
-    response = requests.get(url=led_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    led_url = _get_basic_url()+"devices/led"
+    response = _get_session().get(url=led_url, headers=headers)
+    res = _decode_response(response)
     if __resIsSuccess(res):
         ledInfo = RobotLedInfo(res["data"])
         return ledInfo
@@ -259,9 +742,9 @@ def get_robot_led():
                 }
 
     """
-    led_url = basic_url+"devices/led"
-    response = requests.get(url=led_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    led_url = _get_basic_url()+"devices/led"
+    response = _get_session().get(url=led_url, headers=headers)
+    res = _decode_response(response)
     return res
 
 
@@ -283,11 +766,11 @@ def set_robot_led(type: str, color: str, mode: str):
                 }
 
     """
-    led_url = basic_url+"devices/led"
+    led_url = _get_basic_url()+"devices/led"
     param = {"type": type, "color": color, "mode": mode}
     json_data = json.dumps(param)
-    response = requests.put(url=led_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().put(url=led_url, data=json_data, headers=headers)
+    res = _decode_response(response)
     return res
 
 
@@ -307,10 +790,10 @@ def sync_set_led(type: str, color: str, mode: str):
         logging.error("set led failed error code = %d msg = %s",res.get("code",-1),res.get("msg",""))
         return False
     coroutine = __wait_result_color(type = type, color = color, mode = mode, getFuc = get_robot_led)
-    loop = asyncio.get_event_loop()
+    loop = _get_event_loop()
     tasks = loop.create_task(coroutine)
     loop.run_until_complete(tasks)
-    return True
+    return __resIsSuccess(tasks.result())
 
 
 def get_robot_version_info_value(type:str):
@@ -322,10 +805,10 @@ def get_robot_version_info_value(type:str):
         str: (版本号，舵机版本号，sn号)
 
     """
-    version_url = basic_url+"devices/versions"
+    version_url = _get_basic_url()+"devices/versions"
     params = {'type': type}
-    response = requests.get(url=version_url, headers=headers ,params=params)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().get(url=version_url, headers=headers ,params=params)
+    res = _decode_response(response)
     if __resIsSuccess(res):
         versionInfo = RobotVersionInfo(res["data"])
         ret = getattr(versionInfo,type)
@@ -334,6 +817,7 @@ def get_robot_version_info_value(type:str):
         logging.error("error code = %d msg = %s",res.get("code",-1),res.get("msg",""))
         return ""
 
+@_cached
 def get_robot_version_info(type: str):
     """获取机器人版本信息
 
@@ -356,10 +840,10 @@ def get_robot_version_info(type: str):
                 }
 
     """
-    version_url = basic_url+"devices/versions"
+    version_url = _get_basic_url()+"devices/versions"
     params = {'type': type}
-    response = requests.get(url=version_url, headers=headers, params=params)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().get(url=version_url, headers=headers, params=params)
+    res = _decode_response(response)
     return res
 
 def get_robot_mode():
@@ -384,9 +868,9 @@ def get_robot_mode():
             }
 
     """
-    request_url = basic_url+"devices/mode"
-    response = requests.get(url=request_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    request_url = _get_basic_url()+"devices/mode"
+    response = _get_session().get(url=request_url, headers=headers)
+    res = _decode_response(response)
     return res
 
 
@@ -395,9 +879,9 @@ def get_robot_volume_value():
     Returns:
         int: 机器人音量 返回-1表示获取失败
     """
-    volume_url = basic_url+"devices/volume"
-    response = requests.get(url=volume_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    volume_url = _get_basic_url()+"devices/volume"
+    response = _get_session().get(url=volume_url, headers=headers)
+    res = _decode_response(response)
     if not __resIsSuccess(res):
         logging.error("error code = %d msg = %s",res.get("code",-1),res.get("msg",""))
         return -1
@@ -420,9 +904,9 @@ def get_robot_volume():
                 }
 
     """
-    volume_url = basic_url+"devices/volume"
-    response = requests.get(url=volume_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    volume_url = _get_basic_url()+"devices/volume"
+    response = _get_session().get(url=volume_url, headers=headers)
+    res = _decode_response(response)
     return res
 
 def set_robot_volume_value(volume: int):
@@ -435,11 +919,11 @@ def set_robot_volume_value(volume: int):
         bool （True 成功 False 失败）
 
     """
-    volume_url = basic_url+"devices/volume"
+    volume_url = _get_basic_url()+"devices/volume"
     param = {"volume": volume}
     json_data = json.dumps(param)
-    response = requests.put(url=volume_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().put(url=volume_url, data=json_data, headers=headers)
+    res = _decode_response(response)
     if not __resIsSuccess(res):
         logging.error("error code = %d msg = %s",res.get("code",-1),res.get("msg",""))
     return (__resIsSuccess(res))
@@ -460,16 +944,102 @@ def set_robot_volume(volume: int):
                 }
 
     """
-    volume_url = basic_url+"devices/volume"
+    volume_url = _get_basic_url()+"devices/volume"
     param = {"volume": volume}
     json_data = json.dumps(param)
-    response = requests.put(url=volume_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().put(url=volume_url, data=json_data, headers=headers)
+    res = _decode_response(response)
     return res
 
 ######media########
 
 
+class _MultipartFile(object):
+    """流式multipart/form-data请求体
+
+    按块读取文件发送，内存占用不随文件大小增长，请求体长度提前算好，不使用chunked编码。
+
+    :meta private:
+    """
+    def __init__(self, filePath: str, field: str = "file", progress = None):
+        self.boundary = uuid.uuid4().hex
+        filename = os.path.basename(filePath).replace('"', "%22")
+        self._head = ('--%s\r\nContent-Disposition: form-data; name="%s"; filename="%s"\r\n\r\n'
+                      % (self.boundary, field, filename)).encode("utf-8")
+        self._tail = ("\r\n--%s--\r\n" % self.boundary).encode("utf-8")
+        self._file = open(filePath, "rb")
+        self.total = len(self._head) + os.fstat(self._file.fileno()).st_size + len(self._tail)
+        self.sent = 0
+        self._progress = progress
+        self._stage = 0
+        self._offset = 0
+
+    @property
+    def content_type(self):
+        return "multipart/form-data; boundary=" + self.boundary
+
+    def __len__(self):
+        return self.total
+
+    def read(self, size: int = -1):
+        if size is None or size < 0:
+            size = self.total
+        chunks = []
+        #0: 头部 1: 文件内容 2: 结束边界 3: 结束
+        while size > 0 and self._stage < 3:
+            if self._stage == 1:
+                chunk = self._file.read(size)
+                if not chunk:
+                    self._stage = 2
+                    continue
+            else:
+                part = self._head if self._stage == 0 else self._tail
+                chunk = part[self._offset:self._offset + size]
+                self._offset += len(chunk)
+                if self._offset >= len(part):
+                    self._stage += 1
+                    self._offset = 0
+            size -= len(chunk)
+            chunks.append(chunk)
+        data = b"".join(chunks)
+        if data:
+            self.sent += len(data)
+            if self._progress is not None:
+                self._progress(self.sent, self.total)
+        return data
+
+    def __iter__(self):
+        while True:
+            chunk = self.read(64 * 1024)
+            if not chunk:
+                return
+            yield chunk
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def _upload_file(path: str, filePath: str, progress = None):
+    """以流的方式上传文件，请求结束后立即关闭文件
+
+    Args:
+        path(str): 相对于 http://ip:9090/v1/ 的路径
+        filePath(str): 文件路径
+        progress: 进度回调 progress(已发送字节数, 总字节数)
+    """
+    with _MultipartFile(filePath, progress = progress) as body:
+        headers = {'Authorization': 'multipart/form-data', 'Content-Type': body.content_type}
+        response = _get_session().post(url=_get_basic_url()+path, data=body, headers=headers)
+    return _decode_response(response)
+
+
+@_invalidates("get_media_music_list")
 def delete_media_music(name: str):
     """删除音乐文件
 
@@ -488,11 +1058,11 @@ def delete_media_music(name: str):
                 }
 
     """
-    music_url = basic_url+"media/music"
+    music_url = _get_basic_url()+"media/music"
     param = {"name": name}
     json_data = json.dumps(param)
-    response = requests.delete(url=music_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().delete(url=music_url, data=json_data, headers=headers)
+    res = _decode_response(response)
     return res
 
 
@@ -513,13 +1083,14 @@ def get_media_music_state():
                 }
 
     """
-    music_url = basic_url+"media/music"
-    response = requests.get(url=music_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    music_url = _get_basic_url()+"media/music"
+    response = _get_session().get(url=music_url, headers=headers)
+    res = _decode_response(response)
     return res
 
 
-def upload_media_music(filePath: str):
+@_invalidates("get_media_music_list")
+def upload_media_music(filePath: str, progress = None):
     """上传音乐文件
 
     上传到 /home/pi/Documents/music
@@ -527,6 +1098,7 @@ def upload_media_music(filePath: str):
 
     Args:
         filePath(str):文件路径
+        progress:上传进度回调 progress(已发送字节数, 总字节数)
 
     Returns:
            Dict:
@@ -538,12 +1110,7 @@ def upload_media_music(filePath: str):
                 }
 
     """
-    music_url = basic_url+"media/music"
-    headers = {'Authorization': 'multipart/form-data'}
-    files = {'file': open(filePath, 'rb')}
-    response = requests.post(url=music_url, files=files, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
-    return res
+    return _upload_file("media/music", filePath, progress)
 
 def start_play_music(name: str = ""):
     """播放音乐
@@ -602,16 +1169,17 @@ def __control_media_music(operation: str, name: str = ""):
                 }
 
     """
-    music_url = basic_url+"media/music"
+    music_url = _get_basic_url()+"media/music"
     param = {"operation": operation}
     if (len(name) > 0):
         param["name"] = name
     json_data = json.dumps(param)
-    response = requests.put(url=music_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().put(url=music_url, data=json_data, headers=headers)
+    res = _decode_response(response)
     return res
 
 
+@_cached
 def get_media_music_list():
     """获取音乐列表
 
@@ -630,9 +1198,9 @@ def get_media_music_list():
                     "msg": string提示信息 "success"
                 }
     """
-    music_url = basic_url+"media/music/list"
-    response = requests.get(url=music_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    music_url = _get_basic_url()+"media/music/list"
+    response = _get_session().get(url=music_url, headers=headers)
+    res = _decode_response(response)
     return res
 
 
@@ -647,17 +1215,19 @@ def sync_play_music(name: str = ""):
     if res['code'] != 0:
         logging.error("play music failed error code = %d msg = %s",res.get("code",-1),res.get("msg",""))
         return False
+    #音乐没有状态订阅接口，只能按指数退避轮询
     coroutine = __wait_result_music(name = name, start_time = None, getFuc = get_media_music_state)
-    loop = asyncio.get_event_loop()
+    loop = _get_event_loop()
     tasks = loop.create_task(coroutine)
     loop.run_until_complete(tasks)
     # Success Example
-    return True
+    return __resIsSuccess(tasks.result())
 
 
 ####motions####
 
 
+@_invalidates("get_motion_list")
 def delete_motion(name: str):
     """删除动作文件
 
@@ -677,12 +1247,12 @@ def delete_motion(name: str):
                 }
 
     """
-    motions_url = basic_url+"motions"
+    motions_url = _get_basic_url()+"motions"
     param = {"name": name}
     json_data = json.dumps(param)
-    response = requests.delete(
+    response = _get_session().delete(
         url=motions_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    res = _decode_response(response)
     return res
 
 
@@ -704,9 +1274,9 @@ def get_current_motion_play_state():
                 }
 
     """
-    motions_url = basic_url+"motions"
-    response = requests.get(url=motions_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    motions_url = _get_basic_url()+"motions"
+    response = _get_session().get(url=motions_url, headers=headers)
+    res = _decode_response(response)
     return res
 
 def get_current_layer_motion_play_state():
@@ -727,9 +1297,9 @@ def get_current_layer_motion_play_state():
                 }
 
     """
-    motions_url = basic_url+"motions/all"
-    response = requests.get(url=motions_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    motions_url = _get_basic_url()+"motions/all"
+    response = _get_session().get(url=motions_url, headers=headers)
+    res = _decode_response(response)
     return res
 
 def __control_motion_play_state(operation: str = "start", name: str = "reset", direction: str = "", speed: str = "normal", repeat: int = 1, timestamp: int = 0, version: str = "v1"):
@@ -757,14 +1327,14 @@ def __control_motion_play_state(operation: str = "start", name: str = "reset", d
                 }
 
     """
-    motion_url = basic_url+"motions"
+    motion_url = _get_basic_url()+"motions"
     param = {"operation": operation, "motion":
              {"name": name, "repeat": repeat, "speed": speed}, "timestamp": timestamp,"version": version}
     if(len(direction) != 0):
         param["motion"]["direction"] = direction
     json_data = json.dumps(param)
-    response = requests.put(url=motion_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().put(url=motion_url, data=json_data, headers=headers)
+    res = _decode_response(response)
     return res
 
 def start_play_motion(name: str = "reset", direction: str = "", speed: str = "normal", repeat: int = 1, timestamp: int = 0,version: str="v1"):
@@ -885,28 +1455,35 @@ def sync_play_motion(name: str = "reset", direction: str = "", speed: str = "nor
 
     """
     t = int(time.time() * 1000)
-    res = start_play_motion(direction = direction, speed = speed, repeat = repeat,name = name, timestamp = t, version = version)
-    if res['code'] != 0:
-        logging.error("play motion failed error code = %d msg = %s",res.get("code",-1),res.get("msg","unknow error"))
-        return False
-    if version == "v1":
-        coroutine = __wait_result_motion(name = name, start_time = t, getFuc = get_current_motion_play_state)
-    elif version == "v2":
-        coroutine = __wait_result_layer_motion(name = name, start_time = t, getFuc = get_current_layer_motion_play_state)
-    loop = asyncio.get_event_loop()
-    tasks = loop.create_task(coroutine)
-    loop.run_until_complete(tasks)
-    return True
+    waiter = _subscribe_completion("motion")
+    try:
+        res = start_play_motion(direction = direction, speed = speed, repeat = repeat,name = name, timestamp = t, version = version)
+        if res['code'] != 0:
+            logging.error("play motion failed error code = %d msg = %s",res.get("code",-1),res.get("msg","unknow error"))
+            return False
+        if version == "v1":
+            coroutine = __wait_result_motion(name = name, start_time = t, getFuc = get_current_motion_play_state, waiter = waiter)
+        elif version == "v2":
+            coroutine = __wait_result_layer_motion(name = name, start_time = t, getFuc = get_current_layer_motion_play_state, waiter = waiter)
+        loop = _get_event_loop()
+        tasks = loop.create_task(coroutine)
+        loop.run_until_complete(tasks)
+    finally:
+        if waiter is not None:
+            waiter.close()
+    return __resIsSuccess(tasks.result())
 
 
 
-def upload_motion(filePath: str):
+@_invalidates("get_motion_list")
+def upload_motion(filePath: str, progress = None):
     """上传动作文件
 
     上传动作文件到 /home/pi/Documents/motions 目录
 
     Args:
         file(str):hts文件的路径(包含名称).
+        progress:上传进度回调 progress(已发送字节数, 总字节数)
 
     Returns:
            Dict:
@@ -919,12 +1496,7 @@ def upload_motion(filePath: str):
                 }
 
     """
-    motions_url = basic_url+"motions"
-    headers = {'Authorization': 'multipart/form-data'}
-    files = {'file': open(filePath, 'rb')}
-    response = requests.post(url=motions_url, files=files, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
-    return res
+    return _upload_file("motions", filePath, progress)
 
 def get_motion_list_value():
     """获取动作文件列表
@@ -934,9 +1506,9 @@ def get_motion_list_value():
            e.g::              
     [A, B, C, D, E, F ,G]
     """
-    motions_url = basic_url+"motions/list"
-    response = requests.get(url=motions_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    motions_url = _get_basic_url()+"motions/list"
+    response = _get_session().get(url=motions_url, headers=headers)
+    res = _decode_response(response)
     if not __resIsSuccess(res):
         logging.error("error code = %d msg = %s",res.get("code",-1),res.get("msg",""))
         return []
@@ -951,6 +1523,7 @@ def get_motion_list_value():
         motion.append(item['name'].rsplit('.', 1)[0])
     return motion
 
+@_cached
 def get_motion_list():
     """获取动作文件列表
 
@@ -1005,13 +1578,14 @@ def get_motion_list():
                 }
 
     """
-    motions_url = basic_url+"motions/list"
-    response = requests.get(url=motions_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    motions_url = _get_basic_url()+"motions/list"
+    response = _get_session().get(url=motions_url, headers=headers)
+    res = _decode_response(response)
     return res
 
 
-def control_motion_gait(speed_v: int = 0, speed_h: int = 0, steps: int = 0, period: int = 1, wave: bool = False):
+def control_motion_gait(speed_v: int = 0, speed_h: int = 0, steps: int = 0, period: int = 1, wave: bool = False,
+                        timestamp: int = None):
     """机器人步态动作控制
 
     Args:
@@ -1020,6 +1594,7 @@ def control_motion_gait(speed_v: int = 0, speed_h: int = 0, steps: int = 0, peri
         speed_h : integer (int32) 左右水平行走速度，取值【-5~5】。
         steps: integer (int32) 总步数值，大于零的正整数。当steps =0时，代表10亿这样一个极大值。这个也是它的默认值。
         wave: bool 表示是否开启手臂摆动。取值true、false。
+        timestamp: integer 时间戳(毫秒)，默认使用当前时间
 
     Returns:
            Dict:
@@ -1031,8 +1606,9 @@ def control_motion_gait(speed_v: int = 0, speed_h: int = 0, steps: int = 0, peri
                 }
 
     """
-    motion_url = basic_url + "motions/gait"
-    timestamp = int(time.time()*1000)
+    motion_url = _get_basic_url()+"motions/gait"
+    if timestamp is None:
+        timestamp = int(time.time()*1000)
     param = {
         "speed_v": speed_v,
         "speed_h": speed_h,
@@ -1042,8 +1618,8 @@ def control_motion_gait(speed_v: int = 0, speed_h: int = 0, steps: int = 0, peri
         "wave": wave
     }
     json_data = json.dumps(param)
-    response = requests.put(url=motion_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().put(url=motion_url, data=json_data, headers=headers)
+    res = _decode_response(response)
     return res
 
 
@@ -1086,9 +1662,9 @@ def get_motion_gait_state():
 
 
     """
-    motion_url = basic_url + "motions/gait"
-    response = requests.get(url=motion_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    motion_url = _get_basic_url()+"motions/gait"
+    response = _get_session().get(url=motion_url, headers=headers)
+    res = _decode_response(response)
     return res
 
 
@@ -1108,10 +1684,10 @@ def exit_motion_gait():
                 }
 
     """
-    motion_url = basic_url + "motions/gait"
+    motion_url = _get_basic_url()+"motions/gait"
     payload = {"timestamp": 0}
-    response = requests.delete(url=motion_url, headers=headers,data = json.dumps(payload))
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().delete(url=motion_url, headers=headers,data = json.dumps(payload))
+    res = _decode_response(response)
     return res
 
 
@@ -1131,15 +1707,20 @@ def sync_do_motion_gait(speed_v: int = 0, speed_h: int = 0, steps: int = 0, peri
     """
     # No stand up, since we could do multiple times
     t = int(time.time() * 1000)
-    res = control_motion_gait(speed_v = speed_v, speed_h = speed_h, steps = steps, period = period, wave = wave)
-    if res['code'] != 0:
-        logging.error("do motion gait failed error code = %d msg = %s",res.get("code",-1),res.get("msg","unknow error"))
-        return False
-    coroutine = __wait_result_gait(start_time=t, type='start', getFuc=get_motion_gait_state)
-    loop = asyncio.get_event_loop()
-    tasks = loop.create_task(coroutine)
-    loop.run_until_complete(tasks)
-    return True
+    waiter = _subscribe_completion("gait")
+    try:
+        res = control_motion_gait(speed_v = speed_v, speed_h = speed_h, steps = steps, period = period, wave = wave, timestamp = t)
+        if res['code'] != 0:
+            logging.error("do motion gait failed error code = %d msg = %s",res.get("code",-1),res.get("msg","unknow error"))
+            return False
+        coroutine = __wait_result_gait(start_time=t, type='start', getFuc=get_motion_gait_state, waiter=waiter)
+        loop = _get_event_loop()
+        tasks = loop.create_task(coroutine)
+        loop.run_until_complete(tasks)
+    finally:
+        if waiter is not None:
+            waiter.close()
+    return __resIsSuccess(tasks.result())
 ####aprilTag
 def get_aprilTag_recognition_status():
     """查询aprilTag 识别状态
@@ -1161,20 +1742,21 @@ def get_aprilTag_recognition_status():
                     "msg":""
                 }
     """
-    servos_url = basic_url+"visions/aprilTag"
-    response = requests.get(url=servos_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    servos_url = _get_basic_url()+"visions/aprilTag"
+    response = _get_session().get(url=servos_url, headers=headers)
+    res = _decode_response(response)
     if not __resIsSuccess(res):
         logging.error("error code = %d msg = %s",res.get("code",-1),res.get("msg",""))
         return -1
     return res
 
 PaprilTagStream = None
-def start_aprilTag_recognition(tags: List,enableStream: bool = False):
+def start_aprilTag_recognition(tags: List,enableStream: bool = False, showWindow: bool = True):
     """开启aprilTag识别
     Args:
         tags:需要识别的apriltag id 及 size
         enableStream:是否需要打开视频流
+        showWindow:是否弹窗显示视频流，False时不启动显示进程，可以用stream_frames(res["streamUrl"])自行读取视频帧
     Returns:
            Dict:
            e.g::
@@ -1185,7 +1767,7 @@ def start_aprilTag_recognition(tags: List,enableStream: bool = False):
                     stream_url:string 视频流地址
                 }
     """
-    motion_url = basic_url + "visions/aprilTag"
+    motion_url = _get_basic_url()+"visions/aprilTag"
     # aprilTags = []
     # for key,value in tags.items():
     #     tag = {"id":key,"size":value}
@@ -1196,10 +1778,10 @@ def start_aprilTag_recognition(tags: List,enableStream: bool = False):
                 "remote_stream_enable":enableStream
             }
     json_data = json.dumps(param)
-    response = requests.put(url=motion_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().put(url=motion_url, data=json_data, headers=headers)
+    res = _decode_response(response)
     global PaprilTagStream
-    global ip
+    ip = _get_robot_ip()
     streamUrl = ""
     if not (PaprilTagStream is None) and PaprilTagStream.is_alive():
        return res
@@ -1209,57 +1791,50 @@ def start_aprilTag_recognition(tags: List,enableStream: bool = False):
             if ip != "127.0.0.1":
                 port = res["streamUrl"][7:][res["streamUrl"][7:].find(':') + 1:]
                 streamUrl = "http://" + ip + ":" + port
-        PaprilTagStream=Process(target=__openStreamWindow,args=('aprilTag',streamUrl,ip)) #必须加,号
-        PaprilTagStream.start()
+        res["streamUrl"] = streamUrl
+        if showWindow:
+            PaprilTagStream=multiprocessing.Process(target=__openStreamWindow,args=('aprilTag',streamUrl,ip)) #必须加,号
+            PaprilTagStream.start()
     return res
 
-def __openStreamWindow(windowName,url,ip_addr:str = ip):
-    camera = cv2.VideoCapture(url)
-    ret = camera.isOpened()
-    counter = 0
-    if not ret:
+def __openStreamWindow(windowName,url,ip_addr:str = "127.0.0.1"):
+    grabber = FrameGrabber(url, retries = 3)
+    grabber.start()
+    frame, timestamp, index = grabber.read(timeout = 10)
+    if frame is None:
         print('Unable to accquire data')
+        grabber.stop()
         cv2.destroyAllWindows()
         cv2.waitKey(1)
         if windowName == "aprilTag":
-            yan_api_init(ip_addr)
-            __stop_aprilTag_recognition()
+            YanRobot(ip_addr).call(__stop_aprilTag_recognition)
         return
     try:
         while True:
-            ret, frame = camera.read()
-            if not ret:
-                print('fail to read data, ip may not correct')
-                if counter > 2:
+            if frame is None:
+                if not grabber.running:
+                    print('fail to read data, ip may not correct')
                     print('maximum 2 retry occur, exit...')
                     cv2.destroyAllWindows()
                     cv2.waitKey(1)
-                    camera.release()
                     exit(0)
-                else:
-                    # cv2.destroyAllWindows()
-                    print('retry  VideoCapture')
-                    cv2.waitKey(1)
-                    camera.release()
-                    counter += 1
-                    camera = cv2.VideoCapture(url)
-                    continue
             else:
-                counter = 0
-            cv2.imshow(windowName, frame)
+                cv2.imshow(windowName, frame)
             cv2.waitKey(1)
             if cv2.getWindowProperty(windowName, cv2.WND_PROP_VISIBLE) <= 0 and sys.platform != "darwin":
                if windowName == "aprilTag":
-                    yan_api_init(ip_addr)
-                    __stop_aprilTag_recognition()
+                    YanRobot(ip_addr).call(__stop_aprilTag_recognition)
                break
+            #等待新帧时保持窗口响应
+            frame, timestamp, index = grabber.read(timeout = 0.05)
     except:
         print('program crash')
         if windowName == "aprilTag":
-            yan_api_init(ip_addr)
-            __stop_aprilTag_recognition()
+            YanRobot(ip_addr).call(__stop_aprilTag_recognition)
         cv2.destroyAllWindows()
         cv2.waitKey(1)
+    finally:
+        grabber.stop()
 
 def __stop_aprilTag_recognition():
     """关闭aprilTag识别
@@ -1272,15 +1847,15 @@ def __stop_aprilTag_recognition():
                     msg:string提示信息
                 }
     """
-    motion_url = basic_url + "visions/aprilTag"
+    motion_url = _get_basic_url()+"visions/aprilTag"
     timestamp = int(time.time()*1000)
     param = {
             "operation": "stop",
             "timestamp": timestamp
             }
     json_data = json.dumps(param)
-    response = requests.put(url=motion_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().put(url=motion_url, data=json_data, headers=headers)
+    res = _decode_response(response)
     return res
 
 def stop_aprilTag_recognition():
@@ -1317,18 +1892,19 @@ def get_QR_code_recognition_status():
                     "msg":""
                 }
     """
-    servos_url = basic_url+"visions/QR"
-    response = requests.get(url=servos_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    servos_url = _get_basic_url()+"visions/QR"
+    response = _get_session().get(url=servos_url, headers=headers)
+    res = _decode_response(response)
     if not __resIsSuccess(res):
         logging.error("error code = %d msg = %s",res.get("code",-1),res.get("msg",""))
     return res
 
 PqrStream = None
-def start_QR_code_recognition(enableStream: bool = False):
+def start_QR_code_recognition(enableStream: bool = False, showWindow: bool = True):
     """开启二维码识别
     Args:
-        timeOut:最大等待时间 单位（秒）传0表示永久等待
+        enableStream:是否需要打开视频流
+        showWindow:是否弹窗显示视频流，False时不启动显示进程，可以用stream_frames(res["streamUrl"])自行读取视频帧
     Returns:
         Dict:
            e.g::
@@ -1338,16 +1914,16 @@ def start_QR_code_recognition(enableStream: bool = False):
                 }
         
     """
-    motion_url = basic_url + "visions/QR"
+    motion_url = _get_basic_url()+"visions/QR"
     param = {
               "operation": "start",
               "remote_stream_enable":enableStream
             }
     json_data = json.dumps(param)
-    response = requests.put(url=motion_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().put(url=motion_url, data=json_data, headers=headers)
+    res = _decode_response(response)
     global PqrStream
-    global ip
+    ip = _get_robot_ip()
     streamUrl = ""
     if not (PqrStream is None) and PqrStream.is_alive():
        PqrStream.terminate()
@@ -1358,8 +1934,10 @@ def start_QR_code_recognition(enableStream: bool = False):
             if ip != "127.0.0.1":
                 port = res["streamUrl"][7:][res["streamUrl"][7:].find(':') + 1:]
                 streamUrl = "http://" + ip + ":" + port
-        PqrStream=Process(target=__openStreamWindow,args=('qrCode',streamUrl)) #必须加,号
-        PqrStream.start()
+        res["streamUrl"] = streamUrl
+        if showWindow:
+            PqrStream=multiprocessing.Process(target=__openStreamWindow,args=('qrCode',streamUrl)) #必须加,号
+            PqrStream.start()
     return res
 
 def stop_QR_code_recognition():
@@ -1372,13 +1950,13 @@ def stop_QR_code_recognition():
                     msg:string提示信息
                 }
     """
-    motion_url = basic_url + "visions/QR"
+    motion_url = _get_basic_url()+"visions/QR"
     param = {
                 "operation": "stop",
             }
     json_data = json.dumps(param)
-    response = requests.put(url=motion_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().put(url=motion_url, data=json_data, headers=headers)
+    res = _decode_response(response)
     global PqrStream
     if not (PqrStream is None) and PqrStream.is_alive():
         PqrStream.terminate()
@@ -1405,7 +1983,7 @@ def sync_do_QR_code_recognition(timeOut:int = 8):
         logging.error("start QR code recognition failed error code = %d msg = %s",res.get("code",-1),res.get("msg","unknow error"))
         return res
     coroutine = __wait_result_QR(get_QR_code_recognition_status,timeOut,True)
-    loop = asyncio.get_event_loop()
+    loop = _get_event_loop()
     tasks = loop.create_task(coroutine)
     loop.run_until_complete(tasks)
     return tasks.result()
@@ -1423,9 +2001,9 @@ def get_object_tracking_status():
                     "msg":"Success"
                 }
     """
-    object_tracking_url = basic_url+"visions/object/tracking"
-    response = requests.get(url=object_tracking_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    object_tracking_url = _get_basic_url()+"visions/object/tracking"
+    response = _get_session().get(url=object_tracking_url, headers=headers)
+    res = _decode_response(response)
     if not __resIsSuccess(res):
         logging.error("error code = %d msg = %s",res.get("code",-1),res.get("msg",""))
     return res
@@ -1454,13 +2032,13 @@ def start_object_tracking(name: str = "", width: int = 0, height: int = 0):
                     "msg":"Success"
                 }
     """
-    object_tracking_url = basic_url+"visions/object/tracking"
+    object_tracking_url = _get_basic_url()+"visions/object/tracking"
     if name != "":
         msg = {"operation":"start", "name":name, "width":width, "height": height}
     else:
         msg = {"operation":"start"}
-    response = requests.put(url=object_tracking_url, data = json.dumps(msg), headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().put(url=object_tracking_url, data = json.dumps(msg), headers=headers)
+    res = _decode_response(response)
     if not __resIsSuccess(res):
         logging.error("error code = %d msg = %s",res.get("code",-1),res.get("msg",""))
     return res
@@ -1476,10 +2054,10 @@ def stop_object_tracking():
                     "msg":"Success"
                 }
     """
-    object_tracking_url = basic_url+"visions/object/tracking"
+    object_tracking_url = _get_basic_url()+"visions/object/tracking"
     msg = {"operation":"stop"}
-    response = requests.put(url=object_tracking_url, data = json.dumps(msg), headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().put(url=object_tracking_url, data = json.dumps(msg), headers=headers)
+    res = _decode_response(response)
     if not __resIsSuccess(res):
         logging.error("error code = %d msg = %s",res.get("code",-1),res.get("msg",""))
     return res
@@ -1500,10 +2078,10 @@ def config_object_tracking(track_timeout: int, detect_timeout: int):
                     "msg":"Success"
                 }
     """
-    object_tracking_config_url = basic_url+"visions/object/tracking/config"
+    object_tracking_config_url = _get_basic_url()+"visions/object/tracking/config"
     msg = {"track_timeout":track_timeout, "detect_timeout":detect_timeout}
-    response = requests.put(url=object_tracking_config_url, data = json.dumps(msg), headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().put(url=object_tracking_config_url, data = json.dumps(msg), headers=headers)
+    res = _decode_response(response)
     if not __resIsSuccess(res):
         logging.error("error code = %d msg = %s",res.get("code",-1),res.get("msg",""))
     return res
@@ -1562,10 +2140,10 @@ def get_servo_angle_value(name:str):
         >>> res = YanAPI.get_servo_angle_value("RightShoulderFlex")
 
     """
-    servos_url = basic_url+"servos/angles"
+    servos_url = _get_basic_url()+"servos/angles"
     params = {'names':[name]}
-    response = requests.get(url=servos_url, headers=headers, params=params)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().get(url=servos_url, headers=headers, params=params)
+    res = _decode_response(response)
     if not __resIsSuccess(res):
         logging.error("error code = %d msg = %s",res.get("code",-1),res.get("msg",""))
         return -1
@@ -1655,10 +2233,10 @@ def get_servos_angles(names: List[str]):
             print (res["data"])
 
     """
-    servos_url = basic_url+"servos/angles"
+    servos_url = _get_basic_url()+"servos/angles"
     params = {'names': names}
-    response = requests.get(url=servos_url, headers=headers, params=params)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().get(url=servos_url, headers=headers, params=params)
+    res = _decode_response(response)
     return res
 
 
@@ -1718,11 +2296,15 @@ def set_servos_angles(angles: Dict[str, int], runtime: int = 200):
                 }
 
     """
-    servos_url = basic_url+"servos/angles"
+    angles, error = _limit_servo_angles(angles)
+    if error:
+        logging.error(error)
+        return {"code": -1, "data": {}, "msg": error}
+    servos_url = _get_basic_url()+"servos/angles"
     param = {"angles": angles, "runtime": runtime}
     json_data = json.dumps(param)
-    response = requests.put(url=servos_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().put(url=servos_url, data=json_data, headers=headers)
+    res = _decode_response(response)
     return res
 
 def set_servos_angles_layers(data: Dict[str,Dict[int,int]]):
@@ -1763,11 +2345,15 @@ def set_servos_angles_layers(data: Dict[str,Dict[int,int]]):
                 }
 
     """
-    servos_url = basic_url+"servos/angles/layers"
+    data, error = _limit_servo_layers(data)
+    if error:
+        logging.error(error)
+        return {"code": -1, "data": {}, "msg": error}
+    servos_url = _get_basic_url()+"servos/angles/layers"
     param = {"data": data}
     json_data = json.dumps(param)
-    response = requests.put(url=servos_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().put(url=servos_url, data=json_data, headers=headers)
+    res = _decode_response(response)
     return res
 
 def sync_set_servo_rotate(angles: Dict[str, int], runtime: int = 200):
@@ -1829,7 +2415,7 @@ def sync_set_servo_rotate(angles: Dict[str, int], runtime: int = 200):
         logging.error("set servo failed error code = %d msg = %s",res.get("code",-1),res.get("msg","unknow error"))
         return res
     coroutine = __wait_result_by_time(runtime / 1000) # ms --> s
-    loop = asyncio.get_event_loop()
+    loop = _get_event_loop()
     tasks = loop.create_task(coroutine)
     loop.run_until_complete(tasks)
     return res
@@ -1904,10 +2490,10 @@ def get_servos_mode(names: List[str]):
             }
 
     """
-    servos_url = basic_url+"servos/mode"
+    servos_url = _get_basic_url()+"servos/mode"
     params = {"names": names}
-    response = requests.get(url=servos_url, headers=headers, params=params)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().get(url=servos_url, headers=headers, params=params)
+    res = _decode_response(response)
     return res
 
 
@@ -1934,13 +2520,13 @@ def set_servos_mode(mode: str, servos: List[str]):
                 }
 
     """
-    servos_url = basic_url+"servos/mode"
+    servos_url = _get_basic_url()+"servos/mode"
     param = {"mode": mode, "servos": []}
     for i in range(len(servos)):
         param["servos"].append({"name": servos[i]})
     json_data = json.dumps(param)
-    response = requests.put(url=servos_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().put(url=servos_url, data=json_data, headers=headers)
+    res = _decode_response(response)
     return res
 
 ####Sensors####
@@ -1999,12 +2585,12 @@ def __set_sensors(operation: str, id: int, type: str, value: int = 0):
                 }
 
     """
-    sensors_url = basic_url+"sensors"
+    sensors_url = _get_basic_url()+"sensors"
     param = {"operation": operation, "sensor":
              {"id": id, "type": type, "value": value}}
     json_data = json.dumps(param)
-    response = requests.put(url=sensors_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().put(url=sensors_url, data=json_data, headers=headers)
+    res = _decode_response(response)
     return res
 
 def get_sensors_list_value():
@@ -2019,9 +2605,9 @@ def get_sensors_list_value():
                 ]
 
     """
-    sensor_url = basic_url+"sensors/list"
-    response = requests.get(url=sensor_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    sensor_url = _get_basic_url()+"sensors/list"
+    response = _get_session().get(url=sensor_url, headers=headers)
+    res = _decode_response(response)
     if not __resIsSuccess(res):
         logging.error("error code = %d msg = %s",res.get("code",-1),res.get("msg",""))
         return []
@@ -2034,6 +2620,7 @@ def get_sensors_list_value():
     return sensorsName
 
 
+@_cached
 def get_sensors_list():
     """获取所有传感器的列表
 
@@ -2058,9 +2645,10 @@ def get_sensors_list():
                 }
 
     """
-    sensor_url = basic_url+"sensors/list"
-    response = requests.get(url=sensor_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    sensor_url = _get_basic_url()+"sensors/list"
+    response = _get_session().get(url=sensor_url, headers=headers)
+    #结果会被缓存，直接完整解析
+    res = _decode_response(response)
     return res
 
 def get_sensors_environment_value():
@@ -2115,9 +2703,9 @@ def get_sensors_environment():
                 }
 
     """
-    sensor_url = basic_url+"sensors/environment"
-    response = requests.get(url=sensor_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    sensor_url = _get_basic_url()+"sensors/environment"
+    response = _get_session().get(url=sensor_url, headers=headers)
+    res = _decode_response(response, http_lazy_decode)
     return res
 
 
@@ -2154,9 +2742,9 @@ def get_sensors_gyro():
                 }
 
     """
-    sensor_url = basic_url+"sensors/gyro"
-    response = requests.get(url=sensor_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    sensor_url = _get_basic_url()+"sensors/gyro"
+    response = _get_session().get(url=sensor_url, headers=headers)
+    res = _decode_response(response, http_lazy_decode)
     return res
 
 def get_sensors_infrared_value():
@@ -2202,19 +2790,19 @@ def get_sensors_infrared(id: List[int] = None, slot: List[int] = None):
                 }
 
     """
-    sensor_url = basic_url+"sensors/infrared"
+    sensor_url = _get_basic_url()+"sensors/infrared"
     if (id != None) and (slot == None):
         params = {"id": id}
-        response = requests.get(url=sensor_url, headers=headers, params=params)
+        response = _get_session().get(url=sensor_url, headers=headers, params=params)
     elif (id == None) and (slot != None):
         params = {"slot": slot}
-        response = requests.get(url=sensor_url, headers=headers, params=params)
+        response = _get_session().get(url=sensor_url, headers=headers, params=params)
     elif (id != None) and (slot != None):
         params = {"id": id, "slot": slot}
-        response = requests.get(url=sensor_url, headers=headers, params=params)
+        response = _get_session().get(url=sensor_url, headers=headers, params=params)
     else:
-        response = requests.get(url=sensor_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+        response = _get_session().get(url=sensor_url, headers=headers)
+    res = _decode_response(response, http_lazy_decode)
     return res
 
 def get_sensors_pressure_value():
@@ -2260,19 +2848,19 @@ def get_sensors_pressure(id: List[int] = None, slot: List[int] = None):
                 }
 
     """
-    sensor_url = basic_url+"sensors/pressure"
+    sensor_url = _get_basic_url()+"sensors/pressure"
     if (id != None) and (slot == None):
         params = {"id": id}
-        response = requests.get(url=sensor_url, headers=headers, params=params)
+        response = _get_session().get(url=sensor_url, headers=headers, params=params)
     elif (id == None) and (slot != None):
         params = {"slot": slot}
-        response = requests.get(url=sensor_url, headers=headers, params=params)
+        response = _get_session().get(url=sensor_url, headers=headers, params=params)
     elif (id != None) and (slot != None):
         params = {"id": id, "slot": slot}
-        response = requests.get(url=sensor_url, headers=headers, params=params)
+        response = _get_session().get(url=sensor_url, headers=headers, params=params)
     else:
-        response = requests.get(url=sensor_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+        response = _get_session().get(url=sensor_url, headers=headers)
+    res = _decode_response(response, http_lazy_decode)
     return res
 
 def get_sensors_touch_value():
@@ -2318,19 +2906,19 @@ def get_sensors_touch(id: int = None, slot: List[int] = None):
                 }
 
     """
-    sensor_url = basic_url+"sensors/touch"
+    sensor_url = _get_basic_url()+"sensors/touch"
     if (id != None) and (slot == None):
         params = {"id": id}
-        response = requests.get(url=sensor_url, headers=headers, params=params)
+        response = _get_session().get(url=sensor_url, headers=headers, params=params)
     elif (id == None) and (slot != None):
         params = {"slot": slot}
-        response = requests.get(url=sensor_url, headers=headers, params=params)
+        response = _get_session().get(url=sensor_url, headers=headers, params=params)
     elif (id != None) and (slot != None):
         params = {"id": id, "slot": slot}
-        response = requests.get(url=sensor_url, headers=headers, params=params)
+        response = _get_session().get(url=sensor_url, headers=headers, params=params)
     else:
-        response = requests.get(url=sensor_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+        response = _get_session().get(url=sensor_url, headers=headers)
+    res = _decode_response(response, http_lazy_decode)
     return res
 
 def get_sensors_ultrasonic_value():
@@ -2376,19 +2964,19 @@ def get_sensors_ultrasonic(id=None, slot=None):
                 }
 
     """
-    sensor_url = basic_url+"sensors/ultrasonic"
+    sensor_url = _get_basic_url()+"sensors/ultrasonic"
     if (id != None) and (slot == None):
         params = {"id": id}
-        response = requests.get(url=sensor_url, headers=headers, params=params)
+        response = _get_session().get(url=sensor_url, headers=headers, params=params)
     elif (id == None) and (slot != None):
         params = {"slot": slot}
-        response = requests.get(url=sensor_url, headers=headers, params=params)
+        response = _get_session().get(url=sensor_url, headers=headers, params=params)
     elif (id != None) and (slot != None):
         params = {"id": id, "slot": slot}
-        response = requests.get(url=sensor_url, headers=headers, params=params)
+        response = _get_session().get(url=sensor_url, headers=headers, params=params)
     else:
-        response = requests.get(url=sensor_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+        response = _get_session().get(url=sensor_url, headers=headers)
+    res = _decode_response(response, http_lazy_decode)
     return res
 
 ####Voice####
@@ -2408,9 +2996,9 @@ def stop_voice_asr():
                 }
 
     """
-    voice_url = basic_url+"voice/asr"
-    response = requests.delete(url=voice_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    voice_url = _get_basic_url()+"voice/asr"
+    response = _get_session().delete(url=voice_url, headers=headers)
+    res = _decode_response(response)
     return res
 
 
@@ -2433,12 +3021,9 @@ def get_voice_asr_state():
                 }
 
     """
-    voice_url = basic_url+"voice/asr"
-    response = requests.get(url=voice_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
-    dataStr = res["data"].strip(b'\x00'.decode())
-    res["data"] = json.loads(dataStr)
-    return res
+    voice_url = _get_basic_url()+"voice/asr"
+    response = _get_session().get(url=voice_url, headers=headers)
+    return _decode_nested(_decode_response(response))
 
 
 def start_voice_asr(continues=False, timestamp=0):
@@ -2461,11 +3046,11 @@ def start_voice_asr(continues=False, timestamp=0):
                 }
 
     """
-    voice_url = basic_url+"voice/asr"
+    voice_url = _get_basic_url()+"voice/asr"
     param = {"continues": continues, "timestamp": timestamp}
     json_data = json.dumps(param)
-    response = requests.put(url=voice_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().put(url=voice_url, data=json_data, headers=headers)
+    res = _decode_response(response)
     return res
 
 def sync_do_voice_asr_value():
@@ -2484,7 +3069,7 @@ def sync_do_voice_asr_value():
     timestamp = int(time.time())
     start_voice_asr(timestamp=timestamp)
     coroutine = __wait_result(timestamp,get_voice_asr_state)
-    loop = asyncio.get_event_loop()
+    loop = _get_event_loop()
     tasks = loop.create_task(coroutine)
     loop.run_until_complete(tasks)
     res = tasks.result()
@@ -2518,7 +3103,7 @@ def sync_do_voice_asr():
     coroutine = __wait_result(timestamp, get_voice_asr_state)
     # result = asyncio.run(coroutine)
 
-    loop = asyncio.get_event_loop()
+    loop = _get_event_loop()
     tasks = loop.create_task(coroutine)
     loop.run_until_complete(tasks)
     return tasks.result()
@@ -2542,11 +3127,11 @@ def delete_voice_asr_offline_syntax(grammar: str):
                 }
 
     """
-    voice_url = basic_url+"voice/asr/offlinesyntax"
+    voice_url = _get_basic_url()+"voice/asr/offlinesyntax"
     param = {"grammar": grammar}
     json_data = json.dumps(param)
-    response = requests.delete(url=voice_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().delete(url=voice_url, data=json_data, headers=headers)
+    res = _decode_response(response)
     return res
 
 
@@ -2602,10 +3187,10 @@ def get_voice_asr_offline_syntax(grammar: str):
             }
 
     """
-    voice_url = basic_url+"voice/asr/offlinesyntax"
+    voice_url = _get_basic_url()+"voice/asr/offlinesyntax"
     params = {"body": grammar}
-    response = requests.get(url=voice_url, headers=headers, params=params)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().get(url=voice_url, headers=headers, params=params)
+    res = _decode_response(response)
     return res
 
 
@@ -2652,11 +3237,11 @@ def create_voice_asr_offline_syntax(object: Dict):
                 }
 
     """
-    voice_url = basic_url+"voice/asr/offlinesyntax"
+    voice_url = _get_basic_url()+"voice/asr/offlinesyntax"
     param = object
     json_data = json.dumps(param)
-    response = requests.post(url=voice_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().post(url=voice_url, data=json_data, headers=headers)
+    res = _decode_response(response)
     return res
 
 
@@ -2705,11 +3290,11 @@ def update_voice_asr_offline_syntax(object: Dict):
                 }
 
     """
-    voice_url = basic_url+"voice/asr/offlinesyntax"
+    voice_url = _get_basic_url()+"voice/asr/offlinesyntax"
     param = object
     json_data = json.dumps(param)
-    response = requests.put(url=voice_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().put(url=voice_url, data=json_data, headers=headers)
+    res = _decode_response(response)
     return res
 
 
@@ -2735,9 +3320,9 @@ def get_voice_asr_offline_syntax_grammars():
                 }
 
     """
-    voice_url = basic_url+"voice/asr/offlinesyntax/grammars"
-    response = requests.get(url=voice_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    voice_url = _get_basic_url()+"voice/asr/offlinesyntax/grammars"
+    response = _get_session().get(url=voice_url, headers=headers)
+    res = _decode_response(response)
     return res
 
 
@@ -2754,9 +3339,9 @@ def stop_voice_iat():
                 }
 
     """
-    voice_url = basic_url+"voice/iat"
-    response = requests.delete(url=voice_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    voice_url = _get_basic_url()+"voice/iat"
+    response = _get_session().delete(url=voice_url, headers=headers)
+    res = _decode_response(response)
     return res
 
 
@@ -2779,12 +3364,9 @@ def get_voice_iat():
                 }
 
     """
-    voice_url = basic_url+"voice/iat"
-    response = requests.get(url=voice_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
-    res["data"] = json.loads(res["data"].strip(
-        b'\x00'.decode()))
-    return res
+    voice_url = _get_basic_url()+"voice/iat"
+    response = _get_session().get(url=voice_url, headers=headers)
+    return _decode_nested(_decode_response(response))
 
 
 def start_voice_iat(timestamp: int = 0):
@@ -2806,11 +3388,11 @@ def start_voice_iat(timestamp: int = 0):
                 }
 
     """
-    voice_url = basic_url+"voice/iat"
+    voice_url = _get_basic_url()+"voice/iat"
     param = {"timestamp": timestamp}
     json_data = json.dumps(param)
-    response = requests.put(url=voice_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().put(url=voice_url, data=json_data, headers=headers)
+    res = _decode_response(response)
     return res
 
 def sync_do_voice_iat_value():
@@ -2825,7 +3407,7 @@ def sync_do_voice_iat_value():
     if not successed:
         return ""
     coroutine = __wait_result(timestamp,get_voice_iat)
-    loop = asyncio.get_event_loop()
+    loop = _get_event_loop()
     task = loop.create_task(coroutine)
     loop.run_until_complete(task)
     res = task.result()
@@ -2868,7 +3450,7 @@ def sync_do_voice_iat():
         logging.error("do voice iat failed error code = %d msg = %s",res.get("code",-1),res.get("msg","unknow error"))
         return res
     coroutine = __wait_result(timestamp, get_voice_iat)
-    loop = asyncio.get_event_loop()
+    loop = _get_event_loop()
     task = loop.create_task(coroutine)
     loop.run_until_complete(task)
     #result = asyncio.run(coroutine)
@@ -2889,9 +3471,9 @@ def stop_voice_tts():
                 }
 
     """
-    voice_url = basic_url+"voice/tts"
-    response = requests.delete(url=voice_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    voice_url = _get_basic_url()+"voice/tts"
+    response = _get_session().delete(url=voice_url, headers=headers)
+    res = _decode_response(response)
     return res
 
 
@@ -2920,15 +3502,12 @@ def get_voice_tts_state(timestamp: int = None):
                 }
 
     """
-    voice_url = basic_url+"voice/tts"
-    response = requests.get(url=voice_url, headers=headers)
+    voice_url = _get_basic_url()+"voice/tts"
+    response = _get_session().get(url=voice_url, headers=headers)
     if timestamp != None:
         params = {'timestamp': timestamp}
-        response = requests.get(url=voice_url, headers=headers, params=params)
-    res = json.loads(str(response.content.decode("utf-8")))
-    res["data"] = json.loads(
-        str(res["data"].strip(b'\x00'.decode())))
-    return res
+        response = _get_session().get(url=voice_url, headers=headers, params=params)
+    return _decode_nested(_decode_response(response))
 
 
 def start_voice_tts(tts: str = "", interrupt: bool = True, timestamp: int = 0):
@@ -2952,11 +3531,11 @@ def start_voice_tts(tts: str = "", interrupt: bool = True, timestamp: int = 0):
                 }
 
     """
-    voice_url = basic_url+"voice/tts"
+    voice_url = _get_basic_url()+"voice/tts"
     param = {"tts": tts, "interrupt": interrupt, "timestamp": timestamp}
     json_data = json.dumps(param)
-    response = requests.put(url=voice_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().put(url=voice_url, data=json_data, headers=headers)
+    res = _decode_response(response)
     return res
 
 
@@ -2990,7 +3569,7 @@ def sync_do_tts(tts: str = "", interrupt: bool = True):
         logging.error("do tts failed error code = %d msg = %s",res.get("code",-1),res.get("msg","unknow error"))
         return res
     coroutine = __wait_result_common(timestamp=t, getFuc=get_voice_tts_state, args=(t,))
-    loop = asyncio.get_event_loop()
+    loop = _get_event_loop()
     tasks = loop.create_task(coroutine)
     loop.run_until_complete(tasks)
     # Success Example
@@ -3040,10 +3619,10 @@ def get_visual_task_result(option: str, type: str):
                 }
 
     """
-    visions_url = basic_url+"visions"
+    visions_url = _get_basic_url()+"visions"
     params = {'option': option, 'type': type}
-    response = requests.get(url=visions_url, headers=headers, params=params)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().get(url=visions_url, headers=headers, params=params)
+    res = _decode_response(response)
     return res
 
 
@@ -3092,12 +3671,12 @@ def __control_visual_task(option: str, type: str, operation: str = "start", time
                 }
 
     """
-    visions_url = basic_url+"visions"
+    visions_url = _get_basic_url()+"visions"
     param = {"option": option, "type": type,
              "operation": operation, "timestamp": timestamp}
     json_data = json.dumps(param)
-    response = requests.put(url=visions_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().put(url=visions_url, data=json_data, headers=headers)
+    res = _decode_response(response)
     return res
 
 def start_face_recognition(type: str, timestamp: int = 0):
@@ -3167,7 +3746,7 @@ def sync_do_face_recognition_value(type:str):
     if not startSuccess:
         return None
     coroutine = __wait_result_common(timestamp=timestamp, getFuc=get_visual_task_result, args=("face", type))
-    loop = asyncio.get_event_loop()
+    loop = _get_event_loop()
     tasks = loop.create_task(coroutine)
     loop.run_until_complete(tasks)
     ret = tasks.result()
@@ -3214,7 +3793,7 @@ def sync_do_face_recognition(type: str):
         logging.error("do face recognition failed error code = %d msg = %s",res.get("code",-1),res.get("msg","unknow error"))
         return res
     coroutine = __wait_result_common(timestamp=timestamp, getFuc=get_visual_task_result, args=("face", type))
-    loop = asyncio.get_event_loop()
+    loop = _get_event_loop()
     tasks = loop.create_task(coroutine)
     loop.run_until_complete(tasks)
     return tasks.result()
@@ -3289,7 +3868,7 @@ def sync_do_gesture_recognition():
         logging.error("do gesture recognition failed error code = %d msg = %s",res.get("code",-1),res.get("msg","unknow error"))
         return res
     coroutine = __wait_result_common(timestamp=timestamp, getFuc=get_visual_task_result, args=("hand",'gesture'))
-    loop = asyncio.get_event_loop()
+    loop = _get_event_loop()
     tasks = loop.create_task(coroutine)
     loop.run_until_complete(tasks)
     return tasks.result()
@@ -3361,7 +3940,7 @@ def sync_do_color_recognition():
         logging.error("do color recognition failed error code = %d msg = %s",res.get("code",-1),res.get("msg","unknow error"))
         return res
     coroutine = __wait_result_common(timestamp=timestamp, getFuc=get_visual_task_result, args=("color", "color_detect"))
-    loop = asyncio.get_event_loop()
+    loop = _get_event_loop()
     tasks = loop.create_task(coroutine)
     loop.run_until_complete(tasks)
     return tasks.result()
@@ -3431,7 +4010,7 @@ def sync_do_object_recognition():
         logging.error("do object recognition failed error code = %d msg = %s",res.get("code",-1),res.get("msg","unknow error"))
         return res
     coroutine = __wait_result_common(timestamp=timestamp, getFuc=get_visual_task_result, args=("object", "recognition"))
-    loop = asyncio.get_event_loop()
+    loop = _get_event_loop()
     tasks = loop.create_task(coroutine)
     loop.run_until_complete(tasks)
     return tasks.result()
@@ -3485,12 +4064,12 @@ def delete_vision_photo(name: str):
                 }
 
     """
-    visions_url = basic_url+"visions/photos"
+    visions_url = _get_basic_url()+"visions/photos"
     param = {"name": name}
     json_data = json.dumps(param)
-    response = requests.delete(
+    response = _get_session().delete(
         url=visions_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    res = _decode_response(response)
     return res
 
 
@@ -3505,15 +4084,121 @@ def get_vision_photo(name: str, savePath: str = "./"):
            data:图片内容
 
     """
-    visions_url = basic_url+"visions/photos"
+    visions_url = _get_basic_url()+"visions/photos"
     params = {'body': name}
-    response = requests.get(url=visions_url, headers=headers, params=params)
+    response = _get_session().get(url=visions_url, headers=headers, params=params)
     res = response.content
     with open(savePath+name, "wb") as fp:
         fp.write(res)
     return res
 
 
+def download_vision_photo(name: str, target = "./", chunk_size: int = 64 * 1024):
+    """流式下载指定名称的照片
+
+    按块写入磁盘或者调用方提供的缓冲区，不在内存中保留整张照片。
+    写入磁盘时先写到"照片名.part"，下载完成后再改名；上次中断留下的.part文件会用Range请求续传。
+
+    Args:
+        name(str):照片名
+        target:本地存储目录(str)，或者可写的缓冲区(bytearray/memoryview)
+        chunk_size(int):每次读取的字节数
+
+    Returns:
+        int:照片的字节数
+
+    Examples:
+        >>> buf = bytearray(4 * 1024 * 1024)
+            size = YanAPI.download_vision_photo("img_1.jpg", buf)
+            data = memoryview(buf)[:size]
+    """
+    visions_url = _get_basic_url()+"visions/photos"
+    params = {'body': name}
+    if not isinstance(target, str):
+        view = memoryview(target).cast("B")
+        offset = 0
+        with _get_session().get(url=visions_url, headers=headers, params=params, stream=True) as response:
+            response.raise_for_status()
+            _check_photo_response(response, name)
+            for chunk in response.iter_content(chunk_size):
+                if offset + len(chunk) > len(view):
+                    raise ValueError("buffer too small for photo %s" % name)
+                view[offset:offset + len(chunk)] = chunk
+                offset += len(chunk)
+        return offset
+    filePath = os.path.join(target, name)
+    partPath = filePath + ".part"
+    done = os.path.getsize(partPath) if os.path.exists(partPath) else 0
+    requestHeaders = dict(headers)
+    if done:
+        requestHeaders["Range"] = "bytes=%d-" % done
+    with _get_session().get(url=visions_url, headers=requestHeaders, params=params, stream=True) as response:
+        if response.status_code == 416 and done:
+            #上次已经写完但没有改名时.part就是完整的照片，否则删掉重新下载
+            total = response.headers.get("Content-Range", "").rpartition("/")[2]
+            if total == str(done):
+                os.replace(partPath, filePath)
+                return done
+            os.remove(partPath)
+            return download_vision_photo(name, target, chunk_size)
+        response.raise_for_status()
+        _check_photo_response(response, name)
+        #服务端不支持Range时返回完整内容，从头写
+        mode = "ab" if response.status_code == 206 else "wb"
+        with open(partPath, mode) as fp:
+            for chunk in response.iter_content(chunk_size):
+                fp.write(chunk)
+            size = fp.tell()
+    os.replace(partPath, filePath)
+    return size
+
+
+def _check_photo_response(response, name: str):
+    """机器人找不到照片等错误时返回json而不是图片，不能当作照片保存"""
+    if "json" not in response.headers.get("Content-Type", ""):
+        return
+    res = _parse_json(response.content)
+    raise ValueError("download photo %s failed: code = %s msg = %s" % (name, res.get("code", -1), res.get("msg", "")))
+
+
+def download_vision_photos(savePath: str = "./", names: List[str] = None, max_workers: int = 4, skip_existing: bool = True):
+    """并发下载照片到本地目录
+
+    Args:
+        savePath(str):照片本地存储目录
+        names(List[str]):需要下载的照片名，默认下载get_vision_photo_list中的所有照片
+        max_workers(int):同时下载的数量
+        skip_existing(bool):本地已经存在的照片不再下载
+
+    Returns:
+        Dict:{照片名: 字节数，跳过的照片为None，下载失败的照片为异常对象}
+    """
+    if names is None:
+        res = get_vision_photo_list()
+        if not __resIsSuccess(res):
+            logging.error("error code = %d msg = %s",res.get("code",-1),res.get("msg",""))
+            return {}
+        names = [item["name"] for item in res["data"]]
+    os.makedirs(savePath, exist_ok=True)
+    results = {}
+    futures = {}
+    with ThreadPoolExecutor(max_workers = max_workers) as executor:
+        for name in names:
+            if skip_existing and os.path.exists(os.path.join(savePath, name)):
+                results[name] = None
+                continue
+            #在线程池中保持当前机器人
+            context = contextvars.copy_context()
+            futures[name] = executor.submit(context.run, download_vision_photo, name, savePath)
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                logging.error("download photo %s failed: %s", name, e)
+                results[name] = e
+    return results
+
+
 def take_vision_photo(resolution: str = "640x480"):
     """拍一张照片
 
@@ -3533,11 +4218,11 @@ def take_vision_photo(resolution: str = "640x480"):
                 }
 
     """
-    visions_url = basic_url+"visions/photos"
+    visions_url = _get_basic_url()+"visions/photos"
     param = {"resolution": resolution}
     json_data = json.dumps(param)
-    response = requests.post(url=visions_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().post(url=visions_url, data=json_data, headers=headers)
+    res = _decode_response(response)
     return res
 
 
@@ -3562,9 +4247,9 @@ def get_vision_photo_list():
                 }
 
     """
-    visions_url = basic_url+"visions/photos/list"
-    response = requests.get(url=visions_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    visions_url = _get_basic_url()+"visions/photos/list"
+    response = _get_session().get(url=visions_url, headers=headers)
+    res = _decode_response(response)
     return res
 
 
@@ -3585,12 +4270,12 @@ def delete_vision_photo_sample(name: str):
                 }
 
     """
-    visions_url = basic_url+"visions/photosamples"
+    visions_url = _get_basic_url()+"visions/photosamples"
     param = {"name": name}
     json_data = json.dumps(param)
-    response = requests.delete(
+    response = _get_session().delete(
         url=visions_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    res = _decode_response(response)
     return res
 
 
@@ -3615,13 +4300,13 @@ def get_vision_photo_samples():
                 }
 
     """
-    visions_url = basic_url+"visions/photosamples"
-    response = requests.get(url=visions_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    visions_url = _get_basic_url()+"visions/photosamples"
+    response = _get_session().get(url=visions_url, headers=headers)
+    res = _decode_response(response)
     return res
 
 
-def upload_vision_photo_sample(filePath: str):
+def upload_vision_photo_sample(filePath: str, progress = None):
     """上传样本图片到特定文件夹
 
     默认Sample文件夹
@@ -3630,6 +4315,8 @@ def upload_vision_photo_sample(filePath: str):
     ----------
     filePath:str
         需要上传的文件路径
+    progress:
+        上传进度回调 progress(已发送字节数, 总字节数)
 
     Returns
     -------
@@ -3643,12 +4330,7 @@ def upload_vision_photo_sample(filePath: str):
             }
 
     """
-    visions_url = basic_url+"visions/photosamples"
-    headers = {'Authorization': 'multipart/form-data'}
-    files = {'file': open(filePath, 'rb')}
-    response = requests.post(url=visions_url, files=files, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
-    return res
+    return _upload_file("visions/photosamples", filePath, progress)
 
 
 def open_vision_stream(resolution: str = "640x480"):
@@ -3670,11 +4352,11 @@ def open_vision_stream(resolution: str = "640x480"):
                 }
 
     """
-    visions_url = basic_url+"visions/streams"
+    visions_url = _get_basic_url()+"visions/streams"
     param = {"resolution": resolution}
     json_data = json.dumps(param)
-    response = requests.post(url=visions_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().post(url=visions_url, data=json_data, headers=headers)
+    res = _decode_response(response)
     return res
 
 
@@ -3692,12 +4374,13 @@ def close_vision_stream():
                 }
 
     """
-    visions_url = basic_url+"visions/streams"
-    response = requests.delete(url=visions_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    visions_url = _get_basic_url()+"visions/streams"
+    response = _get_session().delete(url=visions_url, headers=headers)
+    res = _decode_response(response)
     return res
 
 
+@_invalidates("get_vision_tags")
 def delete_vision_tag(tag: str,mode:str = "all"):
     """删除指定标签
 
@@ -3715,15 +4398,16 @@ def delete_vision_tag(tag: str,mode:str = "all"):
                 }
 
     """
-    visions_url = basic_url+"visions/tags"
+    visions_url = _get_basic_url()+"visions/tags"
     param = {"tags": tag,"mode":mode}
     json_data = json.dumps(param)
-    response = requests.delete(
+    response = _get_session().delete(
         url=visions_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    res = _decode_response(response)
     return res
 
 
+@_cached
 def get_vision_tags():
     """获取样本标签列表
 
@@ -3764,12 +4448,13 @@ def get_vision_tags():
                      "msg": "Success"
                  }
     """
-    visions_url = basic_url+"visions/tags"
-    response = requests.get(url=visions_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    visions_url = _get_basic_url()+"visions/tags"
+    response = _get_session().get(url=visions_url, headers=headers)
+    res = _decode_response(response)
     return res
 
 
+@_invalidates("get_vision_tags")
 def set_vision_tag(resources: List[str], tag: str):
     """给已有样本图片打标签
 
@@ -3790,11 +4475,11 @@ def set_vision_tag(resources: List[str], tag: str):
                 }
 
     """
-    visions_url = basic_url+"visions/tags"
+    visions_url = _get_basic_url()+"visions/tags"
     param = {"resources": resources, "tags": tag}
     json_data = json.dumps(param)
-    response = requests.put(url=visions_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().put(url=visions_url, data=json_data, headers=headers)
+    res = _decode_response(response)
     return res
 
 def do_visions_visible(operation, task):
@@ -3814,11 +4499,11 @@ def do_visions_visible(operation, task):
     	msg:string 提示信息
 	}
     """
-    vision_visible_url = basic_url + "visions_visible"
+    vision_visible_url = _get_basic_url()+"visions_visible"
     param = {"operation":operation, "type":task}
     json_data = json.dumps(param)
-    response = requests.put(url = vision_visible_url, data = json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().put(url = vision_visible_url, data = json_data, headers=headers)
+    res = _decode_response(response)
     print(res)
     if operation == 'start':
         try:
@@ -3835,7 +4520,7 @@ def show_visions_result(operation):
 	返回类型 stream(mjpeg)
 	返回说明 视频流弹窗
     """
-    global ip
+    ip = _get_robot_ip()
     counter = 0
     #camera_list = [None, None, None]
     try:
@@ -3859,53 +4544,234 @@ def show_visions_result(operation):
         cv2.waitKey(1)
         do_visions_visible('stop',operation)
         return
-    camera = cv2.VideoCapture(url)
-    ret = camera.isOpened()
-    if not ret:
+    grabber = FrameGrabber(url, retries = 0)
+    grabber.start()
+    frame, timestamp, index = grabber.read(timeout = 10)
+    if frame is None:
         print('Unable to accquire data')
+        grabber.stop()
         cv2.destroyAllWindows()
         cv2.waitKey(1)
         do_visions_visible('stop',operation)
         return
     try:
-        while ret:
-            ret, frame = camera.read()
-            if not ret:
+        while True:
+            if frame is None:
+                if grabber.running:
+                    cv2.waitKey(1)
+                    frame, timestamp, index = grabber.read(timeout = 0.05)
+                    continue
                 print('fail to read data, ip may not correct')
                 if counter > 2:
                     print('maximum 2 retry occur, exit...')
                     cv2.destroyAllWindows()
                     cv2.waitKey(1)
-                    camera.release()
                     exit(0)
-                else:
-                    cv2.destroyAllWindows()
-                    cv2.waitKey(1)
-                    camera.release()
-                    counter += 1
-                    try:
-                        res = do_visions_visible('start',operation)
-                        url = res['data']['url']
-                        ret = 1 # give it a try...
-                    except:
-                         exit(0)
-                    print('new url --> %s' % url)
-                    camera = cv2.VideoCapture(url)
-                    continue
-            else:
-                counter = 0
+                cv2.destroyAllWindows()
+                cv2.waitKey(1)
+                counter += 1
+                try:
+                    res = do_visions_visible('start',operation)
+                    url = res['data']['url']
+                except:
+                     exit(0)
+                print('new url --> %s' % url)
+                grabber = FrameGrabber(url, retries = 0)
+                grabber.start()
+                frame, timestamp, index = grabber.read(timeout = 10)
+                continue
+            counter = 0
             cv2.imshow(operation, frame)
             cv2.waitKey(1)
             if cv2.getWindowProperty(operation, cv2.WND_PROP_VISIBLE) <= 0:
                 break
+            frame, timestamp, index = grabber.read(timeout = 0.05)
+        grabber.stop()
         cv2.destroyAllWindows()
         cv2.waitKey(1)
         do_visions_visible('stop',operation)
     except:
         print('program crash')
+        grabber.stop()
         cv2.destroyAllWindows()
         cv2.waitKey(1)
         do_visions_visible('stop',operation)
+
+class FrameGrabber(object):
+    """视频流后台抓帧
+
+    后台线程持续读取MJPEG视频流，只保留最新的一帧，处理速度跟不上时直接丢弃旧帧，避免帧堆积变旧。
+    使用三块预分配的图像缓冲区轮换(写入/最新/读取)，read()返回的图像不经过拷贝，
+    在下一次调用read()之前保持有效。
+
+    Args:
+        url(str): 视频流地址
+        retries(int): 读取失败时重新连接的次数，默认2
+
+    Examples:
+        >>> grabber = YanAPI.FrameGrabber("http://192.168.1.15:8000")
+            grabber.start()
+            frame, timestamp, index = grabber.read(timeout=1)
+            grabber.stop()
+    """
+    def __init__(self, url: str, retries: int = 2):
+        self.url = url
+        self.retries = retries
+        self.frames = 0
+        self.dropped = 0
+        self.failed = False
+        self._cond = threading.Condition()
+        self._writeBuf = None
+        self._latestBuf = None
+        self._readBuf = None
+        self._latestTime = 0.0
+        self._latestIndex = -1
+        self._readIndex = -1
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """开始抓帧"""
+        if self._running:
+            return
+        self._running = True
+        self.failed = False
+        self._thread = threading.Thread(target=self._run, name="yan-frame-grabber", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 2.0):
+        """停止抓帧，视频流由抓帧线程在当前读取返回后释放
+
+        Args:
+            timeout(float): 等待抓帧线程结束的最长时间，单位秒
+        """
+        #VideoCapture不是线程安全的，只能由抓帧线程在退出时释放
+        self._running = False
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout)
+            if self._thread.is_alive():
+                logging.warning("frame grabber for %s did not stop within %.1fs", self.url, timeout)
+        self._thread = None
+
+    @property
+    def running(self):
+        return self._running
+
+    def _run(self):
+        camera = cv2.VideoCapture(self.url)
+        counter = 0
+        try:
+            while self._running:
+                if camera.isOpened() and camera.grab():
+                    ret, image = camera.retrieve(self._writeBuf)
+                else:
+                    ret = False
+                if not ret:
+                    if counter >= self.retries:
+                        logging.error("read stream %s failed", self.url)
+                        self.failed = True
+                        break
+                    counter += 1
+                    camera.release()
+                    camera = cv2.VideoCapture(self.url)
+                    continue
+                counter = 0
+                with self._cond:
+                    #图像尺寸变化时retrieve会重新分配，之后继续复用新的缓冲区
+                    self._writeBuf, self._latestBuf = self._latestBuf, image
+                    if self._latestIndex > self._readIndex:
+                        self.dropped += 1
+                    self._latestIndex = self.frames
+                    self._latestTime = time.time()
+                    self.frames += 1
+                    self._cond.notify_all()
+        finally:
+            camera.release()
+            self._running = False
+            with self._cond:
+                self._cond.notify_all()
+
+    def read(self, timeout: float = None):
+        """获取比上一次read()更新的一帧
+
+        Args:
+            timeout(float): 最长等待时间，单位秒，None表示一直等待
+
+        Returns:
+            tuple: (frame, timestamp, index)，超时或视频流已停止时frame为None
+        """
+        with self._cond:
+            if not self._cond.wait_for(lambda: self._latestIndex > self._readIndex or not self._running, timeout):
+                return None, 0.0, -1
+            if self._latestIndex <= self._readIndex:
+                return None, 0.0, -1
+            self._readBuf, self._latestBuf = self._latestBuf, self._readBuf
+            self._readIndex = self._latestIndex
+            return self._readBuf, self._latestTime, self._readIndex
+
+
+def stream_frames(url: str, skip: int = 0, size = None, timeout: float = 5):
+    """无窗口读取视频流，逐帧返回解码后的图像
+
+    后台线程只保留最新一帧，处理慢时自动丢弃旧帧。返回的图像在取下一帧之前有效，需要保留时请copy()。
+
+    Args:
+        url(str): 视频流地址，如start_aprilTag_recognition(tags, True, False)返回的streamUrl
+        skip(int): 每返回一帧至少跳过的帧数，默认0
+        size(tuple): 缩放到(width, height)，默认不缩放
+        timeout(float): 超过timeout秒收不到新帧时结束
+
+    Yields:
+        tuple: (frame, timestamp, index)
+
+    Examples:
+        >>> res = YanAPI.start_QR_code_recognition(enableStream=True, showWindow=False)
+            for frame, timestamp, index in YanAPI.stream_frames(res["streamUrl"], skip=1, size=(320, 240)):
+                detect(frame)
+    """
+    grabber = FrameGrabber(url)
+    grabber.start()
+    try:
+        last = -1
+        while True:
+            frame, timestamp, index = grabber.read(timeout)
+            if frame is None:
+                return
+            if last >= 0 and index - last <= skip:
+                continue
+            last = index
+            if size is not None:
+                frame = cv2.resize(frame, tuple(size), interpolation = cv2.INTER_AREA)
+            yield frame, timestamp, index
+    finally:
+        grabber.stop()
+
+
+async def astream_frames(url: str, skip: int = 0, size = None, timeout: float = 5):
+    """stream_frames的异步版本，等待新帧时不阻塞事件循环
+
+    Examples:
+        >>> async for frame, timestamp, index in YanAPI.astream_frames(url, size=(320, 240)):
+                detect(frame)
+    """
+    loop = asyncio.get_running_loop()
+    grabber = FrameGrabber(url)
+    grabber.start()
+    try:
+        last = -1
+        while True:
+            frame, timestamp, index = await loop.run_in_executor(None, grabber.read, timeout)
+            if frame is None:
+                return
+            if last >= 0 and index - last <= skip:
+                continue
+            last = index
+            if size is not None:
+                frame = cv2.resize(frame, tuple(size), interpolation = cv2.INTER_AREA)
+            yield frame, timestamp, index
+    finally:
+        grabber.stop()
+
 ####Subscriptions####
 
 
@@ -3926,12 +4792,12 @@ def stop_subscribe_motion(url: str):
                 }
 
     """
-    subscriptions_url = basic_url+"subscriptions/motions"
+    subscriptions_url = _get_basic_url()+"subscriptions/motions"
     param = {"url": url}
     json_data = json.dumps(param)
-    response = requests.delete(
+    response = _get_session().delete(
         url=subscriptions_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    res = _decode_response(response)
     return res
 
 
@@ -3953,12 +4819,12 @@ def start_subscribe_motion(url: str, timeout: int = 10):
                 }
 
     """
-    subscriptions_url = basic_url+"subscriptions/motions"
+    subscriptions_url = _get_basic_url()+"subscriptions/motions"
     param = {"url": url, "timeout": timeout}
     json_data = json.dumps(param)
-    response = requests.post(url=subscriptions_url,
+    response = _get_session().post(url=subscriptions_url,
                              data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    res = _decode_response(response)
     return res
 
 
@@ -3979,12 +4845,12 @@ def stop_subscribe_motion_gait(url: str):
                 }
 
     """
-    subscriptions_url = basic_url+"subscriptions/motions/gait"
+    subscriptions_url = _get_basic_url()+"subscriptions/motions/gait"
     param = {"url": url}
     json_data = json.dumps(param)
-    response = requests.delete(
+    response = _get_session().delete(
         url=subscriptions_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    res = _decode_response(response)
     return res
 
 
@@ -4006,12 +4872,12 @@ def start_subscribe_motion_gait(url: str, timeout: int = 10):
                 }
 
     """
-    subscriptions_url = basic_url+"subscriptions/motions/gait"
+    subscriptions_url = _get_basic_url()+"subscriptions/motions/gait"
     param = {"url": url, "timeout": timeout}
     json_data = json.dumps(param)
-    response = requests.post(url=subscriptions_url,
+    response = _get_session().post(url=subscriptions_url,
                              data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    res = _decode_response(response)
     return res
 
 
@@ -4035,16 +4901,16 @@ def stop_subscribe_sensor(url, type, id=0, slot=0):
                 }
 
     """
-    subscriptions_url = basic_url+"subscriptions/sensors"
+    subscriptions_url = _get_basic_url()+"subscriptions/sensors"
     param = {"url": url, "type": type}
     if (id != 0):
         param["id"] = id
     if (slot != 0):
         param["slot"] = slot
     json_data = json.dumps(param)
-    response = requests.delete(
+    response = _get_session().delete(
         url=subscriptions_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    res = _decode_response(response)
     return res
 
 
@@ -4070,16 +4936,16 @@ def start_subscribe_sensor(url: str, type: str, id=0, slot=0, timeval=100, timeo
                 }
 
     """
-    subscriptions_url = basic_url+"subscriptions/sensors"
+    subscriptions_url = _get_basic_url()+"subscriptions/sensors"
     param = {"url": url, "type": type, "timeval": timeval, "timeout": timeout}
     if (id != 0):
         param["id"] = id
     if (slot != 0):
         param["slot"] = slot
     json_data = json.dumps(param)
-    response = requests.post(url=subscriptions_url,
+    response = _get_session().post(url=subscriptions_url,
                              data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    res = _decode_response(response)
     return res
 
 
@@ -4101,12 +4967,12 @@ def stop_subscribe_vision(url: str, type: str):
                 }
 
     """
-    subscriptions_url = basic_url+"subscriptions/visions"
+    subscriptions_url = _get_basic_url()+"subscriptions/visions"
     param = {"url": url, "type": type}
     json_data = json.dumps(param)
-    response = requests.delete(
+    response = _get_session().delete(
         url=subscriptions_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    res = _decode_response(response)
     return res
 
 
@@ -4130,12 +4996,12 @@ def start_subscribe_vision(url: str, type: str, timeout:int=10):
                 }
 
     """
-    subscriptions_url = basic_url+"subscriptions/visions"
+    subscriptions_url = _get_basic_url()+"subscriptions/visions"
     param = {"url": url, "type": type, "timeout": timeout}
     json_data = json.dumps(param)
-    response = requests.post(url=subscriptions_url,
+    response = _get_session().post(url=subscriptions_url,
                              data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    res = _decode_response(response)
     return res
 
 
@@ -4156,12 +5022,12 @@ def stop_subscribe_voice_asr(url: str):
                 }
 
     """
-    subscriptions_url = basic_url+"subscriptions/voice/asr"
+    subscriptions_url = _get_basic_url()+"subscriptions/voice/asr"
     param = {"url": url}
     json_data = json.dumps(param)
-    response = requests.delete(
+    response = _get_session().delete(
         url=subscriptions_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    res = _decode_response(response)
     return res
 
 
@@ -4183,12 +5049,12 @@ def start_subscribe_voice_asr(url: str, timeout: int = 10):
                 }
 
     """
-    subscriptions_url = basic_url+"subscriptions/voice/asr"
+    subscriptions_url = _get_basic_url()+"subscriptions/voice/asr"
     param = {"url": url, "timeout": timeout}
     json_data = json.dumps(param)
-    response = requests.post(url=subscriptions_url,
+    response = _get_session().post(url=subscriptions_url,
                              data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    res = _decode_response(response)
     return res
 
 
@@ -4209,12 +5075,12 @@ def stop_subscribe_voice_iat(url: str):
                 }
 
     """
-    subscriptions_url = basic_url+"subscriptions/voice/iat"
+    subscriptions_url = _get_basic_url()+"subscriptions/voice/iat"
     param = {"url": url}
     json_data = json.dumps(param)
-    response = requests.delete(
+    response = _get_session().delete(
         url=subscriptions_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    res = _decode_response(response)
     return res
 
 
@@ -4236,12 +5102,12 @@ def start_subscribe_voice_iat(url: str, timeout=10):
                 }
 
     """
-    subscriptions_url = basic_url+"subscriptions/voice/iat"
+    subscriptions_url = _get_basic_url()+"subscriptions/voice/iat"
     param = {"url": url, "timeout": timeout}
     json_data = json.dumps(param)
-    response = requests.post(url=subscriptions_url,
+    response = _get_session().post(url=subscriptions_url,
                              data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    res = _decode_response(response)
     return res
 
 
@@ -4262,12 +5128,12 @@ def stop_subscribe_voice_tts(url: str):
                 }
 
     """
-    subscriptions_url = basic_url+"subscriptions/voice/tts"
+    subscriptions_url = _get_basic_url()+"subscriptions/voice/tts"
     param = {"url": url}
     json_data = json.dumps(param)
-    response = requests.delete(
+    response = _get_session().delete(
         url=subscriptions_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    res = _decode_response(response)
     return res
 
 
@@ -4285,49 +5151,525 @@ def start_subscribe_voice_tts(url: str, timeout: int = 10):
                 }
 
     """
-    subscriptions_url = basic_url+"subscriptions/voice/tts"
+    subscriptions_url = _get_basic_url()+"subscriptions/voice/tts"
     param = {"url": url, "timeout": timeout}
     json_data = json.dumps(param)
-    response = requests.post(url=subscriptions_url,
+    response = _get_session().post(url=subscriptions_url,
                              data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    res = _decode_response(response)
     return res
 
 
-@unique
-class GamepadKey(Enum):
-    """蓝牙手柄按键名
+class _SubscriptionReceiver(object):
+    """本地订阅接收服务
+
+    在后台线程的事件循环中运行一个极简的HTTP服务，机器人把订阅消息POST到
+    http://本机ip:port/<topic>，收到的json会交给对应topic的监听函数 callback(robot_ip, data)。
 
     :meta private:
     """
-    L1 = "key_L1"
-    L2 = "key_L2"
-    R1 = "key_R1"
-    R2 = "key_R2"
-    A = "key_A"
-    B = "key_B"
-    X = "key_X"
-    Y = "key_Y"
-    DPAD_UP = "key_DPAD_UP"
-    DPAD_DOWN = "key_DPAD_DOWN"
-    DPAD_LEFT = "key_DPAD_LEFT"
-    DPAD_RIGHT = "key_DPAD_RIGHT"
-    DPAD_UP_LEFT = "key_DPAD_UP_LEFT"
-    DPAD_UP_RIGHT = "key_DPAD_UP_RIGHT"
-    DPAD_DOWN_LEFT = "key_DPAD_DOWN_LEFT"
-    DPAD_DOWN_RIGHT = "key_DPAD_DOWN_RIGHT"
-    L_STICK = "key_L_STICK"
-    R_STICK = "key_R_STICK"
-    L_STICK_UP = "key_L_STICK_UP"
-    L_STICK_DOWN = "key_L_STICK_DOWN"
-    L_STICK_LEFT = "key_L_STICK_LEFT"
-    L_STICK_RIGHT = "key_L_STICK_RIGHT"
-    R_STICK_UP = "key_R_STICK_UP"
-    R_STICK_DOWN = "key_R_STICK_DOWN"
-    R_STICK_LEFT = "key_R_STICK_LEFT"
-    R_STICK_RIGHT = "key_R_STICK_RIGHT"
-    BT = "key_BT"
-    START = "key_START"
+    def __init__(self, host: str = "0.0.0.0", port: int = 0):
+        self.host = host
+        self.port = port
+        self._listeners = {}
+        self._lock = threading.Lock()
+        self._loop = None
+        self._server = None
+        self._thread = None
+
+    def start(self):
+        """启动服务，返回后即可接收推送"""
+        if self._thread is not None:
+            return
+        ready = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(ready,), name="yan-subscription", daemon=True)
+        self._thread.start()
+        ready.wait()
+        if self._server is None:
+            self._thread = None
+            raise OSError("subscription receiver failed to listen on %s:%d" % (self.host, self.port))
+
+    def _run(self, ready):
+        self._loop = asyncio.new_event_loop()
+        try:
+            self._server = self._loop.run_until_complete(asyncio.start_server(self._handle, self.host, self.port))
+            self.port = self._server.sockets[0].getsockname()[1]
+        except OSError as e:
+            logging.error("subscription receiver start failed: %s", e)
+            self._server = None
+            return
+        finally:
+            ready.set()
+        self._loop.run_forever()
+
+    def stop(self):
+        """停止服务"""
+        if self._thread is None:
+            return
+        def shutdown():
+            self._server.close()
+            self._loop.stop()
+        self._loop.call_soon_threadsafe(shutdown)
+        self._thread.join()
+        self._thread = None
+        self._server = None
+
+    def url(self, topic: str, robot_ip: str):
+        """机器人可访问的订阅接收地址"""
+        return "http://%s:%d/%s" % (_local_ip_for(robot_ip), self.port, topic)
+
+    def add_listener(self, topic: str, callback):
+        with self._lock:
+            self._listeners.setdefault(topic, []).append(callback)
+
+    def remove_listener(self, topic: str, callback):
+        with self._lock:
+            listeners = self._listeners.get(topic, [])
+            if callback in listeners:
+                listeners.remove(callback)
+
+    def _dispatch(self, robot_ip: str, topic: str, body: bytes):
+        try:
+            data = _get_json_loads()(body) if body else {}
+        except ValueError:
+            logging.error("bad subscription message from %s: %r", robot_ip, body[:100])
+            return
+        with self._lock:
+            listeners = list(self._listeners.get(topic, []))
+        for callback in listeners:
+            try:
+                callback(robot_ip, data)
+            except Exception as e:
+                logging.error("subscription listener error: %s", e)
+
+    async def _handle(self, reader, writer):
+        robot_ip = writer.get_extra_info("peername")[0]
+        try:
+            while True:
+                line = await reader.readline()
+                if not line.strip():
+                    break
+                parts = line.decode("latin-1").split()
+                if len(parts) < 2:
+                    break
+                length = 0
+                keepAlive = True
+                while True:
+                    header = await reader.readline()
+                    if header in (b"\r\n", b"\n", b""):
+                        break
+                    key, _, value = header.decode("latin-1").partition(":")
+                    key = key.strip().lower()
+                    if key == "content-length":
+                        length = int(value)
+                    elif key == "connection" and value.strip().lower() == "close":
+                        keepAlive = False
+                body = await reader.readexactly(length) if length else b""
+                self._dispatch(robot_ip, parts[1].split("?", 1)[0].strip("/"), body)
+                reply = b'{"code":0,"msg":"success"}'
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\nContent-Length: %d\r\n\r\n%s" % (len(reply), reply))
+                await writer.drain()
+                if not keepAlive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+
+def _local_ip_for(robot_ip: str):
+    """本机访问机器人时使用的ip地址，也就是机器人回连本机的地址"""
+    s = socket(AF_INET, SOCK_DGRAM)
+    try:
+        s.connect((robot_ip, 9090))
+        return s.getsockname()[0]
+    except OSError:
+        return "127.0.0.1"
+    finally:
+        s.close()
+
+
+_subscription_receiver = None
+#sync_*接口订阅状态推送的时长(秒)，机器人最长支持60秒，剩余不到一半时重新订阅
+completion_subscription_timeout = 60
+#{(robot_ip, topic): (机器人, 订阅地址, 到期时间)}，订阅失败时为False
+_completion_subscriptions = {}
+#保护_completion_subscriptions和_completion_locks，不在持有时发送请求
+_completion_lock = threading.Lock()
+#{(robot_ip, topic): 锁}，同一个机器人同一个topic的订阅请求串行执行，不同机器人互不等待
+_completion_locks = {}
+
+def _get_subscription_receiver():
+    """获取全局订阅接收服务，第一次调用时启动"""
+    global _subscription_receiver
+    if _subscription_receiver is None:
+        receiver = _SubscriptionReceiver(port = subscription_port)
+        receiver.start()
+        _subscription_receiver = receiver
+    return _subscription_receiver
+
+
+class _CompletionWaiter(object):
+    """sync_*接口等待完成时使用，收到对应机器人的推送后唤醒等待
+
+    :meta private:
+    """
+    def __init__(self, receiver, topic: str, robot_ip: str, expires: float):
+        self._receiver = receiver
+        self._topic = topic
+        self._robotIp = robot_ip
+        self._expires = expires
+        self._loop = _get_event_loop()
+        self._event = asyncio.Event()
+        receiver.add_listener(topic, self._notify)
+
+    def _notify(self, robot_ip, data):
+        if robot_ip != self._robotIp:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._event.set)
+        except RuntimeError:
+            pass
+
+    async def wait(self, timeout: float):
+        """等待推送，最多等待timeout秒，返回是否收到推送"""
+        if self._expires is not None and self._expires - time.monotonic() < completion_subscription_timeout / 2:
+            #等待时间较长时在订阅到期前续订
+            self._expires = _renew_completion_subscription(self._receiver, self._topic, self._robotIp)
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return False
+        self._event.clear()
+        return True
+
+    def close(self):
+        self._receiver.remove_listener(self._topic, self._notify)
+
+
+def _subscribe_completion(topic: str):
+    """为当前机器人订阅动作("motion")或步态("gait")状态推送
+
+    每个机器人每个topic只订阅一次。订阅失败时返回None，调用方退回到轮询。
+
+    Returns:
+        _CompletionWaiter: 等待对象，使用完后需要调用close()
+    """
+    robot_ip = _get_robot_ip()
+    if _completion_subscriptions.get((robot_ip, topic)) is False:
+        return None
+    try:
+        receiver = _get_subscription_receiver()
+    except Exception as e:
+        logging.warning("subscribe %s failed, fall back to polling: %s", topic, e)
+        _completion_subscriptions[(robot_ip, topic)] = False
+        return None
+    expires = _renew_completion_subscription(receiver, topic, robot_ip)
+    if expires is None:
+        return None
+    return _CompletionWaiter(receiver, topic, robot_ip, expires)
+
+
+def _renew_completion_subscription(receiver, topic: str, robot_ip: str):
+    """订阅不存在或者剩余时间不到一半时重新订阅
+
+    Returns:
+        float: 订阅的到期时间(time.monotonic)，订阅失败时返回None
+    """
+    key = (robot_ip, topic)
+    with _completion_lock:
+        keyLock = _completion_locks.setdefault(key, threading.Lock())
+    with keyLock:
+        entry = _completion_subscriptions.get(key)
+        if entry is False:
+            return None
+        if entry is not None and entry[2] - time.monotonic() >= completion_subscription_timeout / 2:
+            return entry[2]
+        url = receiver.url(topic, robot_ip)
+        subscribe = start_subscribe_motion if topic == "motion" else start_subscribe_motion_gait
+        start = time.monotonic()
+        try:
+            res = subscribe(url, timeout = completion_subscription_timeout)
+        except Exception as e:
+            res = e
+        with _completion_lock:
+            if not __resIsSuccess(res):
+                logging.warning("subscribe %s failed, fall back to polling: %s", topic, res)
+                #第一次订阅就失败说明机器人不支持，以后不再尝试；续订失败只影响本次等待
+                if entry is None:
+                    _completion_subscriptions[key] = False
+                else:
+                    _completion_subscriptions.pop(key, None)
+                return None
+            expires = start + completion_subscription_timeout
+            _completion_subscriptions[key] = (_current_robot.get(), url, expires)
+            return expires
+
+
+def _close_completion_subscriptions():
+    """取消sync_*接口的状态推送订阅"""
+    with _completion_lock:
+        entries = [(key, entry) for key, entry in _completion_subscriptions.items() if entry]
+        _completion_subscriptions.clear()
+    for (robot_ip, topic), (robot, url, expires) in entries:
+        if expires <= time.monotonic():
+            continue
+        unsubscribe = stop_subscribe_motion if topic == "motion" else stop_subscribe_motion_gait
+        try:
+            with deadline(1):
+                if robot is not None:
+                    robot.call(unsubscribe, url)
+                else:
+                    unsubscribe(url)
+        except Exception as e:
+            logging.warning("unsubscribe %s from %s failed: %s", topic, robot_ip, e)
+
+
+@atexit.register
+def _stop_subscription_receiver():
+    """取消订阅并停止本地订阅接收服务，进程退出时自动调用"""
+    global _subscription_receiver
+    _close_completion_subscriptions()
+    if _subscription_receiver is not None:
+        _subscription_receiver.stop()
+        _subscription_receiver = None
+
+
+
+#open_subscription支持的订阅类型: (订阅函数, 取消订阅函数, 需要转发的参数)
+_subscription_kinds = {
+    "motion": ("start_subscribe_motion", "stop_subscribe_motion", ()),
+    "gait": ("start_subscribe_motion_gait", "stop_subscribe_motion_gait", ()),
+    "sensor": ("start_subscribe_sensor", "stop_subscribe_sensor", ("type", "id", "slot")),
+    "vision": ("start_subscribe_vision", "stop_subscribe_vision", ("type",)),
+    "voice_asr": ("start_subscribe_voice_asr", "stop_subscribe_voice_asr", ()),
+    "voice_iat": ("start_subscribe_voice_iat", "stop_subscribe_voice_iat", ()),
+    "voice_tts": ("start_subscribe_voice_tts", "stop_subscribe_voice_tts", ()),
+}
+
+
+#放入订阅队列表示订阅已经结束
+_subscription_end = object()
+
+
+class YanSubscription(object):
+    """订阅消息流
+
+    由open_subscription创建。打开时启动本地接收服务并把它注册为机器人的订阅地址，
+    机器人推送的消息被解析成RobotSubscriptionEvent放入有界队列，队列满时丢弃最旧的消息。
+    可以用async for逐条读取，也可以直接使用queue。
+    机器人的订阅在timeout秒后到期，打开期间每timeout/3秒自动续订一次；
+    续订失败时记录在error中并结束async for迭代。
+
+    Examples:
+        >>> async def main():
+                async with YanAPI.open_subscription("sensor", type="gyro", timeval=100) as sub:
+                    async for event in sub:
+                        print(event.values)
+            asyncio.run(main())
+    """
+    def __init__(self, kind: str, maxsize: int = 256, **kwargs):
+        if kind not in _subscription_kinds:
+            raise ValueError("unknown subscription kind: %s" % kind)
+        self.kind = kind
+        self.maxsize = maxsize
+        self.dropped = 0
+        self._kwargs = kwargs
+        self._robot = _current_robot.get()
+        self._topic = kind if not kwargs.get("type") else kind+"/"+kwargs["type"]
+        self._url = None
+        self._loop = None
+        self._queue = None
+        self._renewTask = None
+        self.error = None
+
+    @property
+    def robot_ip(self):
+        return self._robot.ip if self._robot is not None else ip
+
+    @property
+    def queue(self):
+        """asyncio.Queue: 保存推送消息的有界队列"""
+        return self._queue
+
+    @property
+    def url(self):
+        """str: 注册到机器人的订阅接收地址"""
+        return self._url
+
+    def _call(self, funcName: str, **kwargs):
+        func = globals()[funcName]
+        if self._robot is not None:
+            return self._robot.call(func, **kwargs)
+        return func(**kwargs)
+
+    def open(self):
+        """注册订阅，需要在事件循环所在线程调用
+
+        Returns:
+            Dict: 订阅接口的返回值
+        """
+        self._loop = asyncio.get_event_loop()
+        self._queue = asyncio.Queue(maxsize = self.maxsize)
+        receiver = _get_subscription_receiver()
+        self._url = receiver.url(self._topic, self.robot_ip)
+        receiver.add_listener(self._topic, self._on_message)
+        startName = _subscription_kinds[self.kind][0]
+        res = self._call(startName, url = self._url, **self._kwargs)
+        if res.get("code", -1) != 0:
+            receiver.remove_listener(self._topic, self._on_message)
+            self._url = None
+            logging.error("error code = %d msg = %s",res.get("code",-1),res.get("msg",""))
+            return res
+        self._renewTask = self._loop.create_task(self._renew(self._url))
+        return res
+
+    async def _renew(self, url: str):
+        #机器人接受1~60秒的订阅时长，在到期一半之前重新订阅
+        timeout = min(max(self._kwargs.get("timeout", 10), 1), 60)
+        startName = _subscription_kinds[self.kind][0]
+        while True:
+            await asyncio.sleep(timeout / 3)
+            if self._url != url:
+                return
+            try:
+                res = await self._loop.run_in_executor(None, functools.partial(self._call, startName, url = url, **self._kwargs))
+            except Exception as e:
+                res = e
+            if self._url != url:
+                return
+            if not isinstance(res, dict) or res.get("code", -1) != 0:
+                logging.error("renew %s subscription failed: %s", self._topic, res)
+                self.error = res
+                _get_subscription_receiver().remove_listener(self._topic, self._on_message)
+                self._url = None
+                self._put(_subscription_end)
+                return
+
+    def close(self):
+        """取消订阅
+
+        Returns:
+            Dict: 取消订阅接口的返回值
+        """
+        if self._url is None:
+            return None
+        _get_subscription_receiver().remove_listener(self._topic, self._on_message)
+        _, stopName, stopArgs = _subscription_kinds[self.kind]
+        kwargs = {key: self._kwargs[key] for key in stopArgs if key in self._kwargs}
+        url = self._url
+        self._url = None
+        try:
+            self._loop.call_soon_threadsafe(self._stop_renew)
+        except RuntimeError:
+            pass
+        return self._call(stopName, url = url, **kwargs)
+
+    def _stop_renew(self):
+        if self._renewTask is not None:
+            self._renewTask.cancel()
+            self._renewTask = None
+        self._put(_subscription_end)
+
+    def _on_message(self, robot_ip, data):
+        if robot_ip != self.robot_ip:
+            return
+        event = _make_subscription_event(robot_ip, self.kind, self._kwargs.get("type", ""), data)
+        try:
+            self._loop.call_soon_threadsafe(self._put, event)
+        except RuntimeError:
+            pass
+
+    def _put(self, event):
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait(event)
+
+    async def get(self):
+        """等待并返回下一条推送消息
+
+        Returns:
+            RobotSubscriptionEvent: 推送消息，订阅已关闭或续订失败时返回None
+        """
+        if self._url is None and self._queue.empty():
+            return None
+        event = await self._queue.get()
+        if event is _subscription_end:
+            #留给其他等待者
+            self._queue.put_nowait(event)
+            return None
+        return event
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        event = await self.get()
+        if event is None:
+            raise StopAsyncIteration
+        return event
+
+    async def __aenter__(self):
+        self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+
+def open_subscription(kind: str, maxsize: int = 256, **kwargs):
+    """订阅机器人推送消息并在本地接收
+
+    Args:
+        kind(str): 订阅类型 motion, gait, sensor, vision, voice_asr, voice_iat, voice_tts
+        maxsize(int): 消息队列长度，默认256
+        kwargs: 转发给对应start_subscribe_*接口的参数，如sensor的type/id/slot/timeval/timeout
+
+    Returns:
+        YanSubscription: 订阅消息流，可用async with自动打开和关闭
+
+    Examples:
+        >>> sub = YanAPI.open_subscription("sensor", type="ultrasonic", timeval=100)
+    """
+    return YanSubscription(kind, maxsize, **kwargs)
+
+
+
+@unique
+class GamepadKey(Enum):
+    """蓝牙手柄按键名
+
+    :meta private:
+    """
+    L1 = "key_L1"
+    L2 = "key_L2"
+    R1 = "key_R1"
+    R2 = "key_R2"
+    A = "key_A"
+    B = "key_B"
+    X = "key_X"
+    Y = "key_Y"
+    DPAD_UP = "key_DPAD_UP"
+    DPAD_DOWN = "key_DPAD_DOWN"
+    DPAD_LEFT = "key_DPAD_LEFT"
+    DPAD_RIGHT = "key_DPAD_RIGHT"
+    DPAD_UP_LEFT = "key_DPAD_UP_LEFT"
+    DPAD_UP_RIGHT = "key_DPAD_UP_RIGHT"
+    DPAD_DOWN_LEFT = "key_DPAD_DOWN_LEFT"
+    DPAD_DOWN_RIGHT = "key_DPAD_DOWN_RIGHT"
+    L_STICK = "key_L_STICK"
+    R_STICK = "key_R_STICK"
+    L_STICK_UP = "key_L_STICK_UP"
+    L_STICK_DOWN = "key_L_STICK_DOWN"
+    L_STICK_LEFT = "key_L_STICK_LEFT"
+    L_STICK_RIGHT = "key_L_STICK_RIGHT"
+    R_STICK_UP = "key_R_STICK_UP"
+    R_STICK_DOWN = "key_R_STICK_DOWN"
+    R_STICK_LEFT = "key_R_STICK_LEFT"
+    R_STICK_RIGHT = "key_R_STICK_RIGHT"
+    BT = "key_BT"
+    START = "key_START"
     POWER = "key_POWER"
     RESERVE = "key_RESERVE"
 
@@ -4361,6 +5703,7 @@ class GamepadKeymap():
         return self.longPress
 
 
+@_cached
 def get_gamepad_keymap():
     """获取蓝牙手柄按键和动作文件映射关系
     Args:
@@ -4382,12 +5725,13 @@ def get_gamepad_keymap():
                   "msg": "Success"
                 }
     """
-    voice_url = basic_url+"gamepad/keymap/get"
-    response = requests.get(url=voice_url, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    voice_url = _get_basic_url()+"gamepad/keymap/get"
+    response = _get_session().get(url=voice_url, headers=headers)
+    res = _decode_response(response)
     return res
 
 
+@_invalidates("get_gamepad_keymap")
 def set_gamepad_keymap(key_name: GamepadKey, hts_name: str, long_press: bool = False):
     """设置单个按键的动作
 
@@ -4407,6 +5751,7 @@ def set_gamepad_keymap(key_name: GamepadKey, hts_name: str, long_press: bool = F
     return set_gamepad_keymaps([GamepadKeymap(key_name, hts_name, long_press)])
 
 
+@_invalidates("get_gamepad_keymap")
 def set_gamepad_keymaps(keymaps: List[GamepadKeymap]):
     """设置多个按键的动作
 
@@ -4422,7 +5767,7 @@ def set_gamepad_keymaps(keymaps: List[GamepadKeymap]):
                    }
 
     """
-    servos_url = basic_url + "gamepad/keymap/set"
+    servos_url = _get_basic_url()+"gamepad/keymap/set"
 
     param = {
         "keymaps": keymaps
@@ -4435,11 +5780,12 @@ def set_gamepad_keymaps(keymaps: List[GamepadKeymap]):
 
     json_data = json.dumps(param, default=default)
     # print(json_data)
-    response = requests.put(url=servos_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().put(url=servos_url, data=json_data, headers=headers)
+    res = _decode_response(response)
     return res
 
 
+@_invalidates("get_gamepad_keymap")
 def reset_gamepad_keymap(key_name: GamepadKey):
     """重置单个按键到默认配置
 
@@ -4458,6 +5804,7 @@ def reset_gamepad_keymap(key_name: GamepadKey):
     return reset_gamepad_keymaps([key_name])
 
 
+@_invalidates("get_gamepad_keymap")
 def reset_gamepad_keymaps(key_name_list: List[GamepadKey] = None, reset_all: bool = False):
     """重置多个按键或者全部按键到默认配置
 
@@ -4473,7 +5820,7 @@ def reset_gamepad_keymaps(key_name_list: List[GamepadKey] = None, reset_all: boo
                    }
 
     """
-    servos_url = basic_url + "gamepad/keymap/reset"
+    servos_url = _get_basic_url()+"gamepad/keymap/reset"
 
     if key_name_list is None:
         key_name_list = []
@@ -4490,27 +5837,40 @@ def reset_gamepad_keymaps(key_name_list: List[GamepadKey] = None, reset_all: boo
 
     json_data = json.dumps(param, default=default)
     # print(json_data)
-    response = requests.put(url=servos_url, data=json_data, headers=headers)
-    res = json.loads(str(response.content.decode("utf-8")))
+    response = _get_session().put(url=servos_url, data=json_data, headers=headers)
+    res = _decode_response(response)
     return res
 
 
+def __wait_result_failed(res, what):
+    """状态查询失败(如返回内容不是json)时记录错误，调用方停止等待并返回这次的结果"""
+    if __resIsSuccess(res):
+        return False
+    logging.error("%s failed: code = %d msg = %s", what, res.get("code",-1), res.get("msg",""))
+    return True
+
 async def __wait_result(timestamp, getFuc):
+    end = _wait_deadline()
     while True:
         res = getFuc()
+        if __wait_result_failed(res, getFuc.__name__):
+            return res
         if(timestamp == res["timestamp"]):
             status = res["status"]
             if status == "idle":
                 return res
-            else:
-                await asyncio.sleep(1)
+        await asyncio.sleep(_wait_interval(1, end, getFuc.__name__))
 
 async def __wait_result_QR(getFuc,timeOut,checkStream = False):
     timeCount = 0
     beginTime = time.time()
+    end = _wait_deadline()
     global PqrStream
     while True:
         res = getFuc()
+        if __wait_result_failed(res, getFuc.__name__):
+            stop_QR_code_recognition()
+            return res
         if checkStream and not (PqrStream is None) and not PqrStream.is_alive():
             stop_QR_code_recognition()
             return res
@@ -4525,18 +5885,25 @@ async def __wait_result_QR(getFuc,timeOut,checkStream = False):
             return res
         else:
             timeCount += 1
-            await asyncio.sleep(1)
+            try:
+                interval = _wait_interval(1, end, getFuc.__name__)
+            except DeadlineExceeded:
+                stop_QR_code_recognition()
+                raise
+            await asyncio.sleep(interval)
 
 async def __wait_result_common(timestamp, getFuc, args=()):
+    end = _wait_deadline()
     while True:
         res = getFuc(*args)
         # print(res)
+        if __wait_result_failed(res, getFuc.__name__):
+            return res
         if(timestamp == res["timestamp"]):
             status = res["status"]
             if status == "idle":
                 return res
-            else:
-                await asyncio.sleep(1)
+        await asyncio.sleep(_wait_interval(1, end, getFuc.__name__))
 
 # async def __wait_result_common2(name, start_time, getFuc):
 #     while True:
@@ -4555,62 +5922,92 @@ async def __wait_result_common(timestamp, getFuc, args=()):
 #         else:
 #             return res
 
+async def __wait_next_poll(waiter, interval, end = None, what = "result"):
+    """等待下一次状态查询
+
+    收到订阅推送时立即返回，否则等待interval秒，不超过截止时间end。返回下一次的等待时间(指数退避)。
+    """
+    wait = _wait_interval(interval, end, what)
+    if waiter is None:
+        await asyncio.sleep(wait)
+    else:
+        await waiter.wait(wait)
+    return min(interval * 2, poll_interval_max)
+
 async def __wait_result_music(name, start_time, getFuc):
+    interval = poll_interval_min
+    end = _wait_deadline()
     while True:
         res = getFuc()
         # print(res)
+        if __wait_result_failed(res, getFuc.__name__):
+            return res
         if res['data']['name'] == "":
             return res
         if res['data']['status'] == 'run' and res['data']['name'] == name:
-            await asyncio.sleep(1)
+            interval = await __wait_next_poll(None, interval, end, getFuc.__name__)
         else:
             return res
 
-async def __wait_result_motion(name, start_time, getFuc):
+async def __wait_result_motion(name, start_time, getFuc, waiter = None):
+    interval = poll_interval_min
+    end = _wait_deadline()
     while True:
         res = getFuc()
         # print(res)
+        if __wait_result_failed(res, getFuc.__name__):
+            return res
         if res['data']['name'] == "":
             return res
         if res['data']['status'] == 'run' and start_time == res['data']['timestamp']:
-            await asyncio.sleep(1)
+            interval = await __wait_next_poll(waiter, interval, end, getFuc.__name__)
         else:
             return res
 
-async def __wait_result_layer_motion(name, start_time, getFuc):
+async def __wait_result_layer_motion(name, start_time, getFuc, waiter = None):
+    interval = poll_interval_min
+    end = _wait_deadline()
     while True:
         res = getFuc()
         # print(res)
-        find = False
+        if __wait_result_failed(res, getFuc.__name__):
+            return res
+        running = False
         for i in range(len(res["data"])):
             if res['data'][i]['name'] == str(name + ".layers"):
                 if res['data'][i]['status'] == 'run' and start_time == res['data'][i]['timestamp']:
-                    await asyncio.sleep(1)
-                else:
-                    return res
-        if find == False:
+                    running = True
+                break
+        if not running:
             return res
+        interval = await __wait_next_poll(waiter, interval, end, getFuc.__name__)
 
 async def __wait_result_by_time(time):
-    await asyncio.sleep(time)
+    await asyncio.sleep(_wait_interval(time, _deadline.get(), "servo rotation"))
 
 async def __wait_result_color(type, color, mode, getFuc):
-
+    end = _wait_deadline()
     while True:
         res = getFuc()
+        if __wait_result_failed(res, getFuc.__name__):
+            return res
         for item in res['data']:
             if item['type'] == type and item['color'] == color and item['mode'] == mode:
                 return res
-        await asyncio.sleep(1)
+        await asyncio.sleep(_wait_interval(1, end, getFuc.__name__))
 
-async def __wait_result_gait(start_time, type, getFuc):
+async def __wait_result_gait(start_time, type, getFuc, waiter = None):
+    interval = poll_interval_min
+    end = _wait_deadline()
     while True:
         res = getFuc()
         # print(res)
+        if __wait_result_failed(res, getFuc.__name__):
+            return res
         if res['data']['timestamp'] == start_time:
             if type == "start": # walking
                 if 0 <= res['data']['status'] <= 2:
-                    await asyncio.sleep(1)
+                    interval = await __wait_next_poll(waiter, interval, end, getFuc.__name__)
                 else:
                     return res
             #else: # up
@@ -4620,9 +6017,11 @@ async def __wait_result_gait(start_time, type, getFuc):
             #        return
         elif res['data']['timestamp'] > start_time:
             return res
+        else:
+            interval = await __wait_next_poll(waiter, interval, end, getFuc.__name__)
 
 def __resIsSuccess(res):
-    if not isinstance(res,Dict):
+    if not isinstance(res,Mapping):
         return False
     if not "code" in res:
         return False
@@ -4821,6 +6220,102 @@ class RobotJointType(Enum):
     No17 = "NeckLR"
 
 
+#舵机名到RobotActionFrame数组下标的映射，下标为舵机ID-1
+_joint_names = [joint.value for joint in RobotJointType]
+_joint_index = {name: i for i, name in enumerate(_joint_names)}
+_joint_index.update({joint: i for i, joint in enumerate(RobotJointType)})
+#下划线写法，如neck_lr、right_ankle_ud
+_joint_index.update({"_".join(re.findall("[A-Z][a-z]+|[A-Z]+(?![a-z])", name)).lower(): i for i, name in enumerate(_joint_names)})
+#左右对称的舵机下标，镜像时互换并把角度换成180-角度
+_joint_mirror = [3, 4, 5, 0, 1, 2, 11, 12, 13, 14, 15, 6, 7, 8, 9, 10, 16]
+#舵机安全角度范围(最小, 最大)，见set_servos_angles的说明
+joint_limits = dict(zip(_joint_names, [(0, 180)] * 6 + [(0, 120), (10, 180), (0, 180), (0, 180), (65, 180),
+                                                      (60, 180), (0, 170), (0, 180), (0, 180), (0, 115), (15, 165)]))
+#超出安全范围时的处理方式: "clamp"限制到范围内后发送，"reject"不发送并返回错误，"off"不检查
+servo_limit_mode = "clamp"
+_joint_limit_table = None
+
+
+def get_joint_limit_table():
+    """按舵机ID排列的安全角度范围
+
+    Returns:
+        (numpy.ndarray, numpy.ndarray): 长度为17的最小角度和最大角度
+    """
+    global _joint_limit_table
+    if _joint_limit_table is None:
+        import numpy as np
+        table = np.array([joint_limits[name] for name in _joint_names], dtype=np.float32)
+        _joint_limit_table = (table[:, 0].copy(), table[:, 1].copy())
+    return _joint_limit_table
+
+
+def validate_joint_angles(angles):
+    """一次检查一个或多个姿态是否超出安全范围
+
+    Args:
+        angles: (17,)或(n, 17)的角度数组，nan表示没有设置
+
+    Returns:
+        numpy.ndarray: 与angles形状相同的bool数组，True表示超出范围
+
+    Examples:
+        >>> bad = YanAPI.validate_joint_angles(RobotActionFrame.stack(frames))
+            for frame, servo in numpy.argwhere(bad):
+                print(frame, YanAPI.RobotJointType["No%d" % (servo + 1)])
+    """
+    import numpy as np
+    lower, upper = get_joint_limit_table()
+    angles = np.asarray(angles, dtype=np.float32)
+    with np.errstate(invalid="ignore"):
+        return (angles < lower) | (angles > upper)
+
+
+def clamp_joint_angles(angles):
+    """把一个或多个姿态限制在安全范围内，nan保持不变"""
+    lower, upper = get_joint_limit_table()
+    return RobotActionFrame.clamp(angles, lower, upper)
+
+
+def _limit_servo_angles(angles: Dict):
+    """按servo_limit_mode检查一个姿态
+
+    Returns:
+        (Dict, str): 可以发送的角度，错误信息
+    """
+    if servo_limit_mode == "off":
+        return angles, None
+    limited = None
+    for name, angle in angles.items():
+        #NeckLR、neck_lr、RobotJointType.NeckLR都对应同一个舵机
+        try:
+            limit = joint_limits[_joint_names[_joint_slot(name)]]
+        except (KeyError, ValueError):
+            return None, "unknown servo name %s" % (name,)
+        if limit[0] <= angle <= limit[1]:
+            continue
+        if servo_limit_mode == "reject":
+            return None, "%s angle %s out of range %d-%d" % (name, angle, limit[0], limit[1])
+        logging.warning("%s angle %s out of range %d-%d, clamped", name, angle, limit[0], limit[1])
+        if limited is None:
+            limited = dict(angles)
+        limited[name] = min(max(angle, limit[0]), limit[1])
+    return limited or angles, None
+
+
+def _limit_servo_layers(data: Dict):
+    """按servo_limit_mode检查set_servos_angles_layers的参数
+
+    Returns:
+        (Dict, str): 可以发送的参数，错误信息
+    """
+    angles, error = _limit_servo_angles({name: value["angle"] for name, value in data.items()
+                                         if isinstance(value, dict) and "angle" in value})
+    if error:
+        return None, error
+    return {name: dict(value, angle=angles[name]) if name in angles else value for name, value in data.items()}, None
+
+
 class RobotJointInfo():
     """关节信息
 
@@ -4837,7 +6332,9 @@ class RobotJointInfo():
         ID17舵机可运行角度范围为15-165,超出范围运动存在风险.
     """
     def __init__(self,jointType,angel:int):
-        if isinstance(jointType,str):
+        if isinstance(jointType,str) and jointType in _joint_index:
+            self.jointType = RobotJointType(_joint_names[_joint_index[jointType]])
+        elif isinstance(jointType,str):
             strlist = jointType.split('_')	# 用_分割str字符串，并保存到列表
             newStrList = []
             newStr = ""
@@ -4849,6 +6346,8 @@ class RobotJointInfo():
                 for strItem in newStrList:
                     newStr = newStr+strItem
             self.jointType = RobotJointType(newStr)
+            #记住这种写法对应的下标，下次不再转换
+            _joint_index[jointType] = _joint_index[self.jointType]
         elif isinstance(jointType,RobotJointType):
             self.jointType = jointType
         else:
@@ -4856,34 +6355,131 @@ class RobotJointInfo():
         self.angel = angel
 
 
+def _joint_slot(jointType):
+    """舵机名或RobotJointType对应的数组下标，名称无效时抛出ValueError"""
+    index = _joint_index.get(jointType)
+    if index is None:
+        index = _joint_index[RobotJointInfo(jointType, 0).jointType]
+    return index
+
+
 #动作帧
 class RobotActionFrame():
-    def __init__(self,actionFrame:Dict):
-        self._actionFrame = {}
-        for key,value in actionFrame.items():
-            jointInfo = RobotJointInfo(key,value)
-            self._actionFrame[jointInfo.jointType.value] = jointInfo
+    """动作帧，按舵机ID保存17个舵机的角度，-1表示没有设置
+
+    Examples:
+        >>> frame = RobotActionFrame({"NeckLR": 60, "right_shoulder_flex": 90})
+            frames = RobotActionFrame.stack([frame, RobotActionFrame({"NeckLR": 120})])
+            poses = RobotActionFrame.interpolate([0, 1], frames, numpy.arange(0, 1, 0.02))
+            mirrored = RobotActionFrame.mirror(poses)
+    """
+    __slots__ = ("_angles",)
+    _empty = array("h", [-1] * len(_joint_names))
+
+    def __init__(self,actionFrame:Dict = None):
+        angles = array("h", self._empty)
+        if actionFrame:
+            for key,value in actionFrame.items():
+                angles[_joint_slot(key)] = int(round(value))
+        self._angles = angles
 
     @property
     def interfaceDict(self):
         ret = {}
-        for key,value in self._actionFrame.items():
-            ret[key] = value.angel
+        for index,angle in enumerate(self._angles):
+            if angle >= 0:
+                ret[_joint_names[index]] = angle
         return ret
 
     def __getitem__(self, key):
-        if not isinstance(key, str):
-            return -1
-        jointInfo = self._actionFrame.get(key)
-        if not jointInfo:
+        index = _joint_index.get(key)
+        if index is None:
             return -1
-        return jointInfo.angel
+        return self._angles[index]
+
+    def __repr__(self):
+        return "RobotActionFrame(%r)" % self.interfaceDict
 
     def addOrUpdateJointInfo(self,jointInfo:RobotJointInfo):
-        self._actionFrame[jointInfo.jointType.value] = jointInfo
+        self._angles[_joint_index[jointInfo.jointType]] = int(round(jointInfo.angel))
 
     def delJointInfo(self,jointType:RobotJointType):
-         self._actionFrame.pop(jointType.value)
+        index = _joint_index[jointType]
+        if self._angles[index] < 0:
+            raise KeyError(jointType.value)
+        self._angles[index] = -1
+
+    def toArray(self):
+        """转换成长度为17的numpy数组，没有设置的舵机为nan"""
+        import numpy as np
+        angles = np.array(self._angles, dtype=np.float32)
+        angles[angles < 0] = np.nan
+        return angles
+
+    @classmethod
+    def fromArray(cls, angles):
+        """从长度为17的数组创建动作帧，nan或负数表示不设置"""
+        import numpy as np
+        angles = np.asarray(angles, dtype=np.float64)
+        frame = cls()
+        frame._angles = array("h", np.where(np.isnan(angles) | (angles < 0), -1, np.rint(angles)).astype(np.int16).tobytes())
+        return frame
+
+    @staticmethod
+    def stack(frames: List):
+        """把一组动作帧转换成(n, 17)的numpy数组，没有设置的舵机为nan"""
+        import numpy as np
+        data = np.frombuffer(b"".join(frame._angles.tobytes() for frame in frames), dtype=np.int16)
+        angles = data.reshape(len(frames), len(_joint_names)).astype(np.float32)
+        angles[angles < 0] = np.nan
+        return angles
+
+    @staticmethod
+    def unstack(angles):
+        """把(n, 17)的数组转换成动作帧列表"""
+        return [RobotActionFrame.fromArray(row) for row in angles]
+
+    @staticmethod
+    def interpolate(keyTimes, keyAngles, times):
+        """在关键帧之间线性插值
+
+        Args:
+            keyTimes: 关键帧时间，长度为n，递增
+            keyAngles: (n, 17)的关键帧角度
+            times: 需要计算的时间点，长度为m
+
+        Returns:
+            numpy.ndarray: (m, 17)的角度，超出关键帧范围的时间点取首尾关键帧
+        """
+        import numpy as np
+        keyTimes = np.asarray(keyTimes, dtype=np.float64)
+        keyAngles = np.asarray(keyAngles, dtype=np.float32)
+        times = np.asarray(times, dtype=np.float64)
+        if len(keyTimes) == 1:
+            return np.repeat(keyAngles, len(times), axis=0)
+        index = np.clip(np.searchsorted(keyTimes, times, side="right") - 1, 0, len(keyTimes) - 2)
+        t0 = keyTimes[index]
+        ratio = np.clip((times - t0) / (keyTimes[index + 1] - t0), 0, 1).astype(np.float32)
+        a = keyAngles[index]
+        return a + (keyAngles[index + 1] - a) * ratio[:, None]
+
+    @staticmethod
+    def clamp(angles, lower = None, upper = None):
+        """把角度限制在[lower, upper]之间，lower/upper可以是长度为17的数组，默认使用舵机安全范围"""
+        import numpy as np
+        if lower is None or upper is None:
+            limitLower, limitUpper = get_joint_limit_table()
+            lower = limitLower if lower is None else lower
+            upper = limitUpper if upper is None else upper
+        return np.clip(angles, lower, upper)
+
+    @staticmethod
+    def mirror(angles):
+        """左右镜像：左右对称的舵机互换，角度换成180-角度"""
+        import numpy as np
+        angles = np.asarray(angles)
+        return 180 - angles[..., _joint_mirror]
+
 
 class RobotBatteryInfo():
     """机器人电源信息
@@ -5085,6 +6681,95 @@ class RobotVisualTaskResult():
     def gesture(self):
         return self._gesture
 
+
+class RobotSubscriptionEvent():
+    """订阅推送消息
+
+    :meta private:
+    """
+    def __init__(self, robot_ip: str, kind: str, data=None):
+        self._robotIp = robot_ip
+        self._kind = kind
+        self._receiveTime = time.time()
+        self._data = data if data is not None else {}
+        #推送内容可能带有和接口返回值相同的外层结构
+        self._payload = self._data.get("data", self._data) if isinstance(self._data, Dict) else self._data
+
+    @property
+    def robotIp(self):
+        return self._robotIp
+
+    @property
+    def kind(self):
+        return self._kind
+
+    @property
+    def receiveTime(self):
+        return self._receiveTime
+
+    @property
+    def data(self):
+        return self._data
+
+    @property
+    def payload(self):
+        return self._payload
+
+
+class RobotSensorEvent(RobotSubscriptionEvent):
+    """传感器推送消息
+
+    :meta private:
+    """
+    def __init__(self, robot_ip: str, sensorType: str, data=None):
+        super().__init__(robot_ip, "sensor", data)
+        self._sensorType = sensorType
+        values = self._payload
+        if isinstance(values, Mapping):
+            values = values.get(sensorType, [values])
+        self._values = values if isinstance(values, list) else [values]
+
+    @property
+    def sensorType(self):
+        return self._sensorType
+
+    @property
+    def values(self):
+        return self._values
+
+
+class RobotMotionEvent(RobotSubscriptionEvent):
+    """动作/步态状态推送消息
+
+    :meta private:
+    """
+    def __init__(self, robot_ip: str, kind: str, data=None):
+        super().__init__(robot_ip, kind, data)
+        payload = self._payload if isinstance(self._payload, Dict) else {}
+        self._name = payload.get("name", "")
+        self._status = payload.get("status", "")
+        self._timestamp = payload.get("timestamp", 0)
+
+    @property
+    def name(self):
+        return self._name
+
+    @property
+    def status(self):
+        return self._status
+
+    @property
+    def timestamp(self):
+        return self._timestamp
+
+
+def _make_subscription_event(robot_ip: str, kind: str, type: str, data):
+    if kind == "sensor":
+        return RobotSensorEvent(robot_ip, type, data)
+    if kind in ("motion", "gait"):
+        return RobotMotionEvent(robot_ip, kind, data)
+    return RobotSubscriptionEvent(robot_ip, kind, data)
+
 ######## Yanshee Voice Class ##################################
 
 class Voice(object):
@@ -5108,9 +6793,9 @@ class Voice(object):
                     }
 
         """
-        voice_url = basic_url+"voice/iat"
-        response = requests.delete(url=voice_url, headers=headers)
-        res = json.loads(str(response.content.decode("utf-8")))
+        voice_url = _get_basic_url()+"voice/iat"
+        response = _get_session().delete(url=voice_url, headers=headers)
+        res = _decode_response(response)
         return res
 
     def get_voice_asr(self):
@@ -5132,12 +6817,9 @@ class Voice(object):
                     }
 
         """
-        voice_url = basic_url+"voice/iat"
-        response = requests.get(url=voice_url, headers=headers)
-        res = json.loads(str(response.content.decode("utf-8")))
-        res["data"] = json.loads(res["data"].strip(
-            b'\x00'.decode()))
-        return res
+        voice_url = _get_basic_url()+"voice/iat"
+        response = _get_session().get(url=voice_url, headers=headers)
+        return _decode_nested(_decode_response(response))
 
     def start_voice_asr(self,timestamp: int = 0):
         """开始语音听写
@@ -5158,11 +6840,11 @@ class Voice(object):
                     }
 
         """
-        voice_url = basic_url+"voice/iat"
+        voice_url = _get_basic_url()+"voice/iat"
         param = {"timestamp": timestamp}
         json_data = json.dumps(param)
-        response = requests.put(url=voice_url, data=json_data, headers=headers)
-        res = json.loads(str(response.content.decode("utf-8")))
+        response = _get_session().put(url=voice_url, data=json_data, headers=headers)
+        res = _decode_response(response)
         return res
 
     def sync_do_voice_asr_value(self):
@@ -5177,7 +6859,7 @@ class Voice(object):
         if not successed:
             return ""
         coroutine = self.__wait_result(timestamp,self.get_voice_asr)
-        loop = asyncio.get_event_loop()
+        loop = _get_event_loop()
         task = loop.create_task(coroutine)
         loop.run_until_complete(task)
         res = task.result()
@@ -5220,7 +6902,7 @@ class Voice(object):
             logging.error("do voice iat failed error code = %d msg = %s",res.get("code",-1),res.get("msg","unknow error"))
             return res
         coroutine = self.__wait_result(timestamp, self.get_voice_asr)
-        loop = asyncio.get_event_loop()
+        loop = _get_event_loop()
         task = loop.create_task(coroutine)
         loop.run_until_complete(task)
         #result = asyncio.run(coroutine)
@@ -5245,11 +6927,11 @@ class Voice(object):
                     }
 
         """
-        voice_url = basic_url+"voice/asr/offlinesyntax"
+        voice_url = _get_basic_url()+"voice/asr/offlinesyntax"
         param = {"grammar": grammar}
         json_data = json.dumps(param)
-        response = requests.delete(url=voice_url, data=json_data, headers=headers)
-        res = json.loads(str(response.content.decode("utf-8")))
+        response = _get_session().delete(url=voice_url, data=json_data, headers=headers)
+        res = _decode_response(response)
         return res
 
     def get_voice_asr_offline_syntax(self,grammar: str):
@@ -5304,10 +6986,10 @@ class Voice(object):
                 }
 
         """
-        voice_url = basic_url+"voice/asr/offlinesyntax"
+        voice_url = _get_basic_url()+"voice/asr/offlinesyntax"
         params = {"body": grammar}
-        response = requests.get(url=voice_url, headers=headers, params=params)
-        res = json.loads(str(response.content.decode("utf-8")))
+        response = _get_session().get(url=voice_url, headers=headers, params=params)
+        res = _decode_response(response)
         return res
 
     def create_voice_asr_offline_syntax(self,object: Dict):
@@ -5353,11 +7035,11 @@ class Voice(object):
                     }
 
         """
-        voice_url = basic_url+"voice/asr/offlinesyntax"
+        voice_url = _get_basic_url()+"voice/asr/offlinesyntax"
         param = object
         json_data = json.dumps(param)
-        response = requests.post(url=voice_url, data=json_data, headers=headers)
-        res = json.loads(str(response.content.decode("utf-8")))
+        response = _get_session().post(url=voice_url, data=json_data, headers=headers)
+        res = _decode_response(response)
         return res
 
     def update_voice_asr_offline_syntax(self,object: Dict):
@@ -5405,11 +7087,11 @@ class Voice(object):
                     }
 
         """
-        voice_url = basic_url+"voice/asr/offlinesyntax"
+        voice_url = _get_basic_url()+"voice/asr/offlinesyntax"
         param = object
         json_data = json.dumps(param)
-        response = requests.put(url=voice_url, data=json_data, headers=headers)
-        res = json.loads(str(response.content.decode("utf-8")))
+        response = _get_session().put(url=voice_url, data=json_data, headers=headers)
+        res = _decode_response(response)
         return res
 
     def get_voice_asr_offline_syntax_grammars(self):
@@ -5434,9 +7116,9 @@ class Voice(object):
                     }
 
         """
-        voice_url = basic_url+"voice/asr/offlinesyntax/grammars"
-        response = requests.get(url=voice_url, headers=headers)
-        res = json.loads(str(response.content.decode("utf-8")))
+        voice_url = _get_basic_url()+"voice/asr/offlinesyntax/grammars"
+        response = _get_session().get(url=voice_url, headers=headers)
+        res = _decode_response(response)
         return res
 
     ################ NLP #############
@@ -5454,9 +7136,9 @@ class Voice(object):
                     }
 
         """
-        voice_url = basic_url+"voice/asr"
-        response = requests.delete(url=voice_url, headers=headers)
-        res = json.loads(str(response.content.decode("utf-8")))
+        voice_url = _get_basic_url()+"voice/asr"
+        response = _get_session().delete(url=voice_url, headers=headers)
+        res = _decode_response(response)
         return res
 
     def get_voice_nlp_state(self):
@@ -5478,12 +7160,9 @@ class Voice(object):
                     }
 
         """
-        voice_url = basic_url+"voice/asr"
-        response = requests.get(url=voice_url, headers=headers)
-        res = json.loads(str(response.content.decode("utf-8")))
-        dataStr = res["data"].strip(b'\x00'.decode())
-        res["data"] = json.loads(dataStr)
-        return res
+        voice_url = _get_basic_url()+"voice/asr"
+        response = _get_session().get(url=voice_url, headers=headers)
+        return _decode_nested(_decode_response(response))
 
     def start_voice_nlp(self,continues=False, timestamp=0):
         """开始语义理解
@@ -5505,11 +7184,11 @@ class Voice(object):
                     }
 
         """
-        voice_url = basic_url+"voice/asr"
+        voice_url = _get_basic_url()+"voice/asr"
         param = {"continues": continues, "timestamp": timestamp}
         json_data = json.dumps(param)
-        response = requests.put(url=voice_url, data=json_data, headers=headers)
-        res = json.loads(str(response.content.decode("utf-8")))
+        response = _get_session().put(url=voice_url, data=json_data, headers=headers)
+        res = _decode_response(response)
         return res
 
     def sync_do_voice_nlp_value(self):
@@ -5528,7 +7207,7 @@ class Voice(object):
         timestamp = int(time.time())
         self.start_voice_nlp(timestamp=timestamp)
         coroutine = self.__wait_result(timestamp,self.get_voice_nlp_state)
-        loop = asyncio.get_event_loop()
+        loop = _get_event_loop()
         tasks = loop.create_task(coroutine)
         loop.run_until_complete(tasks)
         res = tasks.result()
@@ -5561,7 +7240,7 @@ class Voice(object):
         coroutine = self.__wait_result(timestamp, self.get_voice_nlp_state)
         # result = asyncio.run(coroutine)
 
-        loop = asyncio.get_event_loop()
+        loop = _get_event_loop()
         tasks = loop.create_task(coroutine)
         loop.run_until_complete(tasks)
         return tasks.result()
@@ -5581,9 +7260,9 @@ class Voice(object):
                     }
 
         """
-        voice_url = basic_url+"voice/tts"
-        response = requests.delete(url=voice_url, headers=headers)
-        res = json.loads(str(response.content.decode("utf-8")))
+        voice_url = _get_basic_url()+"voice/tts"
+        response = _get_session().delete(url=voice_url, headers=headers)
+        res = _decode_response(response)
         return res
 
     def get_voice_tts_state(self,timestamp: int = None):
@@ -5611,15 +7290,12 @@ class Voice(object):
                     }
 
         """
-        voice_url = basic_url+"voice/tts"
-        response = requests.get(url=voice_url, headers=headers)
+        voice_url = _get_basic_url()+"voice/tts"
+        response = _get_session().get(url=voice_url, headers=headers)
         if timestamp != None:
             params = {'timestamp': timestamp}
-            response = requests.get(url=voice_url, headers=headers, params=params)
-        res = json.loads(str(response.content.decode("utf-8")))
-        res["data"] = json.loads(
-            str(res["data"].strip(b'\x00'.decode())))
-        return res
+            response = _get_session().get(url=voice_url, headers=headers, params=params)
+        return _decode_nested(_decode_response(response))
 
     def start_voice_tts(self,tts: str = "", interrupt: bool = True, timestamp: int = 0):
         """开始语音合成任务
@@ -5642,11 +7318,11 @@ class Voice(object):
                     }
 
         """
-        voice_url = basic_url+"voice/tts"
+        voice_url = _get_basic_url()+"voice/tts"
         param = {"tts": tts, "interrupt": interrupt, "timestamp": timestamp}
         json_data = json.dumps(param)
-        response = requests.put(url=voice_url, data=json_data, headers=headers)
-        res = json.loads(str(response.content.decode("utf-8")))
+        response = _get_session().put(url=voice_url, data=json_data, headers=headers)
+        res = _decode_response(response)
         return res
 
     def sync_do_tts(self,tts: str = "", interrupt: bool = True):
@@ -5679,23 +7355,24 @@ class Voice(object):
             logging.error("do tts failed error code = %d msg = %s",res.get("code",-1),res.get("msg","unknow error"))
             return res
         coroutine = self.__wait_result_common(timestamp=t, getFuc=self.get_voice_tts_state, args=(t,))
-        loop = asyncio.get_event_loop()
+        loop = _get_event_loop()
         tasks = loop.create_task(coroutine)
         loop.run_until_complete(tasks)
         # Success Example
         return tasks.result()
 
     async def __wait_result(self,timestamp, getFuc):
+        end = _wait_deadline()
         while True:
             res = getFuc()
             if(timestamp == res["timestamp"]):
                 status = res["status"]
                 if status == "idle":
                     return res
-                else:
-                    await asyncio.sleep(1)
+            await asyncio.sleep(_wait_interval(1, end, getFuc.__name__))
 
     async def __wait_result_common(self,timestamp, getFuc, args=()):
+        end = _wait_deadline()
         while True:
             res = getFuc(*args)
             # print(res)
@@ -5703,11 +7380,10 @@ class Voice(object):
                 status = res["status"]
                 if status == "idle":
                     return res
-                else:
-                    await asyncio.sleep(1)
+            await asyncio.sleep(_wait_interval(1, end, getFuc.__name__))
 
     def __resIsSuccess(self,res):
-        if not isinstance(res,Dict):
+        if not isinstance(res,Mapping):
             return False
         if not "code" in res:
             return False
@@ -5715,6 +7391,107 @@ class Voice(object):
 
 ######## Yanshee control uKit2.0 API ##################################
 
+#网卡广播地址缓存，网卡地址或子网掩码变化、或者超过broadcast_refresh_interval秒时重新查找
+broadcast_refresh_interval = 60
+_broadcast_cache = {"ips": None, "signature": None, "checked": 0.0, "refreshed": 0.0}
+_broadcast_lock = threading.Lock()
+
+
+def _interface_addresses():
+    """在进程内枚举网卡的ipv4地址，优先使用psutil，没有安装时在Linux上用ioctl查询
+
+    Returns:
+        List[tuple]: [(网卡名, 地址, 子网掩码, 广播地址)]，不支持广播的网卡广播地址为None
+    """
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    addresses = []
+    if psutil is not None:
+        for name, addrs in psutil.net_if_addrs().items():
+            for addr in addrs:
+                if addr.family == AF_INET:
+                    addresses.append((name, addr.address, addr.netmask, addr.broadcast))
+        return addresses
+    import fcntl
+    SIOCGIFFLAGS = 0x8913
+    SIOCGIFADDR = 0x8915
+    SIOCGIFBRDADDR = 0x8919
+    SIOCGIFNETMASK = 0x891b
+    IFF_UP = 0x1
+    IFF_BROADCAST = 0x2
+    s = socket(AF_INET, SOCK_DGRAM)
+    try:
+        for index, name in if_nameindex():
+            request = struct.pack('256s', name[:15].encode("utf-8"))
+            try:
+                flags = struct.unpack('H', fcntl.ioctl(s.fileno(), SIOCGIFFLAGS, request)[16:18])[0]
+                if not flags & IFF_UP:
+                    continue
+                address = inet_ntoa(fcntl.ioctl(s.fileno(), SIOCGIFADDR, request)[20:24])
+                netmask = inet_ntoa(fcntl.ioctl(s.fileno(), SIOCGIFNETMASK, request)[20:24])
+                broadcast = inet_ntoa(fcntl.ioctl(s.fileno(), SIOCGIFBRDADDR, request)[20:24]) \
+                    if flags & IFF_BROADCAST else None
+            except OSError:
+                #网卡没有ipv4地址
+                continue
+            addresses.append((name, address, netmask, broadcast))
+    finally:
+        s.close()
+    return addresses
+
+
+def _interface_signature(addresses):
+    """网卡名称、地址和子网掩码，用来判断网络是否有变化(如DHCP续租换了地址或网段)"""
+    return tuple(sorted((name, address, netmask) for name, address, netmask, broadcast in addresses))
+
+
+def _scan_broadcast_ips(addresses = None):
+    """网卡的广播地址，不包括回环网卡"""
+    if addresses is None:
+        addresses = _interface_addresses()
+    return [broadcast for name, address, netmask, broadcast in addresses
+            if broadcast and not address.startswith("127.")]
+
+
+def _find_broadcast_ips(refresh: bool = False):
+    """查找本机网卡的广播地址
+
+    结果会被缓存，每秒最多检查一次网卡的地址和子网掩码，有变化或者缓存过期时更新广播地址。
+
+    Args:
+        refresh(bool): 忽略缓存重新查找
+
+    Returns:
+        List[str]: 广播地址列表
+    """
+    now = time.monotonic()
+    cache = _broadcast_cache
+    if not refresh and cache["ips"] is not None and now - cache["checked"] < 1.0:
+        return cache["ips"]
+    with _broadcast_lock:
+        try:
+            addresses = _interface_addresses()
+        except (OSError, ImportError, NameError) as e:
+            logging.error("find broadcast address failed: %s", e)
+            addresses = []
+        signature = _interface_signature(addresses)
+        if refresh or cache["ips"] is None or signature != cache["signature"] or \
+                now - cache["refreshed"] >= broadcast_refresh_interval:
+            cache["ips"] = _scan_broadcast_ips(addresses)
+            cache["signature"] = signature
+            cache["refreshed"] = now
+        cache["checked"] = now
+        return cache["ips"]
+
+
+def _get_lib_send():
+    """uKit2.0数据帧编解码库，只在机器人上安装"""
+    from lib_ukit import lib_send
+    return lib_send
+
+
 class ukit_controller:
     """通过Yanshee机器人控制uKit2.0的接口类
 
@@ -5724,26 +7501,18 @@ class ukit_controller:
     recv_ip = "0.0.0.0"
     port = 25880
     buffsize = 1024
-    udp_send_socket = socket(AF_INET, SOCK_DGRAM)
-    udp_send_socket.setsockopt(SOL_SOCKET, SO_BROADCAST, 1)
-    udp_recv_socket = socket(AF_INET, SOCK_DGRAM)
-    udp_recv_socket.setsockopt(SOL_SOCKET, SO_BROADCAST, 1)
 
     def __init__(self):
+        #套接字在创建实例时才打开，导入模块时不占用
+        self.udp_send_socket = socket(AF_INET, SOCK_DGRAM)
+        self.udp_send_socket.setsockopt(SOL_SOCKET, SO_BROADCAST, 1)
+        self.udp_recv_socket = socket(AF_INET, SOCK_DGRAM)
+        self.udp_recv_socket.setsockopt(SOL_SOCKET, SO_BROADCAST, 1)
         self.send_addr = (self.send_ip,self.port)
         self.recv_addr = (self.recv_ip,self.port)
 
     def __auto_find_broadcast_ip(self):
-        ipstr = '([0-9]{1,3}\.){3}[0-9]{1,3}'
-        ipconfig_process = subprocess.Popen("ifconfig", stdout=subprocess.PIPE)
-        output = (ipconfig_process.stdout.read())
-        broad_pattern = re.compile('(broadcast %s)' % ipstr)
-        pattern = re.compile(ipstr)
-        broadlist = []
-        for broadaddr in broad_pattern.finditer(str(output)):
-            broad = pattern.search(broadaddr.group())
-            broadlist.append(broad.group())
-        return broadlist
+        return _find_broadcast_ips()
 
     def creat_channel_to_ukit(self,port = 0):
         """设置yanshee UDP广播通道的ukit端口号
@@ -5794,7 +7563,7 @@ class ukit_controller:
         if len(ip_list) > 0:
             self.send_ip = ip_list[0]
         self.send_addr = (self.send_ip,self.port)
-        data_msg = lib_send.lib_send_data_to_uKit(msg)
+        data_msg = _get_lib_send().lib_send_data_to_uKit(msg)
         print("send_data_to_ukit: " + data_msg)
         #将每个十六进制都转成单独的bytes发给Ukit
         self.udp_send_socket.sendto(bytes.fromhex(data_msg), self.send_addr)
@@ -5808,7 +7577,7 @@ class ukit_controller:
         """
         data, addr = self.udp_recv_socket.recvfrom(self.buffsize)
         #解析接收到的数据帧
-        recv_msg = lib_send.lib_get_msg_from_uKit(data.hex())
+        recv_msg = _get_lib_send().lib_get_msg_from_uKit(data.hex())
         return recv_msg
     def close_channel_to_ukit(self):
         """关闭yanshee UDP广播通道
@@ -5818,6 +7587,1779 @@ class ukit_controller:
         self.udp_recv_socket.close()
 
 
+class _UkitProtocol(asyncio.DatagramProtocol):
+    """UkitChannel的数据报回调
+
+    :meta private:
+    """
+    def __init__(self, channel):
+        self._channel = channel
+
+    def datagram_received(self, data, addr):
+        self._channel._received(data, addr)
+
+    def error_received(self, exc):
+        logging.error("ukit channel error: %s", exc)
+
+
+class UkitChannel(object):
+    """基于asyncio的uKit2.0 UDP通道
+
+    广播地址在打开时查找一次，发送直接交给事件循环，不等待也不再查找网卡；
+    收到的数据帧和接收时间一起放入有界队列，队列满时丢弃最旧的数据帧。
+    只接收peer或者广播地址所在网段发来的数据帧，其他来源的计入rejected。
+
+    Args:
+        port(int): uKit2.0的广播监听端口号，0~99，对应实际25880~25979端口
+        broadcast_ip(str): 广播地址，默认使用第一个网卡的广播地址
+        maxsize(int): 接收队列长度，默认1024
+        decode(bool): 是否用lib_ukit解析收发的消息，False时直接收发bytes
+        peer(str): uKit2.0的ip地址，设置后只接收这个地址发来的数据帧
+
+    Examples:
+        >>> async def main():
+                async with YanAPI.UkitChannel() as channel:
+                    channel.send("...")
+                    t, msg, addr = await channel.recv(timeout=1)
+            asyncio.run(main())
+    """
+    def __init__(self, port: int = 0, broadcast_ip: str = None, maxsize: int = 1024, decode: bool = True,
+                 peer: str = None):
+        if port > 99 or port < 0:
+            raise ValueError("PORT is out of rang for 0~99")
+        self.port = port + 25880
+        self.broadcast_ip = broadcast_ip
+        self.maxsize = maxsize
+        self.decode = decode
+        self.peer = peer
+        self.dropped = 0
+        self.rejected = 0
+        self._networks = ()
+        self._queue = None
+        self._sendTransport = None
+        self._recvTransport = None
+        self._sendPort = None
+
+    @property
+    def queue(self):
+        """asyncio.Queue: (接收时间, 数据帧bytes, 发送方地址)"""
+        return self._queue
+
+    async def open(self):
+        """查找广播地址并打开收发套接字，需要在事件循环中调用"""
+        loop = asyncio.get_event_loop()
+        if self.broadcast_ip is None:
+            ips = _find_broadcast_ips()
+            self.broadcast_ip = ips[0] if ips else "255.255.255.255"
+        self._networks = self._allowed_networks()
+        self._queue = asyncio.Queue(maxsize = self.maxsize)
+        self._sendTransport, _ = await loop.create_datagram_endpoint(
+            lambda: _UkitProtocol(self), local_addr = ("0.0.0.0", 0), allow_broadcast = True)
+        self._sendPort = self._sendTransport.get_extra_info("sockname")[1]
+        self._recvTransport, _ = await loop.create_datagram_endpoint(
+            lambda: _UkitProtocol(self), local_addr = ("0.0.0.0", self.port), allow_broadcast = True)
+        #高频收发时加大接收缓冲区，减少内核丢包
+        self._recvTransport.get_extra_info("socket").setsockopt(SOL_SOCKET, SO_RCVBUF, 1 << 20)
+        return self
+
+    def _allowed_networks(self):
+        """可以接收数据帧的网段[(网络地址, 掩码)]，都是32位整数"""
+        def toInt(address):
+            return struct.unpack("!I", inet_aton(address))[0]
+        if self.peer is not None:
+            return [(toInt(self.peer), 0xFFFFFFFF)]
+        try:
+            addresses = _interface_addresses()
+        except (OSError, ImportError, NameError):
+            addresses = []
+        networks = [(toInt(address) & toInt(netmask), toInt(netmask))
+                    for name, address, netmask, broadcast in addresses
+                    if netmask and (broadcast == self.broadcast_ip or
+                                    (self.broadcast_ip == "255.255.255.255" and not address.startswith("127.")))]
+        if not networks and self.broadcast_ip != "255.255.255.255":
+            #广播地址不属于任何网卡时当作单个设备的地址
+            networks = [(toInt(self.broadcast_ip), 0xFFFFFFFF)]
+        return networks
+
+    def _received(self, data, addr):
+        #自己发出的广播也会被接收端口收到
+        if addr[1] == self._sendPort:
+            return
+        source = struct.unpack("!I", inet_aton(addr[0]))[0]
+        if not any(source & mask == network for network, mask in self._networks):
+            self.rejected += 1
+            return
+        if self._queue.full():
+            self._queue.get_nowait()
+            self.dropped += 1
+        self._queue.put_nowait((time.time(), data, addr))
+
+    def send(self, msg):
+        """发送消息给uKit2.0，不等待发送完成
+
+        Args:
+            msg(str/bytes): decode为True时是uKit消息内容，否则是原始数据帧
+        """
+        if self.decode:
+            msg = bytes.fromhex(_get_lib_send().lib_send_data_to_uKit(msg))
+        self._sendTransport.sendto(msg, (self.broadcast_ip, self.port))
+
+    async def recv(self, timeout: float = None):
+        """等待下一条消息
+
+        Returns:
+            (float, str/bytes, tuple): 接收时间，消息内容，发送方地址
+        """
+        t, data, addr = await asyncio.wait_for(self._queue.get(), timeout)
+        if self.decode:
+            data = _get_lib_send().lib_get_msg_from_uKit(data.hex())
+        return t, data, addr
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        if self._recvTransport is None and self._queue.empty():
+            raise StopAsyncIteration
+        return await self.recv()
+
+    def close(self):
+        """关闭收发套接字"""
+        for transport in (self._sendTransport, self._recvTransport):
+            if transport is not None:
+                transport.close()
+        self._sendTransport = None
+        self._recvTransport = None
+
+    async def __aenter__(self):
+        return await self.open()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self.close()
+
+
+######## Yanshee Sensor Recorder ##################################
+
+#各类传感器记录的字段，多个字段按顺序保存为一行
+sensor_record_fields = {
+    "gyro": ["gyro-x", "gyro-y", "gyro-z", "accel-x", "accel-y", "accel-z",
+             "compass-x", "compass-y", "compass-z", "euler-x", "euler-y", "euler-z"],
+    "environment": ["temperature", "humidity", "pressure"],
+    "infrared": ["value"],
+    "ultrasonic": ["value"],
+    "pressure": ["value"],
+    "touch": ["value"],
+}
+
+
+class SensorRingBuffer(object):
+    """预分配的传感器采样环形缓冲区
+
+    时间戳和采样值保存在固定大小的numpy数组中，写满后覆盖最旧的数据，写入不分配内存。
+    每个采样有一个递增的序号，读取方可以用序号判断是否有数据被覆盖。
+    dropped记录还没有被读取(latest/since/window)就被覆盖的采样数，大于0说明读取跟不上写入。
+
+    Args:
+        capacity(int): 最多保存的采样数
+        fields(List[str]): 每个采样的字段名
+    """
+    def __init__(self, capacity: int, fields: List[str]):
+        import numpy
+        self._np = numpy
+        self.capacity = capacity
+        self.fields = list(fields)
+        self.timestamps = numpy.zeros(capacity, dtype=numpy.float64)
+        self.values = numpy.full((capacity, len(self.fields)), numpy.nan, dtype=numpy.float64)
+        self.total = 0
+        self.dropped = 0
+        self._readTotal = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return min(self.total, self.capacity)
+
+    def append(self, timestamp: float, row):
+        """写入一个采样
+
+        Args:
+            timestamp(float): 采样时间，time.time()
+            row: 长度等于字段数的采样值
+        """
+        with self._lock:
+            if self.total - self.capacity >= self._readTotal:
+                self.dropped += 1
+            index = self.total % self.capacity
+            self.timestamps[index] = timestamp
+            self.values[index] = row
+            self.total += 1
+
+    def _slice(self, first: int, last: int):
+        #返回序号[first, last)的数据拷贝，调用方持有锁
+        np = self._np
+        self._readTotal = max(self._readTotal, last)
+        indexes = np.arange(first, last) % self.capacity
+        return self.timestamps[indexes], self.values[indexes]
+
+    def latest(self, count: int):
+        """最近count个采样
+
+        Returns:
+            tuple: (timestamps, values) 两个numpy数组
+        """
+        with self._lock:
+            last = self.total
+            first = max(last - min(count, self.capacity), 0)
+            return self._slice(first, last)
+
+    def since(self, index: int):
+        """序号大于等于index的所有采样
+
+        Returns:
+            tuple: (timestamps, values, next_index, lost)
+                   next_index为下次读取使用的序号，lost为已经被覆盖而读不到的采样数
+        """
+        with self._lock:
+            last = self.total
+            first = max(index, last - self.capacity, 0)
+            timestamps, values = self._slice(first, last)
+            return timestamps, values, last, first - index if first > index else 0
+
+    def window(self, seconds: float, end: float = None):
+        """时间窗口内的采样
+
+        Args:
+            seconds(float): 窗口长度，单位秒
+            end(float): 窗口结束时间，默认为最新采样时间
+
+        Returns:
+            tuple: (timestamps, values) 两个numpy数组，按时间排序
+        """
+        np = self._np
+        with self._lock:
+            last = self.total
+            timestamps, values = self._slice(max(last - self.capacity, 0), last)
+        if len(timestamps) == 0:
+            return timestamps, values
+        if end is None:
+            end = timestamps[-1]
+        begin = np.searchsorted(timestamps, end - seconds, side="left")
+        stop = np.searchsorted(timestamps, end, side="right")
+        return timestamps[begin:stop], values[begin:stop]
+
+
+class SensorRecorder(object):
+    """传感器连续记录
+
+    后台线程按固定频率读取传感器(source="poll")，或者订阅机器人推送(source="push")，
+    把采样写入SensorRingBuffer。写入不依赖读取方，读取慢时不会阻塞采样。
+
+    Args:
+        type(str): 传感器类型 gyro, environment, infrared, ultrasonic, touch, pressure
+        rate(float): 采样频率，单位Hz，默认20
+        capacity(int): 缓冲区采样数，默认6000
+        id(int): 传感器地址，默认取第一个传感器
+        source(str): poll 轮询 push 订阅推送(频率由机器人timeval决定，最快10Hz)
+
+    push模式下订阅每subscription_timeout/3秒续订一次，续订失败时记录在error中并计入errors，
+    下一个周期继续尝试。
+
+    Examples:
+        >>> recorder = YanAPI.SensorRecorder("gyro", rate=50)
+            recorder.start()
+            time.sleep(10)
+            timestamps, values = recorder.buffer.window(5)
+            recorder.stop()
+    """
+    #push模式的订阅时长，单位秒，机器人接受1~60秒
+    subscription_timeout = 10
+
+    def __init__(self, type: str, rate: float = 20, capacity: int = 6000, id: int = None, source: str = "poll"):
+        if type not in sensor_record_fields:
+            raise ValueError("unsupported sensor type: %s" % type)
+        if source not in ("poll", "push"):
+            raise ValueError("source must be poll or push")
+        self.type = type
+        self.rate = rate
+        self.id = id
+        self.source = source
+        self.buffer = SensorRingBuffer(capacity, sensor_record_fields[type])
+        self.errors = 0
+        self.late = 0
+        self.error = None
+        self._robot = _current_robot.get()
+        self._running = False
+        self._stopped = threading.Event()
+        self._thread = None
+        self._url = None
+
+    @property
+    def dropped(self):
+        """int: 缓冲区写满后没有被读取就被覆盖的采样数"""
+        return self.buffer.dropped
+
+    def _call(self, func, *args, **kwargs):
+        if self._robot is not None:
+            return self._robot.call(func, *args, **kwargs)
+        return func(*args, **kwargs)
+
+    def _add_sample(self, timestamp: float, data):
+        items = data.get(self.type) if isinstance(data, Mapping) else None
+        if not items:
+            self.errors += 1
+            return
+        item = items[0]
+        if self.id is not None:
+            for candidate in items:
+                if candidate.get("id") == self.id:
+                    item = candidate
+                    break
+        self.buffer.append(timestamp, [item.get(field, float("nan")) for field in self.buffer.fields])
+
+    def _poll(self):
+        getFuc = globals()["get_sensors_" + self.type]
+        period = 1.0 / self.rate
+        deadline = time.monotonic()
+        while self._running:
+            try:
+                res = self._call(getFuc)
+                if isinstance(res, Mapping) and res.get("code") == 0:
+                    self._add_sample(time.time(), res["data"])
+                else:
+                    self.errors += 1
+            except Exception as e:
+                logging.error("read sensor %s failed: %s", self.type, e)
+                self.errors += 1
+            deadline += period
+            delay = deadline - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                #跟不上设定频率时不追赶，从当前时间重新计时
+                self.late += 1
+                deadline = time.monotonic()
+
+    def _on_push(self, robot_ip, data):
+        robotIp = self._robot.ip if self._robot is not None else ip
+        if robot_ip != robotIp:
+            return
+        self._add_sample(time.time(), data.get("data", data) if isinstance(data, Mapping) else data)
+
+    def _subscribe(self):
+        timeval = max(100, int(1000 / self.rate))
+        try:
+            return self._call(start_subscribe_sensor, url = self._url, type = self.type, id = self.id or 0,
+                              timeval = timeval, timeout = self.subscription_timeout)
+        except Exception as e:
+            return {"code": -1, "msg": str(e)}
+
+    def _renew(self):
+        #在订阅到期之前续订，否则机器人停止推送
+        while not self._stopped.wait(self.subscription_timeout / 3):
+            res = self._subscribe()
+            if res.get("code", -1) != 0:
+                logging.error("renew sensor %s subscription failed: code = %d msg = %s",
+                              self.type, res.get("code",-1), res.get("msg",""))
+                self.error = res
+                self.errors += 1
+
+    def start(self):
+        """开始记录"""
+        if self._running:
+            return
+        self._running = True
+        if self.source == "poll":
+            self._thread = threading.Thread(target=self._poll, name="yan-sensor-"+self.type, daemon=True)
+            self._thread.start()
+            return
+        receiver = _get_subscription_receiver()
+        robotIp = self._robot.ip if self._robot is not None else ip
+        self._url = receiver.url("record/"+self.type, robotIp)
+        receiver.add_listener("record/"+self.type, self._on_push)
+        res = self._subscribe()
+        if res.get("code", -1) != 0:
+            receiver.remove_listener("record/"+self.type, self._on_push)
+            self._running = False
+            self._url = None
+            self.error = res
+            logging.error("error code = %d msg = %s",res.get("code",-1),res.get("msg",""))
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._renew, name="yan-sensor-"+self.type, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止记录，已记录的数据保留在buffer中"""
+        if not self._running:
+            return
+        self._running = False
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._url is not None:
+            _get_subscription_receiver().remove_listener("record/"+self.type, self._on_push)
+            self._call(stop_subscribe_sensor, url = self._url, type = self.type, id = self.id or 0)
+            self._url = None
+
+
+######## Yanshee Servo Controller ##################################
+
+class ServoController(object):
+    """合并舵机读写请求
+
+    多个线程同时读取舵机角度时，只发送一次 servos/angles?names=... 请求，结果分给所有读取方。
+    写入先在本地合并，同一个舵机只保留最新的角度，write_window秒后用一次set_servos_angles发出。
+
+    Args:
+        write_window(float): 写入合并窗口，单位秒，默认0.02
+        read_window(float): 读取合并窗口，单位秒，默认0.002
+        runtime(int): 合并后发送时使用的运行时间，单位ms，默认200
+
+    Examples:
+        >>> servos = YanAPI.ServoController()
+            servos.set_angle("NeckLR", 60)
+            servos.set_angles({"RightShoulderFlex": 90, "NeckLR": 90})  # NeckLR只发送90
+            print(servos.get_angles(["NeckLR", "RightShoulderRoll"]))
+            servos.flush()
+    """
+    def __init__(self, write_window: float = 0.02, read_window: float = 0.002, runtime: int = 200):
+        self.write_window = write_window
+        self.read_window = read_window
+        self.runtime = runtime
+        self.requests = 0
+        self._robot = _current_robot.get()
+        self._lock = threading.Lock()
+        self._pendingReads = None
+        self._pendingWrites = {}
+        self._writeTimer = None
+
+    def _call(self, func, *args, **kwargs):
+        self.requests += 1
+        if self._robot is not None:
+            return self._robot.call(func, *args, **kwargs)
+        return func(*args, **kwargs)
+
+    @staticmethod
+    def _servo_name(name):
+        #NeckLR、neck_lr、RobotJointType.NeckLR合并到同一个舵机，无效的名称原样发送由接口报错
+        try:
+            return _joint_names[_joint_slot(name)]
+        except (KeyError, ValueError):
+            return name
+
+    def get_angles(self, names: List[str] = None):
+        """查询舵机角度，与同时进行的其他查询合并为一次请求
+
+        Args:
+            names(List[str]): 舵机名称列表，默认全部17个舵机
+
+        Returns:
+            Dict: {舵机名: 角度}，查询失败时为空
+        """
+        if names is None:
+            names = [joint.value for joint in RobotJointType]
+        with self._lock:
+            batch = self._pendingReads
+            leader = batch is None
+            if leader:
+                batch = {"names": set(), "done": threading.Event(), "data": {}}
+                self._pendingReads = batch
+            batch["names"].update(self._servo_name(name) for name in names)
+        if leader:
+            #等待其他线程加入本次查询
+            time.sleep(self.read_window)
+            with self._lock:
+                self._pendingReads = None
+            try:
+                res = self._call(get_servos_angles, sorted(batch["names"]))
+                if isinstance(res, Mapping) and res.get("code") == 0:
+                    batch["data"] = res["data"]
+                else:
+                    logging.error("error code = %d msg = %s",res.get("code",-1),res.get("msg",""))
+            finally:
+                batch["done"].set()
+        else:
+            batch["done"].wait()
+        data = batch["data"]
+        return {name: data[self._servo_name(name)] for name in names if self._servo_name(name) in data}
+
+    def get_angle(self, name: str):
+        """查询单个舵机角度，失败返回-1"""
+        return self.get_angles([name]).get(name, -1)
+
+    def set_angles(self, angles: Dict[str, int]):
+        """写入舵机角度，在合并窗口结束后统一发送
+
+        Args:
+            angles(map): {servoName:angle}
+        """
+        angles = {self._servo_name(name): angle for name, angle in angles.items()}
+        with self._lock:
+            self._pendingWrites.update(angles)
+            if self._writeTimer is None:
+                self._writeTimer = threading.Timer(self.write_window, self.flush)
+                self._writeTimer.daemon = True
+                self._writeTimer.start()
+
+    def set_angle(self, name: str, angle: int):
+        """写入单个舵机角度"""
+        self.set_angles({name: angle})
+
+    def flush(self):
+        """立即发送所有未发送的写入
+
+        Returns:
+            Dict: set_servos_angles的返回值，没有待发送数据时返回None
+        """
+        with self._lock:
+            if self._writeTimer is not None:
+                self._writeTimer.cancel()
+                self._writeTimer = None
+            angles = self._pendingWrites
+            self._pendingWrites = {}
+        if not angles:
+            return None
+        res = self._call(set_servos_angles, angles, self.runtime)
+        if res.get("code", -1) != 0:
+            logging.error("error code = %d msg = %s",res.get("code",-1),res.get("msg",""))
+        return res
+
+
+######## Yanshee Motion Sequencer ##################################
+
+class MotionSequencer(object):
+    """按时间轴播放关键帧动作
+
+    创建时把关键帧之间的姿态按发送频率插值好，播放时按绝对时间点发送，
+    每一帧的发送时间都从开始时间算起，不会因为单次请求变慢而累积误差；
+    落后超过一帧时跳过已经过期的中间姿态，直接发送当前时间对应的姿态。
+
+    Args:
+        keyframes(List): [(时间, RobotActionFrame或{舵机名: 角度}), ...]，时间单位秒，从0开始
+        rate(float): 每秒发送的姿态数，默认20
+        runtime(int): 每个姿态的舵机运行时间，单位ms，默认取发送间隔，不小于200
+
+    Examples:
+        >>> seq = YanAPI.MotionSequencer([
+                (0.0, RobotActionFrame({"NeckLR": 90})),
+                (1.0, RobotActionFrame({"NeckLR": 30, "RightShoulderFlex": 150})),
+                (2.0, RobotActionFrame({"NeckLR": 150, "RightShoulderFlex": 15})),
+            ])
+            print(seq.play())
+    """
+    def __init__(self, keyframes: List, rate: float = 20, runtime: int = None):
+        self.interval = 1.0 / rate
+        self.runtime = runtime or max(200, int(self.interval * 1000))
+        keyframes = sorted(keyframes, key=lambda item: item[0])
+        self.poses = self._interpolate(self._limit(keyframes))
+        self._duration = keyframes[-1][0] if keyframes else 0
+        self.stats = {}
+        self._robot = _current_robot.get()
+        self._stopEvent = threading.Event()
+        self._thread = None
+
+    @property
+    def duration(self):
+        """时间轴长度，单位秒"""
+        return self._duration
+
+    def _limit(self, keyframes):
+        """播放前一次检查所有关键帧，插值出的姿态在两个关键帧之间，不会超出安全范围"""
+        if servo_limit_mode == "off" or not keyframes:
+            return keyframes
+        frames = [frame if isinstance(frame, RobotActionFrame) else RobotActionFrame(frame) for t, frame in keyframes]
+        angles = RobotActionFrame.stack(frames)
+        bad = validate_joint_angles(angles)
+        if not bad.any():
+            return keyframes
+        index, servo = [int(i) for i in next(zip(*bad.nonzero()))]
+        message = "keyframe %d %s angle %d out of range %d-%d" % ((index, _joint_names[servo], angles[index, servo]) + joint_limits[_joint_names[servo]])
+        if servo_limit_mode == "reject":
+            raise ValueError(message)
+        logging.warning(message + ", clamped")
+        clamped = clamp_joint_angles(angles)
+        return [(t, RobotActionFrame.fromArray(row)) for (t, frame), row in zip(keyframes, clamped)]
+
+    def _interpolate(self, keyframes):
+        """预先计算每个发送时间点的姿态，只保留相对上一个姿态有变化的舵机"""
+        frames = []
+        current = {}
+        for t, frame in keyframes:
+            angles = frame.interfaceDict if isinstance(frame, RobotActionFrame) else frame
+            #关键帧中没有的舵机保持上一帧的角度
+            current = dict(current, **angles)
+            frames.append((t, current))
+        poses = []
+        last = {}
+        steps = int(round(frames[-1][0] / self.interval)) if frames else -1
+        k = 0
+        for step in range(steps + 1):
+            t = step * self.interval
+            while k + 1 < len(frames) and frames[k + 1][0] <= t:
+                k += 1
+            t0, a = frames[k]
+            if k + 1 < len(frames):
+                t1, b = frames[k + 1]
+                ratio = (t - t0) / (t1 - t0) if t1 > t0 else 1.0
+                #前面关键帧中没有出现的舵机，到它所在的关键帧时才开始发送
+                pose = {name: int(round(angle + (b.get(name, angle) - angle) * ratio)) for name, angle in a.items()}
+            else:
+                pose = dict(a)
+            changed = {name: angle for name, angle in pose.items() if last.get(name) != angle}
+            last = pose
+            if changed:
+                poses.append((t, changed))
+        return poses
+
+    def _send(self, angles):
+        if self._robot is not None:
+            return self._robot.call(set_servos_angles, angles, self.runtime)
+        return set_servos_angles(angles, self.runtime)
+
+    def _wait_until(self, deadline):
+        #粗等待交给sleep，最后1ms自旋，减少系统调度带来的误差
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 or self._stopEvent.is_set():
+                return
+            if remaining > 0.002:
+                self._stopEvent.wait(remaining - 0.001)
+
+    def play(self):
+        """在当前线程播放，结束后返回
+
+        Returns:
+            Dict: {"sent": 发送的姿态数, "skipped": 因落后跳过的姿态数, "errors": 发送失败次数, "max_lag": 最大发送延迟(秒)}
+        """
+        self._stopEvent.clear()
+        stats = {"sent": 0, "skipped": 0, "errors": 0, "max_lag": 0.0}
+        self.stats = stats
+        start = time.perf_counter()
+        i = 0
+        pending = {}
+        while i < len(self.poses) and not self._stopEvent.is_set():
+            self._wait_until(start + self.poses[i][0])
+            #落后时合并所有已经到时间的姿态，只发送最新的角度
+            now = time.perf_counter() - start
+            pending.update(self.poses[i][1])
+            i += 1
+            while i < len(self.poses) and self.poses[i][0] <= now:
+                pending.update(self.poses[i][1])
+                stats["skipped"] += 1
+                i += 1
+            stats["max_lag"] = max(stats["max_lag"], now - self.poses[i - 1][0])
+            try:
+                res = self._send(pending)
+                if res.get("code", -1) != 0:
+                    stats["errors"] += 1
+                    logging.error("error code = %d msg = %s",res.get("code",-1),res.get("msg",""))
+            except Exception as e:
+                stats["errors"] += 1
+                logging.error("send pose failed: %s", e)
+            stats["sent"] += 1
+            pending = {}
+        return stats
+
+    def start(self):
+        """在后台线程播放"""
+        context = contextvars.copy_context()
+        self._stopEvent.clear()
+        self._thread = threading.Thread(target=context.run, args=(self.play,), name="yan-motion-sequencer", daemon=True)
+        self._thread.start()
+        return self
+
+    def wait(self, timeout: float = None):
+        """等待后台播放结束，返回是否已经结束"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+            return not self._thread.is_alive()
+        return True
+
+    def stop(self):
+        """停止播放"""
+        self._stopEvent.set()
+        self.wait()
+
+
+######## Yanshee Robot & Fleet ##################################
+
+class YanRobot(object):
+    """单个机器人的实例接口
+
+    每个实例有独立的地址和连接池，模块里的所有接口函数都可以作为实例方法调用，
+    一个进程可以同时操作多个机器人，不需要再用yan_api_init切换全局状态。
+
+    Args:
+        robot_ip(str): 机器人ip地址
+        pool_size(int): 连接池大小，默认10
+        max_retries(int): 建立连接失败时的重试次数，默认3
+        session(requests.Session): 使用已有的HTTP会话，不再单独创建，close时不会关闭它
+
+    Examples:
+        >>> robot = YanAPI.YanRobot("192.168.1.15")
+            print(robot.get_robot_battery_value())
+            robot.start_play_motion(name="wave")
+    """
+    def __init__(self, robot_ip: str, pool_size: int = 10, max_retries: int = 3, session = None):
+        self.ip = robot_ip
+        self.basic_url = "http://"+robot_ip+":9090/v1/"
+        self._ownSession = session is None
+        self.session = _create_session(pool_size, max_retries) if session is None else session
+
+    def __repr__(self):
+        return "YanRobot(%r)" % self.ip
+
+    def call(self, func, *args, **kwargs):
+        """以本机器人为目标调用模块接口函数
+
+        Args:
+            func: YanAPI中的接口函数，如YanAPI.get_robot_battery_value
+
+        Returns:
+            接口函数的返回值
+        """
+        token = _current_robot.set(self)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current_robot.reset(token)
+
+    def __getattr__(self, name):
+        func = globals().get(name)
+        if name.startswith('_') or not callable(func) or isinstance(func, type):
+            raise AttributeError("'YanRobot' object has no attribute '%s'" % name)
+        return functools.partial(self.call, func)
+
+    def close(self):
+        """关闭连接池"""
+        if self._ownSession:
+            self.session.close()
+
+
+class _LoopExecutor(ThreadPoolExecutor):
+    """每个工作线程带一个事件循环的线程池，sync_*接口需要当前线程有事件循环
+
+    shutdown时关闭这些事件循环，释放它们占用的文件描述符。
+
+    :meta private:
+    """
+    def __init__(self, max_workers: int = None):
+        self._loops = []
+        self._loopsLock = threading.Lock()
+        super().__init__(max_workers = max_workers, initializer = self._init_worker)
+
+    def _init_worker(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        with self._loopsLock:
+            self._loops.append(loop)
+
+    def shutdown(self, wait = True, **kwargs):
+        super().shutdown(wait = wait, **kwargs)
+        if not wait:
+            return
+        with self._loopsLock:
+            loops, self._loops = self._loops, []
+        for loop in loops:
+            loop.close()
+
+
+class YanFleet(object):
+    """多机器人并发控制
+
+    把同一个接口调用同时分发给所有机器人，按机器人ip返回各自的结果。
+    某个机器人调用出错时，对应的结果是异常对象，不影响其他机器人。
+
+    Args:
+        robot_ips(List[str]): 机器人ip地址列表
+        max_workers(int): 最大并发数，默认等于机器人数量
+        pool_size(int): 每个机器人的连接池大小，默认4
+
+    Examples:
+        >>> fleet = YanAPI.YanFleet(["192.168.1.13", "192.168.1.15"])
+            print(fleet.get_robot_battery_value())
+            ===============
+            {"192.168.1.13": 80, "192.168.1.15": 95}
+            fleet.sync_play_motion(name="wave")
+    """
+    def __init__(self, robot_ips: List[str], max_workers: int = None, pool_size: int = 4):
+        self.robots = {}
+        for robot_ip in robot_ips:
+            self.robots[robot_ip] = YanRobot(robot_ip, pool_size = pool_size)
+        self._executor = _LoopExecutor(max_workers = max_workers or max(len(self.robots), 1))
+
+    def __getitem__(self, robot_ip):
+        return self.robots[robot_ip]
+
+    def __len__(self):
+        return len(self.robots)
+
+    def call(self, func, *args, **kwargs):
+        """在所有机器人上并发调用同一个接口函数
+
+        Args:
+            func: YanAPI中的接口函数，如YanAPI.start_play_motion
+
+        Returns:
+            Dict: {robot_ip: 返回值或异常对象}
+        """
+        futures = {}
+        for robot_ip, robot in self.robots.items():
+            #每个任务复制一次上下文，继承调用者的deadline
+            futures[robot_ip] = self._executor.submit(contextvars.copy_context().run, robot.call, func, *args, **kwargs)
+        results = {}
+        for robot_ip, future in futures.items():
+            try:
+                results[robot_ip] = future.result()
+            except Exception as e:
+                logging.error("robot %s call %s failed: %s", robot_ip, getattr(func, "__name__", func), e)
+                results[robot_ip] = e
+        return results
+
+    def __getattr__(self, name):
+        func = globals().get(name)
+        if name.startswith('_') or not callable(func) or isinstance(func, type):
+            raise AttributeError("'YanFleet' object has no attribute '%s'" % name)
+        return functools.partial(self.call, func)
+
+    @classmethod
+    def discover(cls, subnet: str = None, max_workers: int = None, pool_size: int = 4, **kwargs):
+        """扫描网段，用找到的机器人创建YanFleet，并为每个机器人预先建立pool_size个连接
+
+        Args:
+            subnet(str): 网段，如"192.168.1.0/24"，默认扫描本机所在网段
+            kwargs: 转发给discover_robots的参数
+
+        Returns:
+            YanFleet: 机器人集群，discovered属性是discover_robots的返回值
+        """
+        kwargs["warm_connections"] = 0
+        robots = discover_robots(subnet, **kwargs)
+        fleet = cls([robot["ip"] for robot in robots], max_workers = max_workers, pool_size = pool_size)
+        fleet.discovered = robots
+        list(fleet._executor.map(lambda robot: _warm_up(robot.session, robot.ip, pool_size), fleet.robots.values()))
+        return fleet
+
+    def upload_bundle(self, motions: List[str] = (), music: List[str] = (), samples: List[str] = (), progress = None):
+        """把一组动作、音乐和样本图片文件并发上传到所有机器人
+
+        每个机器人的每个文件是一个独立的上传任务，文件按块流式发送。
+
+        Args:
+            motions(List[str]): 动作文件路径
+            music(List[str]): 音乐文件路径
+            samples(List[str]): 样本图片路径
+            progress: 进度回调 progress(robot_ip, 文件路径, 已发送字节数, 总字节数)
+
+        Returns:
+            Dict: {robot_ip: {文件路径: 返回值或异常对象}}
+        """
+        uploads = [(upload_motion, path) for path in motions] + [(upload_media_music, path) for path in music] + \
+                  [(upload_vision_photo_sample, path) for path in samples]
+        futures = {}
+        for robot_ip, robot in self.robots.items():
+            for upload, path in uploads:
+                callback = None
+                if progress is not None:
+                    callback = functools.partial(progress, robot_ip, path)
+                futures[(robot_ip, path)] = self._executor.submit(contextvars.copy_context().run, robot.call, upload, path, callback)
+        results = {robot_ip: {} for robot_ip in self.robots}
+        for (robot_ip, path), future in futures.items():
+            try:
+                results[robot_ip][path] = future.result()
+            except Exception as e:
+                logging.error("robot %s upload %s failed: %s", robot_ip, path, e)
+                results[robot_ip][path] = e
+        return results
+
+    def close(self):
+        """关闭线程池和所有机器人的连接池"""
+        self._executor.shutdown(wait=True)
+        for robot in self.robots.values():
+            robot.close()
+
+
+class BatchCall(object):
+    """YanBatch中的一次接口调用
+
+    :meta private:
+    """
+    def __init__(self, func, args, kwargs, after, context):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.after = after
+        self.context = context
+        self._future = None
+
+    def __repr__(self):
+        return "BatchCall(%s)" % getattr(self.func, "__name__", self.func)
+
+    def done(self):
+        return self._future is not None and self._future.done()
+
+    def result(self, timeout: float = None):
+        """返回调用结果，调用出错时抛出对应的异常"""
+        if self._future is None:
+            raise RuntimeError("batch has not been run")
+        return self._future.result(timeout)
+
+
+class YanBatch(object):
+    """批量并发调用接口
+
+    在with块中登记的调用不会立即执行，退出with块时通过连接池并发执行，
+    互不依赖的调用同时发出，整组调用的耗时接近一次请求的往返时间。
+    通过after参数指定依赖的调用，被依赖的调用完成后才会执行。
+
+    Args:
+        max_workers(int): 最大并发数，默认等于调用数量，不超过连接池大小
+        robot(YanRobot): 目标机器人，默认使用当前机器人
+
+    Examples:
+        >>> with YanAPI.batch() as b:
+                b.set_robot_led("button", "blue", "on")
+                b.set_robot_volume(60)
+                language = b.set_robot_language("zh")
+                b.start_voice_tts("你好", after=language)
+            print(b.results)
+    """
+    def __init__(self, max_workers: int = None, robot = None):
+        self.calls = []
+        self.results = None
+        self._maxWorkers = max_workers
+        self._robot = robot
+
+    def call(self, func, *args, after = None, **kwargs):
+        """登记一次调用
+
+        Args:
+            func: YanAPI中的接口函数，如YanAPI.set_robot_volume
+            after(BatchCall/List[BatchCall]): 需要先完成的调用
+
+        Returns:
+            BatchCall: 执行后可以通过result()获取结果
+        """
+        if self.results is not None:
+            raise RuntimeError("batch has already been run")
+        if isinstance(after, BatchCall):
+            after = [after]
+        after = list(after or ())
+        for dep in after:
+            if not any(dep is call for call in self.calls):
+                raise ValueError("%r is not an earlier call of this batch" % dep)
+        call = BatchCall(func, args, kwargs, after, contextvars.copy_context())
+        self.calls.append(call)
+        return call
+
+    def __getattr__(self, name):
+        func = globals().get(name)
+        if name.startswith('_') or not callable(func) or isinstance(func, type):
+            raise AttributeError("'YanBatch' object has no attribute '%s'" % name)
+        return functools.partial(self.call, func)
+
+    def _run_call(self, call):
+        for dep in call.after:
+            try:
+                dep.result()
+            except Exception as e:
+                raise RuntimeError("dependency %r failed: %s" % (dep, e)) from e
+        if self._robot is not None:
+            return call.context.run(self._robot.call, call.func, *call.args, **call.kwargs)
+        return call.context.run(call.func, *call.args, **call.kwargs)
+
+    def run(self):
+        """执行所有登记的调用
+
+        Returns:
+            List: 按登记顺序排列的返回值，出错的调用对应异常对象
+        """
+        if self.results is not None:
+            return self.results
+        workers = self._maxWorkers or min(max(len(self.calls), 1), http_pool_size)
+        #调用按登记顺序提交，被依赖的调用总是先出队，等待依赖不会占满线程池
+        with _LoopExecutor(max_workers = workers) as executor:
+            for call in self.calls:
+                call._future = executor.submit(self._run_call, call)
+            results = []
+            for call in self.calls:
+                try:
+                    results.append(call.result())
+                except Exception as e:
+                    logging.error("batch call %r failed: %s", call, e)
+                    results.append(e)
+        self.results = results
+        return results
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.run()
+
+
+def batch(max_workers: int = None):
+    """创建批量并发调用的上下文，用法见YanBatch
+
+    Args:
+        max_workers(int): 最大并发数
+
+    Returns:
+        YanBatch: 批量调用对象
+    """
+    return YanBatch(max_workers, _current_robot.get())
+
+######## Yanshee Robot Discovery ##################################
+
+def _local_networks():
+    """本机所在的ipv4网段，超过/24的网段只扫描本机所在的/24"""
+    import ipaddress
+    addresses = []
+    try:
+        import psutil
+        for name, addrs in psutil.net_if_addrs().items():
+            for addr in addrs:
+                if addr.family == AF_INET and addr.netmask and not addr.address.startswith("127."):
+                    addresses.append((addr.address, addr.netmask))
+    except ImportError:
+        local = _local_ip_for("8.8.8.8")
+        if not local.startswith("127."):
+            addresses.append((local, "255.255.255.0"))
+    networks = []
+    for address, netmask in addresses:
+        network = ipaddress.ip_interface(address+"/"+netmask).network
+        if network.prefixlen < 24:
+            network = ipaddress.ip_interface(address+"/24").network
+        if network not in networks:
+            networks.append(network)
+    return networks
+
+
+async def _scan_port(hosts: List[str], port: int, timeout: float, max_concurrency: int):
+    """并发尝试建立TCP连接，返回端口开放的主机"""
+    semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def probe(host):
+        async with semaphore:
+            try:
+                reader, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+            except (OSError, asyncio.TimeoutError):
+                return None
+            writer.close()
+            return host
+    results = await asyncio.gather(*[probe(host) for host in hosts])
+    return [host for host in results if host is not None]
+
+
+def _warm_up(session, robot_ip: str, count: int, port: int = 9090):
+    """同时发出count个请求，让连接池里保持count个已经建立的连接"""
+    if count <= 0:
+        return
+    url = "http://"+robot_ip+":"+str(port)+"/v1/devices/battery"
+    with ThreadPoolExecutor(max_workers = count) as executor:
+        list(executor.map(lambda i: session.get(url = url, headers = headers, timeout = 5).content, range(count)))
+
+
+def discover_robots(subnet: str = None, port: int = 9090, timeout: float = 0.5, max_concurrency: int = 128,
+                    warm_connections: int = 2):
+    """扫描网段中的Yanshee机器人
+
+    先并发探测9090端口，再对端口开放的主机请求 /v1/devices/battery，返回码正常的才认为是机器人，
+    然后查询版本信息，并在全局连接池中为每个机器人预先建立连接，之后yan_api_init切换到这些机器人时不需要再建立连接。
+
+    Args:
+        subnet(str): 网段，如"192.168.1.0/24"，默认扫描本机所在网段
+        port(int): 机器人接口端口，默认9090
+        timeout(float): 每个主机的连接超时，单位秒
+        max_concurrency(int): 同时探测的主机数
+        warm_connections(int): 为每个机器人预先建立的连接数
+
+    Returns:
+        List[Dict]: [{"ip": 机器人ip, "battery": 电量信息, "version": 版本信息, "latency": 请求耗时(秒)}]
+
+    Examples:
+        >>> for robot in YanAPI.discover_robots("192.168.1.0/24"):
+                print(robot["ip"], robot["battery"]["percent"])
+    """
+    import ipaddress
+    networks = [ipaddress.ip_network(subnet, strict=False)] if subnet else _local_networks()
+    hosts = [str(host) for network in networks for host in network.hosts()]
+    loop = _get_event_loop()
+    candidates = loop.run_until_complete(_scan_port(hosts, port, timeout, max_concurrency))
+    session = _get_session()
+
+    def identify(host):
+        base = "http://"+host+":"+str(port)+"/v1/"
+        begin = time.perf_counter()
+        try:
+            res = _decode_response(session.get(url = base+"devices/battery", headers = headers, timeout = timeout * 4))
+        except Exception:
+            return None
+        latency = time.perf_counter() - begin
+        if not __resIsSuccess(res) or "percent" not in res.get("data", {}):
+            return None
+        robot = {"ip": host, "battery": res["data"], "version": {}, "latency": latency}
+        try:
+            version = _decode_response(session.get(url = base+"devices/versions", headers = headers,
+                                                    params = {"type": "core"}, timeout = timeout * 4))
+            if __resIsSuccess(version):
+                robot["version"] = version["data"]
+            _warm_up(session, host, warm_connections, port)
+        except Exception as e:
+            logging.error("robot %s warm up failed: %s", host, e)
+        return robot
+
+    with ThreadPoolExecutor(max_workers = max(1, min(len(candidates), 32))) as executor:
+        robots = [robot for robot in executor.map(identify, candidates) if robot is not None]
+    return sorted(robots, key = lambda robot: ipaddress.ip_address(robot["ip"]))
+
+
+######## Yanshee Telemetry ##################################
+
+#TelemetryCollector采集的字段，布尔值保存为0/1，没有数据时为nan
+telemetry_fields = ["voltage", "charging", "percent", "energy_saving_mode", "calibration_mode",
+                    "temperature", "humidity", "pressure", "gait_status"]
+
+
+class _TelemetrySeries(object):
+    """单个机器人的列式时间序列，每一列是一个内存映射文件
+
+    :meta private:
+    """
+    def __init__(self, path: str, fields: List[str], capacity: int):
+        import numpy
+        self._np = numpy
+        self.path = path
+        self.fields = fields
+        os.makedirs(path, exist_ok=True)
+        metaPath = os.path.join(path, "meta.json")
+        meta = {}
+        if os.path.exists(metaPath):
+            with open(metaPath) as fp:
+                meta = json.load(fp)
+        self.count = meta.get("count", 0)
+        self.capacity = max(meta.get("capacity", capacity), capacity)
+        self.columns = {}
+        self._open_columns()
+
+    def _open_columns(self):
+        np = self._np
+        for name, dtype in [("timestamp", np.float64)] + [(field, np.float32) for field in self.fields]:
+            filePath = os.path.join(self.path, name + ".bin")
+            size = self.capacity * np.dtype(dtype).itemsize
+            with open(filePath, "ab") as fp:
+                if fp.tell() < size:
+                    fp.truncate(size)
+            self.columns[name] = np.memmap(filePath, dtype=dtype, mode="r+", shape=(self.capacity,))
+
+    def _grow(self, needed: int):
+        #按倍数扩大文件，已写入的数据不需要拷贝
+        while self.capacity < needed:
+            self.capacity *= 2
+        self.flush()
+        self.columns = {}
+        self._open_columns()
+
+    def append(self, timestamps, values: Dict):
+        """写入多行，timestamps需要递增且不早于已有数据"""
+        np = self._np
+        timestamps = np.atleast_1d(np.asarray(timestamps, dtype=np.float64))
+        n = len(timestamps)
+        if self.count + n > self.capacity:
+            self._grow(self.count + n)
+        end = self.count + n
+        self.columns["timestamp"][self.count:end] = timestamps
+        for field in self.fields:
+            column = values.get(field)
+            self.columns[field][self.count:end] = np.nan if column is None else column
+        self.count = end
+
+    def range(self, start: float = None, end: float = None):
+        """时间范围[start, end]对应的行号范围"""
+        np = self._np
+        timestamps = self.columns["timestamp"][:self.count]
+        first = 0 if start is None else int(np.searchsorted(timestamps, start, side="left"))
+        last = self.count if end is None else int(np.searchsorted(timestamps, end, side="right"))
+        return first, last
+
+    def flush(self):
+        #先把数据写入磁盘再更新行数，meta.json通过改名整体替换，中断时保留上一次的内容
+        for column in self.columns.values():
+            column.flush()
+        metaPath = os.path.join(self.path, "meta.json")
+        with open(metaPath + ".tmp", "w") as fp:
+            json.dump({"count": self.count, "capacity": self.capacity, "fields": self.fields}, fp)
+            fp.flush()
+            os.fsync(fp.fileno())
+        os.replace(metaPath + ".tmp", metaPath)
+
+
+def _readonly(view):
+    view.flags.writeable = False
+    return view
+
+
+class TelemetryStore(object):
+    """机器人遥测数据的列式存储
+
+    每个机器人一个目录，时间戳和每个字段分别保存在内存映射文件中，按时间追加写入，
+    查询时用二分查找定位时间范围，直接返回文件映射的数组切片，不需要再读取机器人。
+
+    写入的数据先留在内存映射中，只有调用flush()、close()或者文件写满扩容时才写入磁盘并记录行数，
+    进程异常退出时，上一次flush之后写入的数据会丢失。
+
+    Args:
+        path(str): 存储目录
+        fields(List[str]): 字段名，默认telemetry_fields
+        capacity(int): 每个机器人初始的行数，写满后文件扩大为原来的两倍
+
+    Examples:
+        >>> store = YanAPI.TelemetryStore("./telemetry")
+            t, data = store.query("192.168.1.15", start=time.time() - 3600)
+            t, data = store.downsample("192.168.1.15", 60, start=time.time() - 86400)
+    """
+    def __init__(self, path: str, fields: List[str] = None, capacity: int = 65536):
+        self.path = path
+        self.fields = list(fields or telemetry_fields)
+        self.capacity = capacity
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def _get_series(self, robot_ip: str):
+        series = self._series.get(robot_ip)
+        if series is None:
+            series = _TelemetrySeries(os.path.join(self.path, robot_ip), self.fields, self.capacity)
+            self._series[robot_ip] = series
+        return series
+
+    def robots(self):
+        """已经保存数据的机器人ip"""
+        if not os.path.isdir(self.path):
+            return []
+        return sorted(name for name in os.listdir(self.path) if os.path.exists(os.path.join(self.path, name, "meta.json")))
+
+    def append(self, robot_ip: str, timestamp: float, row: Dict):
+        """写入一行
+
+        Args:
+            robot_ip(str): 机器人ip
+            timestamp(float): 采样时间，time.time()
+            row(Dict): {字段名: 值}，没有的字段保存为nan
+        """
+        with self._lock:
+            self._get_series(robot_ip).append(timestamp, row)
+
+    def append_many(self, robot_ip: str, timestamps, columns: Dict):
+        """批量写入多行
+
+        Args:
+            timestamps: 递增的采样时间数组
+            columns(Dict): {字段名: 与timestamps等长的数组}
+        """
+        with self._lock:
+            self._get_series(robot_ip).append(timestamps, columns)
+
+    def query(self, robot_ip: str, start: float = None, end: float = None, fields: List[str] = None):
+        """查询时间范围内的数据
+
+        Returns:
+            tuple: (timestamps, {字段名: 数组})，数组是内存映射的只读视图，不需要拷贝
+        """
+        with self._lock:
+            series = self._get_series(robot_ip)
+            first, last = series.range(start, end)
+            return _readonly(series.columns["timestamp"][first:last]), \
+                   {field: _readonly(series.columns[field][first:last]) for field in (fields or self.fields)}
+
+    def downsample(self, robot_ip: str, bucket: float, start: float = None, end: float = None,
+                   fields: List[str] = None, how: str = "mean"):
+        """按固定时间间隔聚合，用于绘制图表
+
+        Args:
+            bucket(float): 聚合间隔，单位秒
+            how(str): mean 平均值 min 最小值 max 最大值 last 最后一个值，nan不参与计算
+
+        Returns:
+            tuple: (每个间隔的开始时间, {字段名: 聚合结果})，没有数据的间隔不返回
+        """
+        import numpy as np
+        timestamps, data = self.query(robot_ip, start, end, fields)
+        if len(timestamps) == 0:
+            return timestamps, data
+        origin = timestamps[0] if start is None else start
+        keys = ((timestamps - origin) // bucket).astype(np.int64)
+        #数据按时间排序，每个间隔是连续的一段
+        starts = np.flatnonzero(np.r_[True, keys[1:] != keys[:-1]])
+        result = {}
+        for field, values in data.items():
+            values = np.asarray(values, dtype=np.float64)
+            valid = ~np.isnan(values)
+            if how == "mean":
+                sums = np.add.reduceat(np.where(valid, values, 0), starts)
+                counts = np.add.reduceat(valid.astype(np.int64), starts)
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    result[field] = sums / counts
+            elif how == "min":
+                result[field] = np.minimum.reduceat(np.where(valid, values, np.inf), starts)
+                result[field][np.isinf(result[field])] = np.nan
+            elif how == "max":
+                result[field] = np.maximum.reduceat(np.where(valid, values, -np.inf), starts)
+                result[field][np.isinf(result[field])] = np.nan
+            elif how == "last":
+                #每个间隔中最后一个不是nan的值的下标，整个间隔都是nan时为-1
+                last = np.maximum.reduceat(np.where(valid, np.arange(len(values)), -1), starts)
+                result[field] = np.where(last >= 0, values[last], np.nan)
+            else:
+                raise ValueError("unsupported aggregation: %s" % how)
+        return origin + keys[starts] * bucket, result
+
+    def flush(self):
+        """把数据和行数写入磁盘"""
+        with self._lock:
+            for series in self._series.values():
+                series.flush()
+
+    def close(self):
+        self.flush()
+        with self._lock:
+            self._series = {}
+
+
+def _read_telemetry(robot):
+    """读取一个机器人的遥测字段，读取失败的字段不返回"""
+    row = {}
+    res = robot.call(get_robot_battery_info)
+    if __resIsSuccess(res):
+        row.update({key: res["data"].get(key) for key in ("voltage", "charging", "percent")})
+    res = robot.call(get_robot_mode)
+    if __resIsSuccess(res):
+        row.update({key: int(bool(res["data"].get(key))) for key in ("energy_saving_mode", "calibration_mode")})
+    res = robot.call(get_sensors_environment)
+    if __resIsSuccess(res) and res["data"].get("environment"):
+        environment = res["data"]["environment"][0]
+        row.update({key: environment.get(key) for key in ("temperature", "humidity", "pressure")})
+    res = robot.call(get_motion_gait_state)
+    if __resIsSuccess(res):
+        row["gait_status"] = res["data"].get("status")
+    return row
+
+
+class TelemetryCollector(object):
+    """后台采集机器人的电量、运行模式、环境传感器和步态状态
+
+    每个周期并发读取所有机器人，结果写入TelemetryStore，某个机器人读取失败时只记录错误。
+    每隔flush_interval秒以及停止时调用store.flush()，异常退出时最多丢失这段时间内的数据。
+
+    Args:
+        store(TelemetryStore): 数据存储
+        robots(List): 机器人ip或YanRobot列表，默认使用当前机器人
+        interval(float): 采集间隔，单位秒，默认5
+        flush_interval(float): 写入磁盘的间隔，单位秒，默认60
+
+    Examples:
+        >>> store = YanAPI.TelemetryStore("./telemetry")
+            collector = YanAPI.TelemetryCollector(store, ["192.168.1.13", "192.168.1.15"]).start()
+            ...
+            collector.stop()
+    """
+    def __init__(self, store: TelemetryStore, robots: List = None, interval: float = 5.0, flush_interval: float = 60.0):
+        self.store = store
+        if robots is None:
+            robot = _current_robot.get()
+            if robot is None:
+                #使用yan_api_init设置的全局机器人和会话
+                robot = YanRobot(ip, session = _get_session())
+                robot.basic_url = _get_basic_url()
+            robots = [robot]
+        if not robots:
+            raise ValueError("robots must not be empty")
+        self.robots = [robot if isinstance(robot, YanRobot) else YanRobot(robot, pool_size = 2) for robot in robots]
+        self.interval = interval
+        self.flush_interval = flush_interval
+        self.samples = 0
+        self.errors = 0
+        self._stopEvent = threading.Event()
+        self._thread = None
+
+    def _read(self, robot):
+        #一个机器人没有响应时不拖慢整个采集周期
+        with deadline(self.interval):
+            return _read_telemetry(robot)
+
+    def sample(self):
+        """采集一次所有机器人"""
+        timestamp = time.time()
+        with ThreadPoolExecutor(max_workers = len(self.robots)) as executor:
+            futures = [(robot, executor.submit(self._read, robot)) for robot in self.robots]
+            for robot, future in futures:
+                try:
+                    row = future.result()
+                except Exception as e:
+                    self.errors += 1
+                    logging.error("robot %s telemetry failed: %s", robot.ip, e)
+                    continue
+                if not row:
+                    self.errors += 1
+                    continue
+                self.store.append(robot.ip, timestamp, row)
+                self.samples += 1
+
+    def _run(self):
+        start = time.monotonic()
+        lastFlush = start
+        cycle = 0
+        while not self._stopEvent.is_set():
+            self.sample()
+            now = time.monotonic()
+            if now - lastFlush >= self.flush_interval:
+                self.store.flush()
+                lastFlush = now
+            #按开始时间计算下一次采集，采集耗时不会累积
+            cycle = max(cycle + 1, int((now - start) / self.interval))
+            self._stopEvent.wait(max(0, start + cycle * self.interval - time.monotonic()))
+        self.store.flush()
+
+    def start(self):
+        """启动后台采集"""
+        self._stopEvent.clear()
+        self._thread = threading.Thread(target=self._run, name="yan-telemetry", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止采集并写入磁盘"""
+        self._stopEvent.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+
+######## Yanshee Async Client ##################################
+
+class AsyncYanClient(object):
+    """基于aiohttp的异步接口类
+
+    与模块函数一一对应，但所有接口都是可等待的(awaitable)。一个事件循环里可以同时驱动多个机器人，
+    多个客户端可以共用同一个aiohttp.ClientSession。
+
+    Args:
+        robot_ip(str): 机器人ip地址
+        pool_size(int): 每个机器人的最大并发连接数，默认10
+        session(aiohttp.ClientSession): 可选，共享的会话，由调用者负责关闭
+
+    Examples:
+        >>> async def main():
+                async with YanAPI.AsyncYanClient("192.168.1.15") as robot:
+                    print(await robot.get_robot_battery_value())
+            asyncio.run(main())
+    """
+    def __init__(self, robot_ip: str, pool_size: int = 10, session=None):
+        self.ip = robot_ip
+        self.basic_url = "http://"+robot_ip+":9090/v1/"
+        self._pool_size = pool_size
+        self._session = session
+        self._ownSession = session is None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
+    async def close(self):
+        """关闭客户端自己创建的会话"""
+        if self._ownSession and self._session is not None:
+            await self._session.close()
+        self._session = None
+
+    def _get_session(self):
+        if self._session is None:
+            import aiohttp
+            connector = aiohttp.TCPConnector(limit_per_host=self._pool_size)
+            self._session = aiohttp.ClientSession(connector=connector)
+            self._ownSession = True
+        return self._session
+
+    @staticmethod
+    def _query(params: Dict):
+        #与requests一致，列表参数展开成多个同名参数，布尔值转成小写字符串
+        query = []
+        for key, value in params.items():
+            values = value if isinstance(value, (list, tuple)) else [value]
+            for item in values:
+                if isinstance(item, bool):
+                    item = "true" if item else "false"
+                query.append((key, str(item)))
+        return query
+
+    async def _request(self, method: str, path: str, param: Dict = None, params: Dict = None):
+        """发送一次请求并返回解析后的json
+
+        Args:
+            method(str): GET/PUT/POST/DELETE
+            path(str): 相对于 http://ip:9090/v1/ 的路径
+            param(Dict): 请求体，会被编码成json
+            params(Dict): url查询参数
+        """
+        import aiohttp
+        data = json.dumps(param) if param is not None else None
+        query = self._query(params) if params else None
+        timeout = _request_timeout()
+        connect, read = timeout if isinstance(timeout, tuple) else (timeout, timeout)
+        breaker = _get_breaker(self.ip)
+        breaker.before_request()
+        try:
+            async with self._get_session().request(method, self.basic_url+path, data=data, params=query, headers=headers,
+                                                   timeout=aiohttp.ClientTimeout(total=None, sock_connect=connect, sock_read=read)) as response:
+                content = await response.read()
+        except (aiohttp.ClientConnectionError, asyncio.TimeoutError):
+            breaker.record(False)
+            raise
+        except BaseException:
+            breaker.record(None)
+            raise
+        breaker.record(True)
+        return _parse_json(content)
+
+    async def _wait_idle(self, getFuc, isRunning, interval: float = 0.2):
+        end = _wait_deadline()
+        while True:
+            res = await getFuc()
+            #查询失败时停止等待，返回这次的结果
+            if not self.__resIsSuccess(res) or not isRunning(res):
+                return res
+            await asyncio.sleep(_wait_interval(interval, end, "robot %s" % self.ip))
+
+    def __resIsSuccess(self,res):
+        if not isinstance(res,Mapping):
+            return False
+        if not "code" in res:
+            return False
+        return (res["code"]==0)
+
+    ################ devices #############
+    async def get_robot_battery_info(self):
+        """获得机器人电量信息，返回值同get_robot_battery_info"""
+        return await self._request("GET", "devices/battery")
+
+    async def get_robot_battery_value(self):
+        """获得机器人电量百分比，失败返回-1"""
+        res = await self.get_robot_battery_info()
+        if not self.__resIsSuccess(res):
+            logging.error("error code = %d msg = %s",res.get("code",-1),res.get("msg",""))
+            return -1
+        return RobotBatteryInfo(res["data"]).batteryPercentage
+
+    async def get_robot_version_info(self, type: str):
+        """获取机器人版本信息，返回值同get_robot_version_info"""
+        return await self._request("GET", "devices/versions", params={"type": type})
+
+    async def get_robot_mode(self):
+        """获取机器人运行模式，返回值同get_robot_mode"""
+        return await self._request("GET", "devices/mode")
+
+    async def set_robot_volume(self, volume: int):
+        """设置机器人音量，返回值同set_robot_volume"""
+        return await self._request("PUT", "devices/volume", {"volume": volume})
+
+    async def set_robot_led(self, type: str, color: str, mode: str):
+        """设置机器人灯效，返回值同set_robot_led"""
+        return await self._request("PUT", "devices/led", {"type": type, "color": color, "mode": mode})
+
+    ################ servos #############
+    async def get_servos_angles(self, names: List[str]):
+        """查询一个或多个舵机角度，返回值同get_servos_angles"""
+        return await self._request("GET", "servos/angles", params={"names": names})
+
+    async def get_servo_angle_value(self, name: str):
+        """查询单个舵机角度值，失败返回-1"""
+        res = await self.get_servos_angles([name])
+        if not self.__resIsSuccess(res):
+            logging.error("error code = %d msg = %s",res.get("code",-1),res.get("msg",""))
+            return -1
+        return res["data"].popitem()[1]
+
+    async def set_servos_angles(self, angles: Dict[str, int], runtime: int = 200):
+        """设置舵机角度值，返回值同set_servos_angles"""
+        angles, error = _limit_servo_angles(angles)
+        if error:
+            logging.error(error)
+            return {"code": -1, "data": {}, "msg": error}
+        return await self._request("PUT", "servos/angles", {"angles": angles, "runtime": runtime})
+
+    async def set_servos_angles_layers(self, data: Dict[str,Dict[int,int]]):
+        """分层设置舵机角度值，返回值同set_servos_angles_layers"""
+        data, error = _limit_servo_layers(data)
+        if error:
+            logging.error(error)
+            return {"code": -1, "data": {}, "msg": error}
+        return await self._request("PUT", "servos/angles/layers", {"data": data})
+
+    async def get_servos_mode(self, names: List[str]):
+        """查询舵机工作模式，返回值同get_servos_mode"""
+        return await self._request("GET", "servos/mode", params={"names": names})
+
+    async def set_servos_mode(self, mode: str, servos: List[str]):
+        """设置舵机工作模式，返回值同set_servos_mode"""
+        return await self._request("PUT", "servos/mode", {"mode": mode, "servos": [{"name": name} for name in servos]})
+
+    ################ sensors #############
+    async def get_sensors_list(self):
+        """获取所有传感器的列表，返回值同get_sensors_list"""
+        return await self._request("GET", "sensors/list")
+
+    async def get_sensors(self, type: str, id: List[int] = None, slot: List[int] = None):
+        """读取指定类型的传感器
+
+        Args:
+            type(str): gyro, environment, infrared, ultrasonic, touch, pressure
+            id(List[int]): 传感器地址，可不填
+            slot(List[int]): 传感器槽位号，可不填
+        """
+        params = {}
+        if id is not None:
+            params["id"] = id
+        if slot is not None:
+            params["slot"] = slot
+        return await self._request("GET", "sensors/"+type, params=params)
+
+    async def get_sensors_gyro(self):
+        return await self.get_sensors("gyro")
+
+    async def get_sensors_environment(self):
+        return await self.get_sensors("environment")
+
+    async def get_sensors_infrared(self, id: List[int] = None, slot: List[int] = None):
+        return await self.get_sensors("infrared", id, slot)
+
+    async def get_sensors_ultrasonic(self, id: List[int] = None, slot: List[int] = None):
+        return await self.get_sensors("ultrasonic", id, slot)
+
+    async def get_sensors_touch(self, id: List[int] = None, slot: List[int] = None):
+        return await self.get_sensors("touch", id, slot)
+
+    async def get_sensors_pressure(self, id: List[int] = None, slot: List[int] = None):
+        return await self.get_sensors("pressure", id, slot)
+
+    ################ motions #############
+    async def get_current_motion_play_state(self):
+        """获得当前动作文件执行状态，返回值同get_current_motion_play_state"""
+        return await self._request("GET", "motions")
+
+    async def _control_motion_play_state(self, operation: str, name: str, direction: str = "", speed: str = "normal", repeat: int = 1, timestamp: int = 0, version: str = "v1"):
+        param = {"operation": operation, "motion":
+                 {"name": name, "repeat": repeat, "speed": speed}, "timestamp": timestamp, "version": version}
+        if len(direction) != 0:
+            param["motion"]["direction"] = direction
+        return await self._request("PUT", "motions", param)
+
+    async def start_play_motion(self, name: str = "reset", direction: str = "", speed: str = "normal", repeat: int = 1, timestamp: int = 0, version: str = "v1"):
+        """开始执行动作，参数同start_play_motion"""
+        return await self._control_motion_play_state("start", name, direction, speed, repeat, timestamp, version)
+
+    async def stop_play_motion(self, name: str = "", timestamp: int = 0, version: str = "v1"):
+        """停止动作执行，参数同stop_play_motion"""
+        return await self._control_motion_play_state("stop", name, timestamp = timestamp, version = version)
+
+    async def sync_play_motion(self, name: str = "reset", direction: str = "", speed: str = "normal", repeat: int = 1):
+        """开始执行动作，执行完成后返回
+
+        Returns:
+            BOOL:True 执行成功   False 执行失败
+        """
+        t = int(time.time() * 1000)
+        res = await self.start_play_motion(name, direction, speed, repeat, t)
+        if res['code'] != 0:
+            logging.error("play motion failed error code = %d msg = %s",res.get("code",-1),res.get("msg","unknow error"))
+            return False
+        res = await self._wait_idle(self.get_current_motion_play_state,
+                                    lambda res: res['data']['name'] != "" and res['data']['status'] == 'run' and res['data']['timestamp'] == t)
+        return self.__resIsSuccess(res)
+
+    async def control_motion_gait(self, speed_v: int = 0, speed_h: int = 0, steps: int = 0, period: int = 1, wave: bool = False):
+        """机器人步态动作控制，参数同control_motion_gait"""
+        param = {"speed_v": speed_v, "speed_h": speed_h, "steps": steps, "period": period,
+                 "timestamp": int(time.time()*1000), "wave": wave}
+        return await self._request("PUT", "motions/gait", param)
+
+    async def get_motion_gait_state(self):
+        """获取机器人步态执行状态，返回值同get_motion_gait_state"""
+        return await self._request("GET", "motions/gait")
+
+    async def exit_motion_gait(self):
+        """退出机器人步态执行"""
+        return await self._request("DELETE", "motions/gait", {"timestamp": 0})
+
+    ################ voice #############
+    async def start_voice_tts(self, tts: str = "", interrupt: bool = True, timestamp: int = 0):
+        """开始语音合成，参数同start_voice_tts"""
+        return await self._request("PUT", "voice/tts", {"tts": tts, "interrupt": interrupt, "timestamp": timestamp})
+
+    async def stop_voice_tts(self):
+        return await self._request("DELETE", "voice/tts")
+
+    async def get_voice_tts_state(self, timestamp: int = None):
+        """获取语音合成状态，返回值同get_voice_tts_state"""
+        params = {'timestamp': timestamp} if timestamp is not None else None
+        res = await self._request("GET", "voice/tts", params=params)
+        return _decode_nested(res)
+
+    async def sync_do_tts(self, tts: str = "", interrupt: bool = True):
+        """语音合成，播放完成后返回"""
+        t = int(time.time())
+        res = await self.start_voice_tts(tts, interrupt, t)
+        if res['code'] != 0:
+            logging.error("do tts failed error code = %d msg = %s",res.get("code",-1),res.get("msg","unknow error"))
+            return res
+        return await self._wait_idle(lambda: self.get_voice_tts_state(t),
+                                     lambda res: res["timestamp"] != t or res["status"] != "idle")
+
+    async def start_voice_asr(self, continues=False, timestamp=0):
+        """开始语义理解，参数同start_voice_asr"""
+        return await self._request("PUT", "voice/asr", {"continues": continues, "timestamp": timestamp})
+
+    async def get_voice_asr_state(self):
+        """获取语义理解工作状态，返回值同get_voice_asr_state"""
+        res = await self._request("GET", "voice/asr")
+        return _decode_nested(res)
+
+    async def stop_voice_asr(self):
+        return await self._request("DELETE", "voice/asr")
+
+    ################ visions #############
+    async def get_visual_task_result(self, option: str, type: str):
+        """获取视觉任务结果，返回值同get_visual_task_result"""
+        return await self._request("GET", "visions", params={'option': option, 'type': type})
+
+    async def control_visual_task(self, option: str, type: str, operation: str = "start", timestamp: int = 0):
+        """开启/停止视觉任务，参数同start_face_recognition等接口"""
+        return await self._request("PUT", "visions", {"option": option, "type": type, "operation": operation, "timestamp": timestamp})
+
+    async def sync_do_visual_task(self, option: str, type: str):
+        """开启视觉任务，识别完成后返回结果
+
+        Args:
+            option(str): face, hand, color, object
+            type(str): 与option对应的识别类型，如recognition, gesture, color_detect
+        """
+        t = int(time.time())
+        res = await self.control_visual_task(option, type, "start", t)
+        if res['code'] != 0:
+            logging.error("do visual task failed error code = %d msg = %s",res.get("code",-1),res.get("msg","unknow error"))
+            return res
+        return await self._wait_idle(lambda: self.get_visual_task_result(option, type),
+                                     lambda res: res["timestamp"] != t or res["status"] != "idle")
+
+    async def take_vision_photo(self, resolution: str = "640x480"):
+        """拍一张照片，返回值同take_vision_photo"""
+        return await self._request("POST", "visions/photos", {"resolution": resolution})
+
+    async def get_vision_photo_list(self):
+        """获取机器人照片列表"""
+        return await self._request("GET", "visions/photos/list")
+
+
 #if __name__ == '__main__':
     #color = "OrAnge"
     #detect_color = color.lower()
@@ -0,0 +1,600 @@
+# coding=UTF-8
+
+''' 本地模拟Yanshee机器人的RESTful服务。
+实现YanAPI用到的 http://[ip]:9090/v1/ 接口，支持设置延迟、抖动和错误注入，
+动作、步态、音乐、TTS等任务会按真实机器人的方式从run变为idle，并向订阅地址推送状态；
+订阅和机器人一样按timeout到期，传感器订阅按timeval周期推送数据。
+没有机器人时可以用来做离线测试和压力测试。
+
+    python YanMockServer.py --port 9090 --latency 0.005 --jitter 0.002 --error-rate 0.01
+'''
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import urllib.request
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+servo_names = ["RightShoulderRoll", "RightShoulderFlex", "RightElbowFlex",
+               "LeftShoulderRoll", "LeftShoulderFlex", "LeftElbowFlex",
+               "RightHipLR", "RightHipFB", "RightKneeFlex", "RightAnkleFB", "RightAnkleUD",
+               "LeftHipLR", "LeftHipFB", "LeftKneeFlex", "LeftAnkleFB", "LeftAnkleUD",
+               "NeckLR"]
+
+#GET /v1/sensors/<type> 返回的模拟数据
+sensor_values = {
+    "gyro": [{"id": 1, "gyro-x": 0.0, "gyro-y": 0.0, "gyro-z": 0.0, "accel-x": 0.0, "accel-y": 0.0, "accel-z": 9.8,
+              "compass-x": 0.0, "compass-y": 0.0, "compass-z": 0.0, "euler-x": 0.0, "euler-y": 0.0, "euler-z": 0.0}],
+    "environment": [{"id": 1, "slot": 1, "temperature": 25, "humidity": 40, "pressure": 101325}],
+    "infrared": [{"id": 23, "slot": 1, "value": 300}],
+    "ultrasonic": [{"id": 17, "slot": 2, "value": 500}],
+    "pressure": [{"id": 35, "slot": 3, "value": 0}],
+    "touch": [{"id": 29, "slot": 4, "value": 0}],
+}
+
+
+class MockRobot(object):
+    """模拟机器人的状态和接口处理
+
+    所有状态用一把锁保护，任务结束由threading.Timer触发。
+    """
+    def __init__(self, task_time: float = 1.0, push: bool = True):
+        self.task_time = task_time
+        self.push = push
+        self._lock = threading.RLock()
+        self.battery = {"voltage": 8000, "charging": 0, "percent": 90}
+        self.volume = 50
+        self.language = "zh"
+        self.fall_management = True
+        self.leds = {"button": {"type": "button", "color": "white", "mode": "on"},
+                     "camera": {"type": "camera", "color": "green", "mode": "on"}}
+        self.servos = {name: 90 for name in servo_names}
+        self.servo_modes = {name: "work" for name in servo_names}
+        self.motion = {"name": "", "status": "idle", "timestamp": 0}
+        self.layers = []
+        self.gait = {"status": 8, "timestamp": 0}
+        self.music = {"name": "", "status": "idle"}
+        self.music_list = ["SorrySorry.mp3"]
+        self.motions = {"system_hts_motions": [{"music": False, "name": "reset.hts"}, {"music": False, "name": "wave.hts"}],
+                        "system_layers_motions": [{"music": False, "name": "reset.layers"}],
+                        "user_hts_motions": [], "user_layers_motions": []}
+        self.voice = {"asr": {"status": "idle", "timestamp": 0, "data": {}},
+                      "iat": {"status": "idle", "timestamp": 0, "data": {}},
+                      "tts": {"status": "idle", "timestamp": 0, "data": {}}}
+        self.visions = {}
+        self.photos = {}
+        self.samples = {}
+        self.tags = {}
+        #{topic: {订阅地址: 到期时间}}，到期后不再推送，和机器人一样需要重新订阅
+        self.subscriptions = {}
+        self._sensorPushers = {}
+        self._timers = []
+
+    ################ helpers #############
+    def _later(self, delay, func, *args):
+        timer = threading.Timer(delay, func, args)
+        timer.daemon = True
+        self._timers.append(timer)
+        timer.start()
+
+    def active_subscriptions(self, topic):
+        """topic下还没有到期的订阅地址，顺便清理已经到期的订阅"""
+        with self._lock:
+            urls = self.subscriptions.get(topic, {})
+            now = time.monotonic()
+            for url in [url for url, expires in urls.items() if expires <= now]:
+                del urls[url]
+            return list(urls)
+
+    def _notify(self, topic, data):
+        if not self.push:
+            return
+        for url in self.active_subscriptions(topic):
+            threading.Thread(target=_post_json, args=(url, data), daemon=True).start()
+
+    def _push_sensor(self, url, type, timeval, stop):
+        #按timeval周期推送传感器数据，订阅到期或取消后停止
+        while not stop.wait(timeval):
+            if url not in self.active_subscriptions("sensor"):
+                break
+            _post_json(url, {"code": 0, "data": self.sensor_data(type), "msg": "success"})
+        with self._lock:
+            if self._sensorPushers.get((url, type)) is stop:
+                del self._sensorPushers[(url, type)]
+
+    def cancel(self):
+        for timer in self._timers:
+            timer.cancel()
+        with self._lock:
+            for stop in self._sensorPushers.values():
+                stop.set()
+            self._sensorPushers.clear()
+
+    ################ devices #############
+    def devices(self, method, name, query, body):
+        if name == "battery":
+            return ok(dict(self.battery))
+        if name == "volume":
+            if method == "PUT":
+                self.volume = body["volume"]
+                return ok()
+            return ok({"volume": self.volume})
+        if name == "languages":
+            if method == "PUT":
+                self.language = body["language"]
+                return ok()
+            return ok({"language": self.language})
+        if name == "fall_management":
+            if method == "PUT":
+                self.fall_management = body["enable"]
+                return ok()
+            return ok({"enable": self.fall_management})
+        if name == "led":
+            if method == "PUT":
+                self.leds[body["type"]] = {"type": body["type"], "color": body["color"], "mode": body["mode"]}
+                return ok()
+            return ok(list(self.leds.values()))
+        if name == "versions":
+            versions = {"core": "1.0.0", "servo": "1.0.0", "sn": "MOCK0001"}
+            type = query.get("type", [None])[0]
+            return ok({type: versions[type]} if type in versions else versions)
+        if name == "mode":
+            return ok({"energy_saving_mode": False, "calibration_mode": False})
+        return None
+
+    ################ media #############
+    def media(self, method, path, query, body):
+        if path == "music/list":
+            return ok({"music": [{"name": name} for name in self.music_list]})
+        if method == "GET":
+            return ok(dict(self.music))
+        if method == "POST":
+            return ok()
+        if method == "DELETE":
+            if body.get("name") in self.music_list:
+                self.music_list.remove(body["name"])
+            return ok()
+        if body.get("operation") == "stop":
+            self.music["status"] = "idle"
+            return ok()
+        name = body.get("name") or "SorrySorry.mp3"
+        self.music = {"name": name, "status": "run"}
+        self._later(self.task_time, self._finish_music, name)
+        return ok()
+
+    def _finish_music(self, name):
+        with self._lock:
+            if self.music["name"] == name:
+                self.music = {"name": "", "status": "idle"}
+
+    ################ motions #############
+    def motions_api(self, method, path, query, body):
+        if path == "motions/list":
+            return ok(self.motions)
+        if path == "motions/all":
+            return ok(list(self.layers))
+        if path == "motions/gait":
+            return self.gait_api(method, body)
+        if method == "GET":
+            return ok(dict(self.motion))
+        if method in ("POST", "DELETE"):
+            return ok({})
+        operation = body.get("operation", "start")
+        motion = body.get("motion", {})
+        timestamp = body.get("timestamp", 0)
+        if operation == "start":
+            name = motion.get("name", "reset")
+            duration = self.task_time * motion.get("repeat", 1)
+            if body.get("version") == "v2":
+                layer = {"name": name + ".layers", "status": "run", "timestamp": timestamp}
+                self.layers = [item for item in self.layers if item["name"] != layer["name"]] + [layer]
+            else:
+                self.motion = {"name": name, "status": "run", "timestamp": timestamp}
+            self._notify("motion", {"name": name, "status": "run", "timestamp": timestamp})
+            self._later(duration, self._finish_motion, name, timestamp)
+            return ok({"total_time": int(duration * 1000)})
+        if operation == "stop":
+            self._finish_motion(self.motion["name"], self.motion["timestamp"])
+        return ok({"total_time": 0})
+
+    def _finish_motion(self, name, timestamp):
+        with self._lock:
+            if self.motion["timestamp"] == timestamp:
+                self.motion = {"name": name, "status": "idle", "timestamp": timestamp}
+            for layer in self.layers:
+                if layer["timestamp"] == timestamp:
+                    layer["status"] = "idle"
+            self._notify("motion", {"name": name, "status": "idle", "timestamp": timestamp})
+
+    def gait_api(self, method, body):
+        if method == "GET":
+            return ok(dict(self.gait))
+        timestamp = body.get("timestamp", 0)
+        if method == "DELETE" or body.get("period", 1) == 0:
+            self.gait = {"status": 8, "timestamp": timestamp}
+            return ok({})
+        self.gait = {"status": 2, "timestamp": timestamp}
+        self._notify("gait", dict(self.gait))
+        self._later(self.task_time, self._finish_gait, timestamp)
+        return ok()
+
+    def _finish_gait(self, timestamp):
+        with self._lock:
+            if self.gait["timestamp"] == timestamp:
+                self.gait = {"status": 5, "timestamp": timestamp}
+                self._notify("gait", dict(self.gait))
+
+    ################ servos #############
+    def servos_api(self, method, path, query, body):
+        if path == "servos/angles":
+            if method == "GET":
+                names = query.get("names", servo_names)
+                return ok({name: self.servos[name] for name in names if name in self.servos})
+            result = {}
+            for name, angle in body.get("angles", {}).items():
+                result[name] = name in self.servos
+                if result[name]:
+                    self.servos[name] = angle
+            return ok(result)
+        if path == "servos/angles/layers":
+            for name, value in body.get("data", {}).items():
+                if name in self.servos and isinstance(value, dict) and "angle" in value:
+                    self.servos[name] = value["angle"]
+            return ok({})
+        if path == "servos/mode":
+            if method == "GET":
+                names = query.get("names", servo_names)
+                return ok({name: self.servo_modes[name] for name in names if name in self.servo_modes})
+            result = {}
+            for servo in body.get("servos", []):
+                self.servo_modes[servo["name"]] = body.get("mode", "work")
+                result[servo["name"]] = True
+            return ok(result)
+        return None
+
+    ################ sensors #############
+    def sensors_api(self, method, path, query, body):
+        type = path.split("/", 1)[1] if "/" in path else ""
+        if method == "PUT":
+            return ok({})
+        if type == "list":
+            return ok({"sensors": [{"id": items[0]["id"], "slot": items[0].get("slot", 0), "type": name, "version": 1}
+                                   for name, items in sensor_values.items()]})
+        if type in sensor_values:
+            return ok(self.sensor_data(type))
+        return None
+
+    def sensor_data(self, type):
+        values = [dict(item) for item in sensor_values[type]]
+        if type == "gyro":
+            values[0]["euler-z"] = round(time.time() % 360, 3)
+        return {type: values}
+
+    ################ voice #############
+    def voice_api(self, method, path, query, body):
+        if path.startswith("voice/asr/offlinesyntax"):
+            if path.endswith("grammars"):
+                return ok({"grammars": []})
+            return ok({})
+        kind = path.split("/")[1]
+        state = self.voice.get(kind)
+        if state is None:
+            return None
+        if method == "GET":
+            res = ok(json.dumps(state["data"]) + "\x00")
+            res["status"] = state["status"]
+            res["timestamp"] = state["timestamp"]
+            return res
+        if method == "DELETE":
+            state["status"] = "idle"
+            return ok()
+        timestamp = body.get("timestamp", 0)
+        state.update({"status": "run", "timestamp": timestamp, "data": {}})
+        if kind == "asr":
+            result = {"intent": {"text": "你好", "answer": {"text": "你好，我是Yanshee"}}}
+        elif kind == "iat":
+            result = {"text": {"ws": [{"cw": [{"w": "你好"}]}]}}
+        else:
+            result = {"tts": body.get("tts", "")}
+        self._later(self.task_time, self._finish_voice, kind, timestamp, result)
+        return ok()
+
+    def _finish_voice(self, kind, timestamp, result):
+        with self._lock:
+            state = self.voice[kind]
+            if state["timestamp"] == timestamp:
+                state.update({"status": "idle", "data": result})
+                self._notify("voice/" + kind, {"status": "idle", "timestamp": timestamp, "data": result})
+
+    ################ visions #############
+    def visions_api(self, method, path, query, body):
+        if path == "visions":
+            if method == "GET":
+                key = (query.get("option", [""])[0], query.get("type", [""])[0])
+                task = self.visions.get(key, {"status": "idle", "timestamp": 0, "data": {}})
+                res = ok(task["data"])
+                res["status"] = task["status"]
+                res["timestamp"] = task["timestamp"]
+                return res
+            key = (body.get("option", ""), body.get("type", ""))
+            timestamp = body.get("timestamp", 0)
+            if body.get("operation") == "stop":
+                self.visions.pop(key, None)
+                return ok()
+            self.visions[key] = {"status": "run", "timestamp": timestamp, "data": {}}
+            self._later(self.task_time, self._finish_vision, key, timestamp)
+            return ok()
+        if path == "visions/photos":
+            if method == "GET":
+                name = query.get("body", [""])[0]
+                if name not in self.photos:
+                    #和机器人一样，照片不存在时返回json错误而不是图片
+                    return {"code": 10003, "data": {}, "msg": "photo not found: " + name}
+                return self.photos[name]
+            if method == "POST":
+                name = "img_%d.jpg" % int(time.time() * 1000)
+                self.photos[name] = b"\xff\xd8\xff\xd9"
+                return ok({"name": name})
+            self.photos.pop(body.get("name"), None)
+            return ok({})
+        if path == "visions/photos/list":
+            return ok([{"name": name} for name in self.photos])
+        if path == "visions/photosamples":
+            if method == "GET":
+                return ok([{"name": name} for name in self.samples])
+            if method == "POST":
+                return ok({})
+            self.samples.pop(body.get("name"), None)
+            return ok({})
+        if path == "visions/tags":
+            if method == "GET":
+                return ok([{"resources": resources, "tags": tag} for tag, resources in self.tags.items()])
+            if method == "PUT":
+                self.tags[body["tags"]] = body.get("resources", [])
+            else:
+                self.tags.pop(body.get("tags"), None)
+            return ok({})
+        if path in ("visions/streams", "visions/object/tracking", "visions/object/tracking/config"):
+            res = ok({})
+            res["status"] = "idle"
+            return res
+        if path in ("visions/aprilTag", "visions/QR"):
+            res = ok({"AprilTagStatus": []} if path.endswith("aprilTag") else {"contents": []})
+            res["status"] = "idle"
+            res["streamUrl"] = ""
+            return res
+        return None
+
+    def _finish_vision(self, key, timestamp):
+        with self._lock:
+            task = self.visions.get(key)
+            if task and task["timestamp"] == timestamp:
+                task["status"] = "idle"
+                task["data"] = {"recognition": {"name": "mock"}, "quantity": 1, "gesture": "ok",
+                                "color": [{"name": "red"}], "analysis": {"age": 20, "gender": "male"}}
+                self._notify("vision/" + key[1], dict(task))
+
+    ################ subscriptions #############
+    def subscriptions_api(self, method, path, query, body):
+        kind = path.split("/", 1)[1]
+        topic = {"motions": "motion", "motions/gait": "gait", "sensors": "sensor", "visions": "vision",
+                 "voice/asr": "voice/asr", "voice/iat": "voice/iat", "voice/tts": "voice/tts"}.get(kind)
+        if topic is None:
+            return None
+        if topic == "vision":
+            topic = "vision/" + body.get("type", "")
+        urls = self.subscriptions.setdefault(topic, {})
+        url = body.get("url")
+        if method == "POST":
+            #机器人接受1~60秒的订阅时长，默认10秒，重复订阅同一地址会延长到期时间
+            urls[url] = time.monotonic() + min(max(body.get("timeout", 10), 1), 60)
+            if topic == "sensor" and body.get("type") in sensor_values and self.push:
+                key = (url, body["type"])
+                if key not in self._sensorPushers:
+                    stop = self._sensorPushers[key] = threading.Event()
+                    threading.Thread(target=self._push_sensor, daemon=True,
+                                     args=(url, body["type"], max(body.get("timeval", 100), 10) / 1000.0, stop)).start()
+        else:
+            urls.pop(url, None)
+            for key in [key for key in self._sensorPushers if key[0] == url]:
+                self._sensorPushers.pop(key).set()
+        return ok({})
+
+    ################ dispatch #############
+    def handle(self, method, path, query, body):
+        """处理一个请求
+
+        Returns:
+            dict/bytes/None: json对象，图片内容，None表示接口不存在
+        """
+        group = path.split("/", 1)[0]
+        with self._lock:
+            if group == "devices":
+                return self.devices(method, path.split("/", 1)[1], query, body)
+            if group == "media":
+                return self.media(method, path.split("/", 1)[1], query, body)
+            if group == "motions":
+                return self.motions_api(method, path, query, body)
+            if group == "servos":
+                return self.servos_api(method, path, query, body)
+            if group == "sensors":
+                return self.sensors_api(method, path, query, body)
+            if group == "voice":
+                return self.voice_api(method, path, query, body)
+            if group in ("visions", "visions_visible"):
+                if group == "visions_visible":
+                    return ok({"url": ""})
+                return self.visions_api(method, path, query, body)
+            if group == "subscriptions":
+                return self.subscriptions_api(method, path, query, body)
+            if group == "gamepad":
+                return ok([] if path.endswith("get") else {})
+        return None
+
+
+def ok(data=None):
+    return {"code": 0, "data": data if data is not None else {}, "msg": "success"}
+
+
+def _post_json(url, data):
+    try:
+        request = urllib.request.Request(url, data=json.dumps(data).encode("utf-8"), method="POST",
+                                         headers={"Content-Type": "application/json"})
+        urllib.request.urlopen(request, timeout=2).read()
+    except Exception:
+        pass
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    #响应头和内容分两次写出，关闭Nagle算法避免等待延迟确认
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def _handle(self):
+        server = self.server.mock
+        length = int(self.headers.get("Content-Length") or 0)
+        raw = self.rfile.read(length) if length else b""
+        with server._statsLock:
+            server.requests += 1
+        url = urlparse(self.path)
+        delay = server.latency + random.uniform(-server.jitter, server.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if server.drop_rate and random.random() < server.drop_rate:
+            self.close_connection = True
+            return
+        if server.error_rate and random.random() < server.error_rate:
+            with server._statsLock:
+                server.errors += 1
+            self._reply(500, {"code": -1, "msg": "injected error"})
+            return
+        body = {}
+        if raw and "multipart" not in (self.headers.get("Content-Type") or "") and \
+                "multipart" not in (self.headers.get("Authorization") or ""):
+            try:
+                body = json.loads(raw.decode("utf-8"))
+            except ValueError:
+                self._reply(400, {"code": 10001, "msg": "bad json"})
+                return
+        path = url.path[len("/v1/"):] if url.path.startswith("/v1/") else url.path.strip("/")
+        result = server.robot.handle(self.command, path, parse_qs(url.query), body)
+        if result is None:
+            self._reply(404, {"code": 10002, "msg": "not found: " + url.path})
+        else:
+            self._reply(200, result)
+
+    def _reply(self, status, result):
+        extraHeaders = {}
+        if isinstance(result, bytes):
+            content, contentType = result, "image/jpeg"
+            #图片支持"Range: bytes=N-"续传
+            match = re.match(r"bytes=(\d+)-$", self.headers.get("Range") or "")
+            if status == 200 and match:
+                start = int(match.group(1))
+                if start >= len(content):
+                    status, content = 416, b""
+                    extraHeaders["Content-Range"] = "bytes */%d" % len(result)
+                else:
+                    status, content = 206, content[start:]
+                    extraHeaders["Content-Range"] = "bytes %d-%d/%d" % (start, len(result) - 1, len(result))
+        else:
+            content, contentType = json.dumps(result).encode("utf-8"), "application/json"
+        self.send_response(status)
+        self.send_header("Content-Type", contentType)
+        self.send_header("Content-Length", str(len(content)))
+        for key, value in extraHeaders.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(content)
+
+    do_GET = do_PUT = do_POST = do_DELETE = _handle
+
+
+class YanMockServer(object):
+    """模拟机器人服务
+
+    Args:
+        host(str): 监听地址，默认127.0.0.1
+        port(int): 监听端口，默认9090，0表示自动分配
+        latency(float): 每个请求的固定延迟，单位秒
+        jitter(float): 延迟的随机抖动范围，单位秒
+        error_rate(float): 返回HTTP 500的概率
+        drop_rate(float): 不返回响应直接断开连接的概率
+        task_time(float): 动作、音乐、TTS等任务从run变为idle的时间，单位秒
+
+    Examples:
+        >>> server = YanMockServer(latency=0.005, jitter=0.002).start()
+            YanAPI.yan_api_init("127.0.0.1")
+            YanAPI.sync_play_motion("wave")
+            server.stop()
+    """
+    def __init__(self, host: str = "127.0.0.1", port: int = 9090, latency: float = 0.0, jitter: float = 0.0,
+                 error_rate: float = 0.0, drop_rate: float = 0.0, task_time: float = 1.0):
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.drop_rate = drop_rate
+        self.robot = MockRobot(task_time)
+        self.requests = 0
+        self.errors = 0
+        self._statsLock = threading.Lock()
+        self._httpd = None
+        self._thread = None
+
+    @property
+    def ip(self):
+        return self.host
+
+    def start(self):
+        """在后台线程启动服务"""
+        self._httpd = ThreadingHTTPServer((self.host, self.port), _Handler)
+        self._httpd.daemon_threads = True
+        self._httpd.mock = self
+        self.port = self._httpd.server_address[1]
+        self._thread = threading.Thread(target=self._httpd.serve_forever, name="yan-mock-server", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """停止服务"""
+        if self._httpd is None:
+            return
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self.robot.cancel()
+        self._httpd = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="local mock Yanshee robot")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9090)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--drop-rate", type=float, default=0.0)
+    parser.add_argument("--task-time", type=float, default=1.0)
+    args = parser.parse_args()
+    server = YanMockServer(args.host, args.port, args.latency, args.jitter, args.error_rate, args.drop_rate, args.task_time)
+    server.start()
+    print("mock robot listening on http://%s:%d/v1/" % (server.host, server.port))
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.stop()
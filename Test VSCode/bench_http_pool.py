@@ -0,0 +1,42 @@
+#对比每次新建连接和使用连接池时单次接口调用的耗时
+#用法: python bench_http_pool.py [--robot 192.168.1.15] [--rounds 100]，不指定 --robot 时使用本地模拟机器人
+import argparse
+import time
+import requests
+import YanAPI
+from YanMockServer import YanMockServer
+
+
+def bench(call, rounds):
+    call()
+    begin = time.perf_counter()
+    for i in range(rounds):
+        call()
+    return (time.perf_counter() - begin) * 1000 / rounds
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--robot", default=None)
+    parser.add_argument("--rounds", type=int, default=100)
+    args = parser.parse_args()
+    server = None
+    if args.robot is None:
+        server = YanMockServer(port=0).start()
+        YanAPI.yan_api_init(server.host)
+        YanAPI.basic_url = "http://%s:%d/v1/" % (server.host, server.port)
+    else:
+        YanAPI.yan_api_init(args.robot)
+    try:
+        battery_url = YanAPI.basic_url + "devices/battery"
+        plain = bench(lambda: requests.get(url=battery_url, headers=YanAPI.headers), args.rounds)
+        pooled = bench(YanAPI.get_robot_battery_info, args.rounds)
+        print("without pool: %.2f ms/call" % plain)
+        print("with pool:    %.2f ms/call" % pooled)
+    finally:
+        if server is not None:
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()
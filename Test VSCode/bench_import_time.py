@@ -0,0 +1,27 @@
+#冷启动测试: 在新进程中import YanAPI，检查耗时和是否导入了重量级模块
+import os
+import subprocess
+import sys
+
+target_ms = 100
+rounds = 5
+heavy_modules = ["cv2", "requests", "numpy", "nest_asyncio", "multiprocessing", "aiohttp"]
+
+probe = ("import sys, time\n"
+         "t = time.perf_counter()\n"
+         "import YanAPI\n"
+         "print((time.perf_counter() - t) * 1000)\n"
+         "print(','.join(m for m in %r if m in sys.modules))\n" % heavy_modules)
+
+here = os.path.dirname(os.path.abspath(__file__))
+times = []
+loaded = ""
+for i in range(rounds):
+    output = subprocess.check_output([sys.executable, "-c", probe], cwd=here).decode().split("\n")
+    times.append(float(output[0]))
+    loaded = output[1]
+best = min(times)
+print("import YanAPI: best %.1f ms, worst %.1f ms (target %d ms)" % (best, max(times), target_ms))
+print("heavy modules loaded at import: %s" % (loaded or "none"))
+if best > target_ms or loaded:
+    sys.exit(1)
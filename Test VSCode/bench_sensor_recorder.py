@@ -0,0 +1,45 @@
+#传感器记录吞吐量测试: 环形缓冲区写入速度和实际持续采样率
+#用法: python bench_sensor_recorder.py [--robot 192.168.1.15] [--rate 50] [--seconds 10]，不指定 --robot 时使用本地模拟机器人
+import argparse
+import time
+import YanAPI
+from YanMockServer import YanMockServer
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--robot", default=None)
+    parser.add_argument("--rate", type=int, default=50)
+    parser.add_argument("--seconds", type=int, default=10)
+    args = parser.parse_args()
+
+    buffer = YanAPI.SensorRingBuffer(6000, YanAPI.sensor_record_fields["gyro"])
+    row = [0.0] * len(buffer.fields)
+    count = 200000
+    begin = time.perf_counter()
+    for i in range(count):
+        buffer.append(time.time(), row)
+    print("ring buffer append: %.0f samples/s" % (count / (time.perf_counter() - begin)))
+
+    server = None
+    if args.robot is None:
+        server = YanMockServer(port=0).start()
+        YanAPI.yan_api_init(server.host)
+        YanAPI.basic_url = "http://%s:%d/v1/" % (server.host, server.port)
+    else:
+        YanAPI.yan_api_init(args.robot)
+    try:
+        recorder = YanAPI.SensorRecorder("gyro", rate=args.rate)
+        recorder.start()
+        time.sleep(args.seconds)
+        recorder.stop()
+        print("recorded %d samples in %ds: %.1f samples/s (target %d), late %d, errors %d, dropped %d"
+              % (recorder.buffer.total, args.seconds, recorder.buffer.total / args.seconds, args.rate,
+                 recorder.late, recorder.errors, recorder.dropped))
+    finally:
+        if server is not None:
+            server.stop()
+
+
+if __name__ == '__main__':
+    main()
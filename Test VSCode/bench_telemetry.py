@@ -0,0 +1,84 @@
+#遥测存储的写入和查询耗时：逐行写入、批量写入、时间范围查询、按间隔聚合，以及对模拟机器人的后台采集
+#用法: python bench_telemetry.py [--rows 1000000] [--robots 4]
+import argparse
+import shutil
+import tempfile
+import time
+import numpy as np
+import YanAPI
+from YanMockServer import YanMockServer
+
+
+def bench(name, func, rounds):
+    func()
+    begin = time.perf_counter()
+    for i in range(rounds):
+        func()
+    elapsed = time.perf_counter() - begin
+    print("%-28s %10.2f us/op %12.0f op/s" % (name, elapsed * 1e6 / rounds, rounds / elapsed))
+
+
+def bench_store(path, rows):
+    store = YanAPI.TelemetryStore(path)
+    fields = store.fields
+    row = {field: 1.0 for field in fields}
+    clock = iter(range(10 ** 9))
+    bench("append (row)", lambda: store.append("row", next(clock), row), 20000)
+
+    timestamps = np.arange(rows, dtype=np.float64)
+    columns = {field: np.random.rand(rows).astype(np.float32) for field in fields}
+    begin = time.perf_counter()
+    for start in range(0, rows, 10000):
+        store.append_many("bulk", timestamps[start:start + 10000], {k: v[start:start + 10000] for k, v in columns.items()})
+    store.flush()
+    elapsed = time.perf_counter() - begin
+    print("%-28s %10.2f us/row %12.0f row/s" % ("append_many (10k rows)", elapsed * 1e6 / rows, rows / elapsed))
+
+    hour = min(3600, rows)
+    bench("query 1h window", lambda: store.query("bulk", rows / 2, rows / 2 + hour), 10000)
+    bench("query 1h window, 1 field", lambda: store.query("bulk", rows / 2, rows / 2 + hour, ["percent"]), 10000)
+    bench("downsample 1h -> 60 pts", lambda: store.downsample("bulk", 60, rows / 2, rows / 2 + hour, ["percent"]), 1000)
+    bench("downsample all -> 1000 pts", lambda: store.downsample("bulk", rows / 1000, fields=["percent"]), 10)
+    bench("downsample all, 9 fields", lambda: store.downsample("bulk", rows / 1000), 3)
+    store.close()
+
+    #重新打开时直接映射文件，不需要读取数据
+    begin = time.perf_counter()
+    store = YanAPI.TelemetryStore(path)
+    t, data = store.query("bulk")
+    print("%-28s %10.2f ms (%d rows)" % ("reopen + full query", (time.perf_counter() - begin) * 1000, len(t)))
+    store.close()
+
+
+def bench_collector(path, robots):
+    servers = [YanMockServer(host="127.0.0.%d" % (i + 2), port=9090).start() for i in range(robots)]
+    try:
+        store = YanAPI.TelemetryStore(path)
+        collector = YanAPI.TelemetryCollector(store, [server.host for server in servers], interval=0.05)
+        collector.start()
+        time.sleep(2)
+        collector.stop()
+        print("%-28s %10d samples %d errors" % ("collector %d robots, 2s" % robots, collector.samples, collector.errors))
+        t, data = store.query(servers[0].host, fields=["percent", "temperature"])
+        print("%-28s %10d rows, last %s" % ("stored " + servers[0].host, len(t), {k: float(v[-1]) for k, v in data.items()}))
+        store.close()
+    finally:
+        for server in servers:
+            server.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1000000)
+    parser.add_argument("--robots", type=int, default=4)
+    args = parser.parse_args()
+    path = tempfile.mkdtemp(prefix="telemetry-")
+    try:
+        bench_store(path, args.rows)
+        bench_collector(path, args.robots)
+    finally:
+        shutil.rmtree(path)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+#对比uKit广播消息的发送耗时：每次发送前运行ifconfig查找广播地址、使用缓存的广播地址、使用UkitChannel
+#消息发到本机127.0.0.1，不需要uKit2.0和lib_ukit
+import asyncio
+import re
+import shutil
+import subprocess
+import time
+from socket import socket, AF_INET, SOCK_DGRAM, SOL_SOCKET, SO_BROADCAST
+import YanAPI
+
+port = 25880
+target = ("127.0.0.1", port)
+payload = bytes.fromhex("fb bf 0a 00 01 00 00 00 0b ed".replace(" ", ""))
+
+
+def ifconfig_broadcast_ips():
+    #原来的实现：每次发送都运行一次ifconfig
+    ipstr = r'([0-9]{1,3}\.){3}[0-9]{1,3}'
+    output = subprocess.Popen("ifconfig", stdout=subprocess.PIPE).stdout.read()
+    pattern = re.compile(ipstr)
+    return [pattern.search(m.group()).group() for m in re.finditer('(broadcast %s)' % ipstr, str(output))]
+
+
+def bench(name, send, rounds):
+    send()
+    begin = time.perf_counter()
+    for i in range(rounds):
+        send()
+    elapsed = time.perf_counter() - begin
+    print("%-24s %10.2f us/msg %10.0f msg/s" % (name, elapsed * 1e6 / rounds, rounds / elapsed))
+
+
+def main():
+    s = socket(AF_INET, SOCK_DGRAM)
+    s.setsockopt(SOL_SOCKET, SO_BROADCAST, 1)
+    if shutil.which("ifconfig"):
+        bench("ifconfig per send", lambda: (ifconfig_broadcast_ips(), s.sendto(payload, target)), 200)
+    else:
+        print("ifconfig not installed, skip")
+    bench("uncached scan", lambda: (YanAPI._find_broadcast_ips(refresh=True), s.sendto(payload, target)), 2000)
+    bench("cached lookup", lambda: (YanAPI._find_broadcast_ips(), s.sendto(payload, target)), 100000)
+    s.close()
+
+    async def channel():
+        async with YanAPI.UkitChannel(broadcast_ip="127.0.0.1", decode=False) as ch:
+            bench("UkitChannel.send", lambda: ch.send(payload), 100000)
+    asyncio.run(channel())
+    print("broadcast addresses: %s" % YanAPI._find_broadcast_ips())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,320 @@
+#对本地模拟机器人(YanMockServer)逐个调用YanAPI的公开接口，统计每个接口的耗时分布、吞吐量和JSON解码的内存分配
+#
+#    python bench_yanapi.py --rounds 200 --json base.json
+#    python bench_yanapi.py --rounds 200 --compare base.json
+#
+#baseline是用http.client直接请求同一个接口的耗时，接口耗时减去baseline就是YanAPI自身的开销
+import argparse
+import http.client
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import YanAPI
+from YanMockServer import YanMockServer
+
+tmpdir = tempfile.mkdtemp()
+sample_file = os.path.join(tmpdir, "sample.hts")
+with open(sample_file, "wb") as f:
+    f.write(b"\0" * 1024)
+
+#(接口名, 参数)，视频流和显示窗口相关的接口需要摄像头，不在这里测试
+calls = [
+    ("get_robot_battery_info", ()),
+    ("get_robot_battery_value", ()),
+    ("get_robot_version_info_value", ("core",)),
+    ("get_robot_fall_management_state", ()),
+    ("set_robot_fall_management_state", (True,)),
+    ("get_robot_language", ()),
+    ("set_robot_language", ("zh",)),
+    ("get_robot_led", ()),
+    ("get_button_led_color_value", ()),
+    ("get_button_led_mode_value", ()),
+    ("get_eye_led_color_value", ()),
+    ("get_eye_led_mode_value", ()),
+    ("set_robot_led", ("button", "white", "on")),
+    ("get_robot_version_info", ("core",)),
+    ("get_robot_mode", ()),
+    ("get_robot_volume", ()),
+    ("set_robot_volume", (50,)),
+    ("get_robot_volume_value", ()),
+    ("set_robot_volume_value", (50,)),
+    ("get_media_music_state", ()),
+    ("get_media_music_list", ()),
+    ("upload_media_music", (sample_file,)),
+    ("start_play_music", ("SorrySorry.mp3",)),
+    ("stop_play_music", ()),
+    ("delete_media_music", ("sample.hts",)),
+    ("get_current_motion_play_state", ()),
+    ("get_current_layer_motion_play_state", ()),
+    ("start_play_motion", ("wave",)),
+    ("pause_play_motion", ()),
+    ("resume_play_motion", ()),
+    ("stop_play_motion", ()),
+    ("get_motion_list", ()),
+    ("get_motion_list_value", ()),
+    ("upload_motion", (sample_file,)),
+    ("delete_motion", ("sample",)),
+    ("control_motion_gait", (1, 0, 2)),
+    ("get_motion_gait_state", ()),
+    ("exit_motion_gait", ()),
+    ("start_aprilTag_recognition", ([{"id": 0, "size": 0.05}],)),
+    ("get_aprilTag_recognition_status", ()),
+    ("stop_aprilTag_recognition", ()),
+    ("start_QR_code_recognition", ()),
+    ("get_QR_code_recognition_status", ()),
+    ("stop_QR_code_recognition", ()),
+    ("config_object_tracking", (10, 10)),
+    ("start_object_tracking", ("ball", 10, 10)),
+    ("get_object_tracking_status", ()),
+    ("stop_object_tracking", ()),
+    ("get_servo_angle_value", ("NeckLR",)),
+    ("get_servos_angles", (YanAPI.servo_names if hasattr(YanAPI, "servo_names") else ["NeckLR", "RightHipLR"],)),
+    ("set_servos_angles", ({"NeckLR": 90},)),
+    ("set_servos_angles_layers", ({"NeckLR": {"angle": 90, "runtime": 200}},)),
+    ("get_servos_mode", (["NeckLR"],)),
+    ("set_servos_mode", ("work", ["NeckLR"])),
+    ("sensor_calibration", (1,)),
+    ("get_sensors_list", ()),
+    ("get_sensors_list_value", ()),
+    ("get_sensors_environment", ()),
+    ("get_sensors_environment_value", ()),
+    ("get_sensors_gyro", ()),
+    ("get_sensors_infrared", ()),
+    ("get_sensors_infrared_value", ()),
+    ("get_sensors_pressure", ()),
+    ("get_sensors_pressure_value", ()),
+    ("get_sensors_touch", ()),
+    ("get_sensors_touch_value", ()),
+    ("get_sensors_ultrasonic", ()),
+    ("get_sensors_ultrasonic_value", ()),
+    ("start_voice_asr", ()),
+    ("get_voice_asr_state", ()),
+    ("stop_voice_asr", ()),
+    ("create_voice_asr_offline_syntax", ({"grammar": "mock"},)),
+    ("update_voice_asr_offline_syntax", ({"grammar": "mock"},)),
+    ("get_voice_asr_offline_syntax", ("mock",)),
+    ("get_voice_asr_offline_syntax_grammars", ()),
+    ("delete_voice_asr_offline_syntax", ("mock",)),
+    ("start_voice_iat", ()),
+    ("get_voice_iat", ()),
+    ("stop_voice_iat", ()),
+    ("start_voice_tts", ("hi",)),
+    ("get_voice_tts_state", ()),
+    ("stop_voice_tts", ()),
+    ("get_visual_task_result", ("recognition", "face")),
+    ("start_face_recognition", ("recognition",)),
+    ("stop_face_recognition", ("recognition",)),
+    ("start_gesture_recognition", ()),
+    ("stop_gesture_recognition", ()),
+    ("start_color_recognition", ()),
+    ("stop_color_recognition", ()),
+    ("start_object_recognition", ()),
+    ("stop_object_recognition", ()),
+    ("do_face_entry", ("mock",)),
+    ("take_vision_photo", ()),
+    ("get_vision_photo_list", ()),
+    ("get_vision_photo", ("mock.jpg", tmpdir)),
+    ("delete_vision_photo", ("mock.jpg",)),
+    ("get_vision_photo_samples", ()),
+    ("upload_vision_photo_sample", (sample_file,)),
+    ("delete_vision_photo_sample", ("sample.hts",)),
+    ("open_vision_stream", ()),
+    ("close_vision_stream", ()),
+    ("get_vision_tags", ()),
+    ("set_vision_tag", (["a.jpg"], "mock")),
+    ("delete_vision_tag", ("mock",)),
+    ("start_subscribe_motion", ("http://127.0.0.1:1/",)),
+    ("stop_subscribe_motion", ("http://127.0.0.1:1/",)),
+    ("start_subscribe_motion_gait", ("http://127.0.0.1:1/",)),
+    ("stop_subscribe_motion_gait", ("http://127.0.0.1:1/",)),
+    ("start_subscribe_sensor", ("http://127.0.0.1:1/", "gyro")),
+    ("stop_subscribe_sensor", ("http://127.0.0.1:1/", "gyro")),
+    ("start_subscribe_vision", ("http://127.0.0.1:1/", "face")),
+    ("stop_subscribe_vision", ("http://127.0.0.1:1/", "face")),
+    ("start_subscribe_voice_asr", ("http://127.0.0.1:1/",)),
+    ("stop_subscribe_voice_asr", ("http://127.0.0.1:1/",)),
+    ("start_subscribe_voice_iat", ("http://127.0.0.1:1/",)),
+    ("stop_subscribe_voice_iat", ("http://127.0.0.1:1/",)),
+    ("start_subscribe_voice_tts", ("http://127.0.0.1:1/",)),
+    ("stop_subscribe_voice_tts", ("http://127.0.0.1:1/",)),
+    ("get_gamepad_keymap", ()),
+    ("set_gamepad_keymap", (YanAPI.GamepadKey.L1, "wave")),
+    ("set_gamepad_keymaps", ([YanAPI.GamepadKeymap(YanAPI.GamepadKey.L1, "wave")],)),
+    ("reset_gamepad_keymap", (YanAPI.GamepadKey.L1,)),
+    ("reset_gamepad_keymaps", (None, True)),
+]
+
+#sync_*接口的耗时主要是模拟任务的时长(task_time)，单独用较少的次数测试
+sync_calls = [
+    ("sync_set_led", ("button", "white", "on")),
+    ("sync_set_servo_rotate", ({"NeckLR": 90},)),
+    ("sync_play_music", ("SorrySorry.mp3",)),
+    ("sync_play_motion", ("wave",)),
+    ("sync_do_motion_gait", (1, 0, 2)),
+    ("sync_do_tts", ("hi",)),
+    ("sync_do_voice_asr", ()),
+    ("sync_do_voice_asr_value", ()),
+    ("sync_do_voice_iat", ()),
+    ("sync_do_voice_iat_value", ()),
+    ("sync_do_face_recognition", ("recognition",)),
+    ("sync_do_face_recognition_value", ("recognition",)),
+    ("sync_do_gesture_recognition", ()),
+    ("sync_do_color_recognition", ()),
+    ("sync_do_object_recognition", ()),
+    ("sync_do_QR_code_recognition", ()),
+]
+
+#JSON解码路径使用的响应体
+decode_paths = ["devices/battery", "servos/angles", "sensors/gyro", "sensors/list", "motions/list"]
+
+
+def percentile(values, p):
+    values = sorted(values)
+    k = (len(values) - 1) * p / 100.0
+    f = int(k)
+    c = min(f + 1, len(values) - 1)
+    return values[f] + (values[c] - values[f]) * (k - f)
+
+
+def summary(samples, wall):
+    return {"p50": percentile(samples, 50) * 1000, "p95": percentile(samples, 95) * 1000,
+            "p99": percentile(samples, 99) * 1000, "rps": len(samples) / wall}
+
+
+def bench_call(func, args, rounds):
+    func(*args)
+    samples = []
+    begin = time.perf_counter()
+    for i in range(rounds):
+        t = time.perf_counter()
+        func(*args)
+        samples.append(time.perf_counter() - t)
+    return summary(samples, time.perf_counter() - begin)
+
+
+def bench_baseline(host, port, rounds):
+    conn = http.client.HTTPConnection(host, port)
+    samples = []
+    begin = time.perf_counter()
+    for i in range(rounds + 1):
+        t = time.perf_counter()
+        conn.request("GET", "/v1/devices/battery")
+        conn.getresponse().read()
+        if i:
+            samples.append(time.perf_counter() - t)
+    conn.close()
+    return summary(samples, time.perf_counter() - begin)
+
+
+#对比的解码方式: 旧的先解码成字符串再解析，_parse_json直接解析bytes，lazy只读取code
+decoders = [
+    ("str", lambda content: json.loads(str(content.decode("utf-8")))),
+    ("bytes", YanAPI._parse_json),
+    ("lazy", lambda content: YanAPI.RobotResponse(content).code),
+]
+
+
+def bench_decode(host, port, rounds):
+    """对常见响应体测量各种解码方式的耗时和内存分配"""
+    conn = http.client.HTTPConnection(host, port)
+    results = {}
+    for path in decode_paths:
+        conn.request("GET", "/v1/" + path)
+        content = conn.getresponse().read()
+        for name, decode in decoders:
+            begin = time.perf_counter()
+            for i in range(rounds):
+                decode(content)
+            elapsed = time.perf_counter() - begin
+            tracemalloc.start()
+            base = tracemalloc.take_snapshot()
+            tracemalloc.reset_peak()
+            kept = [decode(content) for i in range(100)]
+            peak = tracemalloc.get_traced_memory()[1]
+            stats = tracemalloc.take_snapshot().compare_to(base, "filename")
+            tracemalloc.stop()
+            blocks = sum(stat.count_diff for stat in stats if stat.count_diff > 0) - 1
+            results[path + " " + name] = {"bytes": len(content), "us": elapsed * 1e6 / rounds,
+                                          "blocks": blocks / len(kept), "peak": peak / len(kept)}
+    conn.close()
+    return results
+
+
+def metadata():
+    try:
+        rev = subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        rev = ""
+    return {"git": rev, "python": platform.python_version(), "platform": platform.platform(), "time": time.time()}
+
+
+def compare(results, base):
+    print("\n%-42s %10s %10s %8s" % ("compare p50 (ms)", "base", "now", "delta"))
+    for name, now in results["calls"].items():
+        old = base["calls"].get(name)
+        if old:
+            print("%-42s %10.3f %10.3f %+7.1f%%" % (name, old["p50"], now["p50"], (now["p50"] / old["p50"] - 1) * 100))
+    for path, now in results["decode"].items():
+        old = base["decode"].get(path)
+        if old:
+            print("%-42s %10.2f %10.2f %+7.1f%%" % ("decode " + path + " (us)", old["us"], now["us"], (now["us"] / old["us"] - 1) * 100))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=200)
+    parser.add_argument("--sync-rounds", type=int, default=10)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--json", help="save results to this file")
+    parser.add_argument("--compare", help="compare with results saved by --json")
+    parser.add_argument("--only", help="comma separated list of wrapper names")
+    args = parser.parse_args()
+
+    server = YanMockServer(port=9090, latency=args.latency, jitter=args.jitter, task_time=0.05).start()
+    YanAPI.yan_api_init(server.host)
+    selected = set(args.only.split(",")) if args.only else None
+
+    baseline = bench_baseline(server.host, server.port, args.rounds)
+    print("%-42s %8s %8s %8s %8s %8s" % ("wrapper", "p50 ms", "p95 ms", "p99 ms", "rps", "over ms"))
+    print("%-42s %8.3f %8.3f %8.3f %8.0f" % ("(http.client baseline)", baseline["p50"], baseline["p95"], baseline["p99"], baseline["rps"]))
+    results = {"meta": metadata(), "baseline": baseline, "calls": {}, "decode": {}}
+    for name, callArgs, rounds in [c + (args.rounds,) for c in calls] + [c + (args.sync_rounds,) for c in sync_calls]:
+        if selected and name not in selected:
+            continue
+        try:
+            r = bench_call(getattr(YanAPI, name), callArgs, rounds)
+        except Exception as e:
+            print("%-42s failed: %r" % (name, e))
+            continue
+        r["overhead"] = r["p50"] - baseline["p50"]
+        results["calls"][name] = r
+        print("%-42s %8.3f %8.3f %8.3f %8.0f %8.3f" % (name, r["p50"], r["p95"], r["p99"], r["rps"], r["overhead"]))
+
+    results["decode"] = bench_decode(server.host, server.port, args.rounds * 10)
+    print("\n%-42s %8s %10s %10s %10s" % ("decode path", "bytes", "us/decode", "blocks", "peak B"))
+    for path, r in results["decode"].items():
+        print("%-42s %8d %10.2f %10.1f %10.0f" % (path, r["bytes"], r["us"], r["blocks"], r["peak"]))
+
+    covered = set(name for name, callArgs in calls + sync_calls)
+    skipped = sorted(name for name in dir(YanAPI) if callable(getattr(YanAPI, name)) and not name.startswith("_")
+                     and getattr(getattr(YanAPI, name), "__module__", "") == "YanAPI" and name not in covered
+                     and not isinstance(getattr(YanAPI, name), type))
+    print("\nnot measured: " + ", ".join(skipped))
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(results, json.load(f))
+    server.stop()
+
+
+if __name__ == '__main__':
+    sys.exit(main())
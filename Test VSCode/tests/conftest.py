@@ -0,0 +1,26 @@
+#测试使用本地模拟机器人，不需要真实的Yanshee
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import YanAPI
+from YanMockServer import YanMockServer
+
+
+@pytest.fixture
+def mock_robot(monkeypatch):
+    """启动一个自动分配端口的模拟机器人，并让YanAPI的全局接口指向它"""
+    server = YanMockServer(port=0, task_time=0.2).start()
+    YanAPI.yan_api_init(server.host)
+    monkeypatch.setattr(YanAPI, "basic_url", "http://%s:%d/v1/" % (server.host, server.port))
+    YanAPI.invalidate_cache()
+    YanAPI.reset_circuit()
+    try:
+        yield server
+    finally:
+        YanAPI._close_completion_subscriptions()
+        server.stop()
+        YanAPI.invalidate_cache()
+        YanAPI.reset_circuit()
@@ -0,0 +1,61 @@
+import os
+import time
+import pytest
+import YanAPI
+from YanMockServer import YanMockServer
+
+
+def _open_fds():
+    return len(os.listdir("/proc/self/fd"))
+
+
+def test_batch_runs_calls_concurrently(mock_robot):
+    mock_robot.latency = 0.1
+    begin = time.monotonic()
+    with YanAPI.batch() as b:
+        battery = b.get_robot_battery_info()
+        b.set_robot_volume(60)
+        b.get_robot_volume_value(after=battery)
+    assert time.monotonic() - begin < 0.35
+    assert b.results[0]["data"]["percent"] == 90
+    assert b.results[1]["code"] == 0
+    assert b.results[2] == 60
+
+
+def test_batch_failed_dependency(mock_robot):
+    def fail():
+        raise ValueError("boom")
+    with YanAPI.batch() as b:
+        first = b.call(fail)
+        b.get_robot_battery_info(after=first)
+    assert isinstance(b.results[0], ValueError)
+    assert isinstance(b.results[1], RuntimeError)
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="needs /proc")
+def test_batch_closes_worker_event_loops(mock_robot):
+    with YanAPI.batch() as b:
+        b.get_robot_battery_info()
+    before = _open_fds()
+    for i in range(20):
+        with YanAPI.batch() as b:
+            b.get_robot_battery_info()
+            b.get_robot_volume_value()
+    assert _open_fds() <= before + 2
+
+
+def test_fleet_returns_results_and_exceptions():
+    servers = [YanMockServer(host="127.0.0.%d" % (i + 2), port=9090, task_time=0.2).start() for i in range(2)]
+    fleet = YanAPI.YanFleet([server.host for server in servers] + ["127.0.0.9"])
+    try:
+        YanAPI.reset_circuit()
+        with YanAPI.deadline(2):
+            results = fleet.get_robot_battery_value()
+        assert results["127.0.0.2"] == 90 and results["127.0.0.3"] == 90
+        assert isinstance(results["127.0.0.9"], Exception)
+        assert all(fleet.sync_play_motion(name="wave")[server.host] is True for server in servers)
+    finally:
+        YanAPI._close_completion_subscriptions()
+        fleet.close()
+        for server in servers:
+            server.stop()
@@ -0,0 +1,84 @@
+import threading
+import time
+import types
+import YanAPI
+
+
+class BlockingCapture(object):
+    """grab()一直阻塞到release()的视频流"""
+    def __init__(self, url, block=True):
+        self._released = threading.Event()
+        self._block = block
+
+    def isOpened(self):
+        return True
+
+    def grab(self):
+        if self._block:
+            self._released.wait()
+        return not self._released.is_set()
+
+    def retrieve(self, buf=None):
+        return True, bytearray(4)
+
+    def release(self):
+        self._released.set()
+
+
+def test_stop_releases_capture_on_grabber_thread(monkeypatch):
+    captures = []
+
+    class SlowCapture(BlockingCapture):
+        """每帧读取0.05秒，记录release的调用线程以及是否和grab重叠"""
+        def __init__(self, url):
+            super().__init__(url, block=False)
+            self.grabbing = False
+            self.releasedWhileGrabbing = False
+            self.releaseThread = None
+            captures.append(self)
+
+        def grab(self):
+            self.grabbing = True
+            time.sleep(0.05)
+            self.grabbing = False
+            return True
+
+        def release(self):
+            self.releasedWhileGrabbing = self.grabbing
+            self.releaseThread = threading.current_thread()
+    monkeypatch.setattr(YanAPI, "cv2", types.SimpleNamespace(VideoCapture=SlowCapture))
+    grabber = YanAPI.FrameGrabber("http://127.0.0.1:8000")
+    grabber.start()
+    thread = grabber._thread
+    time.sleep(0.12)
+    begin = time.monotonic()
+    grabber.stop()
+    assert time.monotonic() - begin < 0.5
+    assert not grabber.running
+    assert captures[0].releaseThread is thread
+    assert not captures[0].releasedWhileGrabbing
+
+
+def test_stop_is_bounded_when_thread_hangs(monkeypatch):
+    class StuckCapture(BlockingCapture):
+        def grab(self):
+            time.sleep(1)
+            return False
+    monkeypatch.setattr(YanAPI, "cv2", types.SimpleNamespace(VideoCapture=StuckCapture))
+    grabber = YanAPI.FrameGrabber("http://127.0.0.1:8000")
+    grabber.start()
+    time.sleep(0.05)
+    begin = time.monotonic()
+    grabber.stop(timeout=0.2)
+    assert time.monotonic() - begin < 0.5
+
+
+def test_read_returns_latest_frame(monkeypatch):
+    monkeypatch.setattr(YanAPI, "cv2", types.SimpleNamespace(VideoCapture=lambda url: BlockingCapture(url, block=False)))
+    grabber = YanAPI.FrameGrabber("http://127.0.0.1:8000")
+    grabber.start()
+    try:
+        frame, timestamp, index = grabber.read(timeout=1)
+        assert frame is not None and index >= 0
+    finally:
+        grabber.stop()
@@ -0,0 +1,99 @@
+import asyncio
+import time
+import pytest
+import requests
+import urllib3
+import YanAPI
+
+
+def test_calls_reuse_one_pooled_connection(mock_robot, monkeypatch):
+    connects = []
+    connect = urllib3.connection.HTTPConnection.connect
+
+    def counting_connect(self):
+        connects.append(self)
+        return connect(self)
+    monkeypatch.setattr(urllib3.connection.HTTPConnection, "connect", counting_connect)
+    session = YanAPI._get_session()
+    requests_before = mock_robot.requests
+    for i in range(20):
+        assert YanAPI.get_robot_battery_value() == 90
+    assert YanAPI._get_session() is session
+    assert mock_robot.requests - requests_before == 20
+    assert len(connects) <= 1
+
+
+def test_yan_robot_has_its_own_pool(mock_robot):
+    robot = YanAPI.YanRobot(mock_robot.host, pool_size=2)
+    robot.basic_url = YanAPI.basic_url
+    try:
+        assert robot.get_robot_battery_value() == 90
+        assert robot.session is not YanAPI._get_session()
+    finally:
+        robot.close()
+
+
+def test_read_timeout(mock_robot, monkeypatch):
+    monkeypatch.setattr(YanAPI, "http_timeout", (1, 0.2))
+    mock_robot.latency = 1
+    begin = time.monotonic()
+    with pytest.raises(requests.exceptions.RequestException):
+        YanAPI.get_robot_battery_info()
+    assert time.monotonic() - begin < 0.6
+
+
+def test_deadline_caps_request_timeout(mock_robot):
+    mock_robot.latency = 1
+    begin = time.monotonic()
+    with pytest.raises((requests.exceptions.RequestException, YanAPI.DeadlineExceeded)):
+        with YanAPI.deadline(0.2):
+            YanAPI.get_robot_battery_info()
+    assert time.monotonic() - begin < 0.6
+    with pytest.raises(YanAPI.DeadlineExceeded):
+        with YanAPI.deadline(0):
+            YanAPI.get_robot_battery_info()
+
+
+def test_circuit_breaker_opens_and_recovers(mock_robot, monkeypatch):
+    monkeypatch.setattr(YanAPI, "http_timeout", (1, 0.1))
+    monkeypatch.setattr(YanAPI, "breaker_failure_threshold", 3)
+    monkeypatch.setattr(YanAPI, "breaker_reset_timeout", 0.3)
+    mock_robot.latency = 0.5
+    for i in range(3):
+        with pytest.raises(requests.exceptions.RequestException):
+            YanAPI.get_robot_battery_info()
+    assert YanAPI.get_circuit_state() == {"state": "open", "failures": 3}
+    requests_before = mock_robot.requests
+    begin = time.monotonic()
+    with pytest.raises(YanAPI.CircuitOpenError):
+        YanAPI.get_robot_battery_info()
+    assert time.monotonic() - begin < 0.05
+    assert mock_robot.requests == requests_before
+
+    mock_robot.latency = 0
+    time.sleep(0.35)
+    assert YanAPI.get_circuit_state()["state"] == "half-open"
+    assert YanAPI.get_robot_battery_value() == 90
+    assert YanAPI.get_circuit_state() == {"state": "closed", "failures": 0}
+
+
+def test_reset_circuit(mock_robot, monkeypatch):
+    monkeypatch.setattr(YanAPI, "breaker_failure_threshold", 1)
+    breaker = YanAPI._get_breaker(mock_robot.host)
+    breaker.record(False)
+    assert YanAPI.get_circuit_state()["state"] == "open"
+    YanAPI.reset_circuit(mock_robot.host)
+    assert YanAPI.get_robot_battery_value() == 90
+
+
+def test_async_client_shares_breaker(mock_robot, monkeypatch):
+    monkeypatch.setattr(YanAPI, "breaker_failure_threshold", 1)
+
+    async def main():
+        async with YanAPI.AsyncYanClient(mock_robot.host) as client:
+            client.basic_url = YanAPI.basic_url
+            assert await client.get_robot_battery_value() == 90
+            YanAPI._get_breaker(mock_robot.host).record(False)
+            with pytest.raises(YanAPI.CircuitOpenError):
+                await client.get_robot_battery_info()
+    asyncio.run(main())
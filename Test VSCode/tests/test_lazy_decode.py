@@ -0,0 +1,75 @@
+import asyncio
+import time
+import pytest
+import YanAPI
+
+
+@pytest.fixture(params=[False, True], ids=["plain", "lazy"])
+def lazy_robot(request, mock_robot, monkeypatch):
+    monkeypatch.setattr(YanAPI, "http_lazy_decode", request.param)
+    return mock_robot
+
+
+def test_sensor_getter_returns_mapping(lazy_robot):
+    res = YanAPI.get_sensors_gyro()
+    assert isinstance(res, YanAPI.RobotResponse) == YanAPI.http_lazy_decode
+    assert res["code"] == 0
+    assert res["data"]["gyro"][0]["accel-z"] == 9.8
+
+
+def test_robot_response_fast_path():
+    res = YanAPI.RobotResponse(b'{"code": 0, "data": {"x": 1}, "msg": "success"}')
+    assert res.code == 0 and res.ok
+    assert dict(res) == {"code": 0, "data": {"x": 1}, "msg": "success"}
+    assert YanAPI.RobotResponse(b"not json").code == -1
+
+
+def test_sensor_recorder_counts_samples(lazy_robot):
+    recorder = YanAPI.SensorRecorder("environment", rate=50, capacity=100)
+    recorder.start()
+    time.sleep(0.3)
+    recorder.stop()
+    assert recorder.errors == 0
+    assert len(recorder.buffer) > 0
+    timestamps, values = recorder.buffer.latest(1)
+    assert values[0].tolist() == [25, 40, 101325]
+
+
+def test_cached_sensor_list_is_decoded(lazy_robot):
+    res = YanAPI.get_sensors_list()
+    assert type(res) is dict
+    assert YanAPI.get_sensors_list() == res
+
+
+invalid = {"code": -1, "data": {}, "msg": "invalid response: <html>"}
+
+
+@pytest.mark.parametrize("call, state", [
+    (lambda: YanAPI.sync_play_motion(name="wave"), "get_current_motion_play_state"),
+    (lambda: YanAPI.sync_play_motion(name="reset", version="v2"), "get_current_layer_motion_play_state"),
+    (lambda: YanAPI.sync_do_motion_gait(speed_v=1, steps=2), "get_motion_gait_state"),
+    (lambda: YanAPI.sync_play_music("SorrySorry.mp3"), "get_media_music_state"),
+])
+def test_sync_waits_stop_on_invalid_state(mock_robot, monkeypatch, call, state):
+    monkeypatch.setattr(YanAPI, state, lambda *args: dict(invalid))
+    assert call() is False
+
+
+def test_sync_tts_returns_invalid_state(mock_robot, monkeypatch):
+    monkeypatch.setattr(YanAPI, "get_voice_tts_state", lambda *args: dict(invalid))
+    assert YanAPI.sync_do_tts("hello")["code"] == -1
+
+
+def test_async_wait_stops_on_invalid_state(mock_robot):
+    async def main():
+        async with YanAPI.AsyncYanClient(mock_robot.host) as client:
+            client.basic_url = YanAPI.basic_url
+
+            async def state():
+                return dict(invalid)
+            client.get_current_motion_play_state = state
+            client.get_voice_tts_state = lambda t: state()
+            return await client.sync_play_motion("wave"), await client.sync_do_tts("hello")
+    motion, tts = asyncio.run(main())
+    assert motion is False
+    assert tts["code"] == -1
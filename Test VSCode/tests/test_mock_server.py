@@ -0,0 +1,66 @@
+import threading
+import time
+import requests
+import YanAPI
+from YanMockServer import YanMockServer
+
+
+def test_request_counter_is_thread_safe(mock_robot):
+    url = "http://127.0.0.1:%d/v1/devices/battery" % mock_robot.port
+
+    def worker():
+        with requests.Session() as s:
+            for i in range(50):
+                s.get(url)
+    threads = [threading.Thread(target=worker) for i in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert mock_robot.requests == 400
+
+
+def test_subscription_expires(mock_robot):
+    robot = mock_robot.robot
+    assert YanAPI.start_subscribe_motion("http://127.0.0.1:1/motion", timeout=1)["code"] == 0
+    assert robot.active_subscriptions("motion") == ["http://127.0.0.1:1/motion"]
+    time.sleep(1.1)
+    assert robot.active_subscriptions("motion") == []
+
+
+def test_expired_completion_subscription_is_renewed(mock_robot, monkeypatch):
+    #订阅1秒后到期，没有续订时第二次等待只能靠轮询
+    monkeypatch.setattr(YanAPI, "completion_subscription_timeout", 1)
+    YanAPI._completion_subscriptions.clear()
+    assert YanAPI.sync_play_motion(name="wave")
+    time.sleep(1.1)
+    assert mock_robot.robot.active_subscriptions("motion") == []
+    assert YanAPI.sync_play_motion(name="wave")
+    assert mock_robot.robot.active_subscriptions("motion")
+
+
+def test_sensor_push_recorder(mock_robot):
+    recorder = YanAPI.SensorRecorder("ultrasonic", source="push")
+    recorder.start()
+    time.sleep(0.5)
+    recorder.stop()
+    assert recorder.buffer.total >= 2
+    assert recorder.buffer.latest(1)[1][0].tolist() == [500]
+    time.sleep(0.2)
+    assert mock_robot.robot.active_subscriptions("sensor") == []
+
+
+def test_sensor_push_recorder_renews_subscription(mock_robot, monkeypatch):
+    monkeypatch.setattr(YanAPI.SensorRecorder, "subscription_timeout", 1)
+    recorder = YanAPI.SensorRecorder("ultrasonic", source="push")
+    recorder.start()
+    time.sleep(2.5)
+    total = recorder.buffer.total
+    time.sleep(0.5)
+    assert recorder.buffer.total >= total + 2
+    assert recorder.error is None
+    mock_robot.error_rate = 1.0
+    time.sleep(0.5)
+    recorder.stop()
+    assert recorder.error is not None
+    assert recorder.errors >= 1
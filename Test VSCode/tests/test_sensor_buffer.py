@@ -0,0 +1,29 @@
+import time
+import YanAPI
+
+
+def test_ring_buffer_counts_unread_overwrites():
+    buffer = YanAPI.SensorRingBuffer(4, ["value"])
+    for i in range(4):
+        buffer.append(i, [i])
+    assert buffer.dropped == 0
+    buffer.append(4, [4])
+    buffer.append(5, [5])
+    assert buffer.dropped == 2
+    timestamps, values, index, lost = buffer.since(0)
+    assert lost == 2 and values[:, 0].tolist() == [2, 3, 4, 5]
+    #已经读取过的采样被覆盖不算丢失
+    for i in range(6, 10):
+        buffer.append(i, [i])
+    assert buffer.dropped == 2
+    buffer.append(10, [10])
+    assert buffer.dropped == 3
+
+
+def test_recorder_exposes_dropped(mock_robot):
+    recorder = YanAPI.SensorRecorder("gyro", rate=200, capacity=5)
+    recorder.start()
+    time.sleep(0.3)
+    recorder.stop()
+    assert recorder.buffer.total > 5
+    assert recorder.dropped == recorder.buffer.total - 5
@@ -0,0 +1,26 @@
+import YanAPI
+
+
+def test_aliases_of_one_joint_are_coalesced(mock_robot):
+    servos = YanAPI.ServoController(write_window=10)
+    sent = []
+    setAngles = YanAPI.set_servos_angles
+
+    def record(angles, runtime=200):
+        sent.append(dict(angles))
+        return setAngles(angles, runtime)
+    servos._call = lambda func, *args: record(*args)
+    servos.set_angle("right_shoulder_roll", 30)
+    servos.set_angle("RightShoulderRoll", 60)
+    servos.set_angles({YanAPI.RobotJointType.No17: 100, "neck_lr": 120})
+    assert servos.flush()["code"] == 0
+    assert sent == [{"RightShoulderRoll": 60, "NeckLR": 120}]
+    assert mock_robot.robot.servos["RightShoulderRoll"] == 60
+    assert mock_robot.robot.servos["NeckLR"] == 120
+
+
+def test_get_angles_accepts_aliases(mock_robot):
+    servos = YanAPI.ServoController()
+    angles = servos.get_angles(["neck_lr", "RightShoulderRoll"])
+    assert angles == {"neck_lr": 90, "RightShoulderRoll": 90}
+    assert servos.requests == 1
@@ -0,0 +1,59 @@
+import asyncio
+import pytest
+import YanAPI
+
+
+@pytest.mark.parametrize("name", ["NeckLR", "neck_lr", YanAPI.RobotJointType.No17])
+def test_clamp_accepts_both_naming_styles(monkeypatch, name):
+    monkeypatch.setattr(YanAPI, "servo_limit_mode", "clamp")
+    angles, error = YanAPI._limit_servo_angles({name: 200})
+    assert error is None
+    assert angles == {name: 165}
+
+
+@pytest.mark.parametrize("name", ["RightAnkleUD", "right_ankle_ud"])
+def test_reject_accepts_both_naming_styles(monkeypatch, name):
+    monkeypatch.setattr(YanAPI, "servo_limit_mode", "reject")
+    angles, error = YanAPI._limit_servo_angles({name: 30})
+    assert angles is None
+    assert "out of range 65-180" in error
+    assert YanAPI._limit_servo_angles({name: 90}) == ({name: 90}, None)
+
+
+@pytest.mark.parametrize("mode", ["clamp", "reject"])
+def test_unknown_servo_is_rejected(monkeypatch, mode):
+    monkeypatch.setattr(YanAPI, "servo_limit_mode", mode)
+    angles, error = YanAPI._limit_servo_angles({"NeckLR": 90, "bogus": 90})
+    assert angles is None
+    assert "unknown servo name bogus" in error
+
+
+def test_set_servos_angles_sends_clamped_angles(mock_robot, monkeypatch):
+    monkeypatch.setattr(YanAPI, "servo_limit_mode", "clamp")
+    assert YanAPI.set_servos_angles({"NeckLR": 200, "RightHipLR": 150})["code"] == 0
+    assert mock_robot.robot.servos["NeckLR"] == 165
+    assert mock_robot.robot.servos["RightHipLR"] == 120
+    res = YanAPI.set_servos_angles({"neck_lr": 90, "bogus": 90})
+    assert res["code"] == -1
+    assert mock_robot.robot.servos["NeckLR"] == 165
+
+
+@pytest.mark.parametrize("mode", ["clamp", "reject"])
+def test_async_set_servos_angles_layers_is_limited(mock_robot, monkeypatch, mode):
+    monkeypatch.setattr(YanAPI, "servo_limit_mode", mode)
+
+    async def main():
+        async with YanAPI.AsyncYanClient(mock_robot.host) as client:
+            client.basic_url = YanAPI.basic_url
+            res = await client.set_servos_angles_layers({"NeckLR": {"angle": 200, "runtime": 200}})
+            unknown = await client.set_servos_angles_layers({"bogus": {"angle": 90}})
+        return res, unknown
+    res, unknown = asyncio.run(main())
+    assert unknown["code"] == -1
+    if mode == "clamp":
+        assert res["code"] == 0
+        assert mock_robot.robot.servos["NeckLR"] == 165
+    else:
+        assert res == {"code": -1, "data": {}, "msg": "NeckLR angle 200 out of range 15-165"}
+        assert mock_robot.robot.servos["NeckLR"] == 90
+    assert YanAPI.set_servos_angles_layers({"NeckLR": {"angle": 200}})["code"] == (0 if mode == "clamp" else -1)
@@ -0,0 +1,51 @@
+import asyncio
+import time
+import YanAPI
+
+
+def test_subscription_is_renewed_past_its_timeout(mock_robot):
+    async def main():
+        async with YanAPI.open_subscription("sensor", type="gyro", timeval=50, timeout=1) as sub:
+            end = time.monotonic() + 2.5
+            while time.monotonic() < end:
+                await asyncio.wait_for(sub.get(), 0.5)
+            events = 0
+            while events < 3:
+                event = await asyncio.wait_for(sub.get(), 0.5)
+                assert event.robotIp == mock_robot.host
+                events += 1
+            assert sub.error is None
+        assert not mock_robot.robot.active_subscriptions("sensor")
+    asyncio.run(main())
+
+
+def test_subscription_iteration_ends_when_renewal_fails(mock_robot):
+    async def main():
+        sub = YanAPI.open_subscription("sensor", type="gyro", timeval=50, timeout=1)
+        assert sub.open()["code"] == 0
+        mock_robot.error_rate = 1.0
+        events = 0
+        async def consume():
+            nonlocal events
+            async for event in sub:
+                events += 1
+        await asyncio.wait_for(consume(), 3)
+        assert events > 0
+        assert sub.error is not None
+        assert sub.url is None
+        assert sub.close() is None
+    asyncio.run(main())
+
+
+def test_close_ends_iteration(mock_robot):
+    async def main():
+        sub = YanAPI.open_subscription("motion")
+        assert sub.open()["code"] == 0
+        asyncio.get_event_loop().call_later(0.2, sub.close)
+        await asyncio.wait_for(_drain(sub), 2)
+        assert not mock_robot.robot.active_subscriptions("motion")
+
+    async def _drain(sub):
+        async for event in sub:
+            pass
+    asyncio.run(main())
@@ -0,0 +1,78 @@
+import threading
+import time
+import pytest
+import YanAPI
+
+
+def test_sync_do_motion_gait_waits_for_gait_to_finish(mock_robot):
+    begin = time.monotonic()
+    assert YanAPI.sync_do_motion_gait(speed_v=1, steps=2) is True
+    assert time.monotonic() - begin >= 0.2
+    assert mock_robot.robot.gait["status"] == 5
+
+
+def test_sync_play_motion_uses_push_subscription(mock_robot):
+    begin = time.monotonic()
+    assert YanAPI.sync_play_motion(name="wave") is True
+    assert time.monotonic() - begin < 0.2 + 0.15
+    assert mock_robot.robot.motion["status"] == "idle"
+    assert mock_robot.robot.subscriptions.get("motion")
+
+
+def test_completion_subscription_is_renewed_before_expiry(mock_robot, monkeypatch):
+    monkeypatch.setattr(YanAPI, "completion_subscription_timeout", 1)
+    YanAPI._completion_subscriptions.clear()
+    assert YanAPI.sync_play_motion(name="wave")
+    key = (YanAPI._get_robot_ip(), "motion")
+    first = YanAPI._completion_subscriptions[key][2]
+    time.sleep(0.6)
+    assert YanAPI.sync_play_motion(name="wave")
+    assert YanAPI._completion_subscriptions[key][2] > first
+
+
+def test_completion_subscriptions_are_closed(mock_robot):
+    YanAPI._completion_subscriptions.clear()
+    assert YanAPI.sync_play_motion(name="wave")
+    assert mock_robot.robot.subscriptions["motion"]
+    YanAPI._close_completion_subscriptions()
+    assert not mock_robot.robot.subscriptions["motion"]
+    assert YanAPI._completion_subscriptions == {}
+
+
+def test_sync_wait_is_bounded(mock_robot, monkeypatch):
+    mock_robot.robot.task_time = 30
+    monkeypatch.setattr(YanAPI, "sync_timeout", 0.3)
+    begin = time.monotonic()
+    with pytest.raises(YanAPI.DeadlineExceeded):
+        YanAPI.sync_do_tts("hello")
+    assert time.monotonic() - begin < 1
+
+
+def test_deadline_bounds_sync_play_motion(mock_robot):
+    mock_robot.robot.task_time = 30
+    begin = time.monotonic()
+    with pytest.raises(YanAPI.DeadlineExceeded):
+        with YanAPI.deadline(0.3):
+            YanAPI.sync_play_motion(name="wave")
+    assert time.monotonic() - begin < 1
+
+
+def test_slow_robot_does_not_block_other_subscriptions(mock_robot):
+    from YanMockServer import YanMockServer
+    YanAPI._completion_subscriptions.clear()
+    slow = YanMockServer(host="127.0.0.2", port=0, latency=1).start()
+    robot = YanAPI.YanRobot(slow.host)
+    robot.basic_url = "http://%s:%d/v1/" % (slow.host, slow.port)
+    receiver = YanAPI._get_subscription_receiver()
+    thread = threading.Thread(target=robot.call, args=(YanAPI._renew_completion_subscription, receiver, "motion", slow.host))
+    try:
+        thread.start()
+        time.sleep(0.1)
+        begin = time.monotonic()
+        assert YanAPI._renew_completion_subscription(receiver, "motion", mock_robot.host) is not None
+        assert time.monotonic() - begin < 0.5
+    finally:
+        thread.join()
+        YanAPI._close_completion_subscriptions()
+        robot.close()
+        slow.stop()
@@ -0,0 +1,62 @@
+import time
+import numpy as np
+import pytest
+import YanAPI
+
+
+def test_store_grows_and_reopens(tmp_path):
+    store = YanAPI.TelemetryStore(str(tmp_path), fields=["percent"], capacity=4)
+    store.append_many("r1", np.arange(10.0), {"percent": np.arange(10.0)})
+    assert store._series["r1"].capacity == 16
+    store.close()
+    t, data = YanAPI.TelemetryStore(str(tmp_path), fields=["percent"]).query("r1", 3, 5)
+    assert t.tolist() == [3, 4, 5] and data["percent"].tolist() == [3, 4, 5]
+    with pytest.raises(ValueError):
+        data["percent"][0] = 1
+
+
+def test_rows_after_last_flush_are_not_recorded(tmp_path):
+    store = YanAPI.TelemetryStore(str(tmp_path), fields=["percent"], capacity=8)
+    store.append("r1", 1.0, {"percent": 50})
+    store.flush()
+    store.append("r1", 2.0, {"percent": 60})
+    #不调用flush/close，模拟进程退出
+    t, data = YanAPI.TelemetryStore(str(tmp_path), fields=["percent"]).query("r1")
+    assert t.tolist() == [1.0]
+    assert not (tmp_path / "r1" / "meta.json.tmp").exists()
+
+
+def test_downsample(tmp_path):
+    store = YanAPI.TelemetryStore(str(tmp_path), fields=["percent"])
+    values = np.array([1, 2, np.nan, 4, 5, 6], dtype=np.float32)
+    store.append_many("r1", np.arange(6.0), {"percent": values})
+    starts, data = store.downsample("r1", 2)
+    assert starts.tolist() == [0, 2, 4]
+    assert data["percent"].tolist() == [1.5, 4, 5.5]
+    assert store.downsample("r1", 2, how="max")[1]["percent"].tolist() == [2, 4, 6]
+    assert store.downsample("r1", 2, how="last")[1]["percent"].tolist()[2] == 6
+
+
+def test_downsample_last_skips_nan(tmp_path):
+    store = YanAPI.TelemetryStore(str(tmp_path), fields=["percent"])
+    values = np.array([1, np.nan, 3, np.nan, np.nan, np.nan], dtype=np.float32)
+    store.append_many("r1", np.arange(6.0), {"percent": values})
+    last = store.downsample("r1", 2, how="last")[1]["percent"]
+    assert last[:2].tolist() == [1, 3]
+    assert np.isnan(last[2])
+
+
+def test_collector_rejects_empty_robot_list(tmp_path):
+    with pytest.raises(ValueError):
+        YanAPI.TelemetryCollector(YanAPI.TelemetryStore(str(tmp_path)), [])
+
+
+def test_collector_samples_mock_robot(mock_robot, tmp_path):
+    store = YanAPI.TelemetryStore(str(tmp_path))
+    collector = YanAPI.TelemetryCollector(store, interval=0.05).start()
+    time.sleep(0.3)
+    collector.stop()
+    assert collector.samples > 0 and collector.errors == 0
+    t, data = store.query(mock_robot.host, fields=["percent", "temperature", "gait_status"])
+    assert len(t) == collector.samples
+    assert data["percent"][-1] == 90 and data["temperature"][-1] == 25
@@ -0,0 +1,52 @@
+import asyncio
+import socket
+import sys
+import YanAPI
+
+
+def test_ioctl_and_psutil_paths_agree(monkeypatch):
+    expected = YanAPI._interface_addresses()
+    monkeypatch.setitem(sys.modules, "psutil", None)
+    fallback = YanAPI._interface_addresses()
+    assert YanAPI._scan_broadcast_ips(fallback) == YanAPI._scan_broadcast_ips(expected)
+
+
+def test_broadcast_cache_follows_address_change(monkeypatch):
+    addresses = [("eth0", "192.168.1.20", "255.255.255.0", "192.168.1.255")]
+    monkeypatch.setattr(YanAPI, "_interface_addresses", lambda: list(addresses))
+    monkeypatch.setattr(YanAPI, "_broadcast_cache", {"ips": None, "signature": None, "checked": 0.0, "refreshed": 0.0})
+    assert YanAPI._find_broadcast_ips() == ["192.168.1.255"]
+    #同一网卡DHCP续租后换到了另一个网段
+    addresses[0] = ("eth0", "10.0.8.20", "255.255.252.0", "10.0.11.255")
+    YanAPI._broadcast_cache["checked"] = 0.0
+    assert YanAPI._find_broadcast_ips() == ["10.0.11.255"]
+
+
+def _run_channel(channel, sources):
+    async def main():
+        async with channel:
+            for source in sources:
+                s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                s.bind((source, 0))
+                s.sendto(b"\xfb\xbf", ("127.0.0.1", channel.port))
+                s.close()
+            received = []
+            try:
+                while True:
+                    received.append((await channel.recv(timeout=0.2))[2][0])
+            except asyncio.TimeoutError:
+                pass
+            return received
+    return asyncio.run(main())
+
+
+def test_channel_rejects_frames_from_other_hosts():
+    channel = YanAPI.UkitChannel(port=57, broadcast_ip="127.0.0.1", decode=False)
+    assert _run_channel(channel, ["127.0.0.1", "127.0.0.2"]) == ["127.0.0.1"]
+    assert channel.rejected == 1
+
+
+def test_channel_accepts_only_peer():
+    channel = YanAPI.UkitChannel(port=58, broadcast_ip="127.255.255.255", decode=False, peer="127.0.0.3")
+    assert _run_channel(channel, ["127.0.0.1", "127.0.0.3"]) == ["127.0.0.3"]
+    assert channel.rejected == 1
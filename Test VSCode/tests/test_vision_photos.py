@@ -0,0 +1,43 @@
+import os
+import pytest
+import YanAPI
+
+
+@pytest.fixture
+def photo(mock_robot):
+    mock_robot.robot.photos["img_1.jpg"] = bytes(range(200))
+    return mock_robot.robot.photos["img_1.jpg"]
+
+
+def test_resume_from_partial_file(mock_robot, photo, tmp_path):
+    (tmp_path / "img_1.jpg.part").write_bytes(photo[:50])
+    assert YanAPI.download_vision_photo("img_1.jpg", str(tmp_path)) == 200
+    assert (tmp_path / "img_1.jpg").read_bytes() == photo
+    assert not (tmp_path / "img_1.jpg.part").exists()
+
+
+def test_complete_part_file_is_finalized(mock_robot, photo, tmp_path):
+    (tmp_path / "img_1.jpg.part").write_bytes(photo)
+    assert YanAPI.download_vision_photos(str(tmp_path), ["img_1.jpg"]) == {"img_1.jpg": 200}
+    assert (tmp_path / "img_1.jpg").read_bytes() == photo
+
+
+def test_oversized_part_file_is_downloaded_again(mock_robot, photo, tmp_path):
+    (tmp_path / "img_1.jpg.part").write_bytes(b"x" * 300)
+    assert YanAPI.download_vision_photo("img_1.jpg", str(tmp_path)) == 200
+    assert (tmp_path / "img_1.jpg").read_bytes() == photo
+
+
+def test_json_error_is_not_saved_as_photo(mock_robot, tmp_path):
+    results = YanAPI.download_vision_photos(str(tmp_path), ["missing.jpg"])
+    assert isinstance(results["missing.jpg"], ValueError)
+    assert "photo not found" in str(results["missing.jpg"])
+    assert os.listdir(str(tmp_path)) == []
+    with pytest.raises(ValueError):
+        YanAPI.download_vision_photo("missing.jpg", bytearray(1024))
+
+
+def test_download_into_buffer(mock_robot, photo):
+    buf = bytearray(1024)
+    size = YanAPI.download_vision_photo("img_1.jpg", buf)
+    assert bytes(buf[:size]) == photo